@@ -215,7 +215,12 @@ function updateOrderStatus(id, status) {
     })
     .then(response => response.json())
     .then(data => {
-        showNotification(data.message, "success");
+        if (data.error) {
+            // e.g. the order moved on in another tab
+            showNotification(data.error, "error");
+        } else {
+            showNotification(data.message, "success");
+        }
         loadOrders();
         loadDashboardStats(); // Refresh stats after update
     })
@@ -225,6 +230,74 @@ function updateOrderStatus(id, status) {
     });
 }
 
+// 🟢 Bulk Update Order Status - one request for a batch of orders
+function bulkUpdateOrderStatus(ids, status) {
+    return fetch(`${API_URL}/api/admin/order/bulk_update`, {
+        method: "PUT",
+        headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("adminToken")}`
+        },
+        body: JSON.stringify({ order_ids: ids, status: status })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        // Orders whose current status doesn't allow the move are left as they are
+        const skipped = data.results.filter(r => r.result !== "updated" && r.result !== "unchanged");
+        showNotification(
+            `${data.updated} order(s) marked ${status}` + (skipped.length ? `, ${skipped.length} skipped` : ""),
+            skipped.length ? "error" : "success"
+        );
+        loadOrders();
+        loadDashboardStats();
+        return data;
+    })
+    .catch(err => {
+        console.error("Failed to bulk update orders", err);
+        showNotification(err.message || "Failed to update order statuses.", "error");
+    });
+}
+
+// 🟢 Mark the orders ticked in the orders table as Shipped
+function shipSelectedOrders() {
+    const ids = Array.from(document.querySelectorAll("#orderTable .order-select:checked"))
+        .map(box => parseInt(box.value, 10));
+    if (ids.length === 0) {
+        showNotification("Select the orders to ship first.", "error");
+        return;
+    }
+    bulkUpdateOrderStatus(ids, "Shipped");
+}
+
+// 🟢 Tick or untick every order on the current page
+function toggleAllOrders(checked) {
+    document.querySelectorAll("#orderTable .order-select").forEach(box => { box.checked = checked; });
+}
+
+// 🟢 Subscribe to new orders and status changes (Server-Sent Events)
+function subscribeOrderEvents() {
+    const token = localStorage.getItem("adminToken");
+    if (!token || !window.EventSource) return;
+
+    // EventSource can't send headers, the token goes in the query string
+    const source = new EventSource(`${API_URL}/api/admin/orders/stream?token=${encodeURIComponent(token)}`);
+    const refresh = debounce(() => {
+        loadOrders();
+        loadDashboardStats();
+    }, 500);
+
+    source.addEventListener("order_created", event => {
+        const data = JSON.parse(event.data);
+        showNotification(`New order #${data.order_id}`, "info");
+        refresh();
+    });
+    source.addEventListener("order_status", refresh);
+    return source;
+}
+
 // 🟢 Edit Product - Opens modal with product data
 function editProduct(id) {
     const token = localStorage.getItem("adminToken");
@@ -324,6 +397,20 @@ function updateProduct() {
     });
 }
 
+// 🟢 Render Category Filter
+function renderCategories(categories) {
+    const categorySelect = document.getElementById("categoryFilter");
+    // Keep the "All Categories" option
+    categorySelect.innerHTML = '<option value="">All Categories</option>';
+
+    categories.forEach(category => {
+        const option = document.createElement("option");
+        option.value = category;
+        option.textContent = category;
+        categorySelect.appendChild(option);
+    });
+}
+
 // 🟢 Load Categories
 function loadCategories() {
     const token = localStorage.getItem("adminToken");
@@ -336,21 +423,50 @@ function loadCategories() {
         }
     })
     .then(response => response.json())
-    .then(categories => {
-        const categorySelect = document.getElementById("categoryFilter");
-        // Keep the "All Categories" option
-        categorySelect.innerHTML = '<option value="">All Categories</option>';
-        
-        categories.forEach(category => {
-            const option = document.createElement("option");
-            option.value = category;
-            option.textContent = category;
-            categorySelect.appendChild(option);
-        });
-    })
+    .then(data => renderCategories(data.categories || data))
     .catch(error => console.error("❌ Error loading categories:", error));
 }
 
+// 🟢 Render Dashboard Stats
+function renderDashboardStats(data) {
+    // Use the snake_case property names from the backend
+    document.getElementById("totalProducts").textContent = data.total_products || 0;
+    document.getElementById("totalOrders").textContent = data.total_orders || 0;
+
+    // Handle revenue safely
+    const revenue = parseFloat(data.total_revenue || 0);
+    document.getElementById("totalRevenue").textContent = `$${revenue.toFixed(2)}`;
+
+    document.getElementById("lowStockItems").textContent = data.low_stock || 0;
+
+    // Update recent activity
+    const activityList = document.getElementById("recentActivityList");
+    activityList.innerHTML = "";
+
+    if (data.recent_activity && data.recent_activity.length > 0) {
+        data.recent_activity.forEach(activity => {
+            const item = document.createElement("div");
+            item.className = "activity-item";
+
+            // Format the activity based on its type
+            let activityText = '';
+            if (activity.type === 'order') {
+                activityText = `Order #${activity.id} by ${activity.user || 'Unknown'} - ${activity.status} ($${parseFloat(activity.amount || 0).toFixed(2)})`;
+            } else {
+                activityText = activity.action || 'Unknown activity';
+            }
+
+            item.innerHTML = `
+                <span class="activity-time">${activity.date || 'Unknown date'}</span>
+                <span class="activity-text">${activityText}</span>
+            `;
+            activityList.appendChild(item);
+        });
+    } else {
+        activityList.innerHTML = "<div class='no-activity'>No recent activity</div>";
+    }
+}
+
 // 🟢 Load Dashboard Stats
 function loadDashboardStats() {
     const token = localStorage.getItem("adminToken");
@@ -375,46 +491,7 @@ function loadDashboardStats() {
         if (!response.ok) throw new Error(`Server error: ${response.status}`);
         return response.json();
     })
-    .then(data => {
-        console.log("Dashboard stats loaded:", data);
-        
-        // Use the snake_case property names from the backend
-        document.getElementById("totalProducts").textContent = data.total_products || 0;
-        document.getElementById("totalOrders").textContent = data.total_orders || 0;
-        
-        // Handle revenue safely
-        const revenue = parseFloat(data.total_revenue || 0);
-        document.getElementById("totalRevenue").textContent = `$${revenue.toFixed(2)}`;
-        
-        document.getElementById("lowStockItems").textContent = data.low_stock || 0;
-        
-        // Update recent activity
-        const activityList = document.getElementById("recentActivityList");
-        activityList.innerHTML = "";
-        
-        if (data.recent_activity && data.recent_activity.length > 0) {
-            data.recent_activity.forEach(activity => {
-                const item = document.createElement("div");
-                item.className = "activity-item";
-                
-                // Format the activity based on its type
-                let activityText = '';
-                if (activity.type === 'order') {
-                    activityText = `Order #${activity.id} by ${activity.user || 'Unknown'} - ${activity.status} ($${parseFloat(activity.amount || 0).toFixed(2)})`;
-                } else {
-                    activityText = activity.action || 'Unknown activity';
-                }
-                
-                item.innerHTML = `
-                    <span class="activity-time">${activity.date || 'Unknown date'}</span>
-                    <span class="activity-text">${activityText}</span>
-                `;
-                activityList.appendChild(item);
-            });
-        } else {
-            activityList.innerHTML = "<div class='no-activity'>No recent activity</div>";
-        }
-    })
+    .then(renderDashboardStats)
     .catch(error => {
         console.error("❌ Error loading dashboard stats:", error);
         
@@ -429,6 +506,47 @@ function loadDashboardStats() {
     });
 }
 
+// 🟢 Render Orders Table
+function renderOrders(data) {
+    const ordersContainer = document.querySelector("#orderTable tbody");
+    ordersContainer.innerHTML = ""; // Clear previous orders
+    document.getElementById("selectAllOrders").checked = false;
+
+    if (data.orders.length === 0) {
+        ordersContainer.innerHTML = `
+            <tr>
+                <td colspan="7" class="no-data">No orders found</td>
+            </tr>
+        `;
+        return;
+    }
+
+    data.orders.forEach(order => {
+        const statusClass = getStatusClass(order.status);
+        const row = document.createElement("tr");
+
+        row.innerHTML = `
+            <td><input type="checkbox" class="order-select" value="${order.id}"></td>
+            <td>${order.id}</td>
+            <td>${order.customer_name}</td>
+            <td>$${order.total.toFixed(2)}</td>
+            <td>
+                <span class="status-badge ${statusClass}">${order.status}</span>
+            </td>
+            <td>${formatDate(order.created_at)}</td>
+            <td>
+                <button onclick="viewOrderDetails(${order.id})" class="view-btn">View</button>
+                ${getStatusButtons(order)}
+            </td>
+        `;
+
+        ordersContainer.appendChild(row);
+    });
+
+    // Update pagination
+    renderPagination(data.total, data.page, data.pages, 'orderPagination', loadOrders);
+}
+
 // 🟢 Load Orders with Pagination
 function loadOrders(page = 1, status = "") {
     const token = localStorage.getItem("adminToken");
@@ -453,43 +571,7 @@ function loadOrders(page = 1, status = "") {
         }
         return response.json();
     })
-    .then(data => {
-        const ordersContainer = document.querySelector("#orderTable tbody");
-        ordersContainer.innerHTML = ""; // Clear previous orders
-
-        if (data.orders.length === 0) {
-            ordersContainer.innerHTML = `
-                <tr>
-                    <td colspan="5" class="no-data">No orders found</td>
-                </tr>
-            `;
-            return;
-        }
-
-        data.orders.forEach(order => {
-            const statusClass = getStatusClass(order.status);
-            const row = document.createElement("tr");
-            
-            row.innerHTML = `
-                <td>${order.id}</td>
-                <td>${order.customer_name}</td>
-                <td>$${order.total.toFixed(2)}</td>
-                <td>
-                    <span class="status-badge ${statusClass}">${order.status}</span>
-                </td>
-                <td>${formatDate(order.created_at)}</td>
-                <td>
-                    <button onclick="viewOrderDetails(${order.id})" class="view-btn">View</button>
-                    ${getStatusButtons(order)}
-                </td>
-            `;
-            
-            ordersContainer.appendChild(row);
-        });
-
-        // Update pagination
-        renderPagination(data.total, data.page, data.pages, 'orderPagination', loadOrders);
-    })
+    .then(renderOrders)
     .catch(error => {
         console.error("❌ Error loading orders:", error);
         showNotification(error.message, "error");
@@ -672,6 +754,40 @@ function showNotification(message, type = 'info') {
         setTimeout(() => notification.remove(), 500);
     }, 5000);
 }
+// 🟢 Render Sales Analytics
+function renderSalesAnalytics(data, period) {
+    // Get the correct elements based on the period
+    const totalOrdersId = `${period}TotalOrders`; 
+    const totalRevenueId = `${period}TotalRevenue`;
+    const topProductId = `${period}TopProduct`;
+
+    const ordersElement = document.getElementById(totalOrdersId);
+    const revenueElement = document.getElementById(totalRevenueId);
+    const topProductElement = document.getElementById(topProductId);
+
+    // Update elements if they exist
+    if (ordersElement) {
+        ordersElement.textContent = data.totalOrders || 0;
+    }
+
+    if (revenueElement) {
+        revenueElement.textContent = `$${(data.totalSales || 0).toFixed(2)}`;
+    }
+
+    if (topProductElement && data.topProducts && data.topProducts.length > 0) {
+        topProductElement.textContent = data.topProducts[0].name || 'None';
+    } else if (topProductElement) {
+        topProductElement.textContent = 'None';
+    }
+
+    // Update the chart for this period
+    const chartId = `${period}SalesChart`;
+    const chartElement = document.getElementById(chartId);
+    if (chartElement && data.salesByDate) {
+        renderSalesChart(data.salesByDate, period, chartId);
+    }
+}
+
 // 🟢 Load Sales Analytics
 function loadSalesAnalytics(period = 'month') {
     const token = localStorage.getItem("adminToken");
@@ -684,38 +800,7 @@ function loadSalesAnalytics(period = 'month') {
         }
     })
     .then(response => response.json())
-    .then(data => {
-        // Get the correct elements based on the period
-        const totalOrdersId = `${period}TotalOrders`; 
-        const totalRevenueId = `${period}TotalRevenue`;
-        const topProductId = `${period}TopProduct`;
-        
-        const ordersElement = document.getElementById(totalOrdersId);
-        const revenueElement = document.getElementById(totalRevenueId);
-        const topProductElement = document.getElementById(topProductId);
-        
-        // Update elements if they exist
-        if (ordersElement) {
-            ordersElement.textContent = data.totalOrders || 0;
-        }
-        
-        if (revenueElement) {
-            revenueElement.textContent = `$${(data.totalSales || 0).toFixed(2)}`;
-        }
-        
-        if (topProductElement && data.topProducts && data.topProducts.length > 0) {
-            topProductElement.textContent = data.topProducts[0].name || 'None';
-        } else if (topProductElement) {
-            topProductElement.textContent = 'None';
-        }
-        
-        // Update the chart for this period
-        const chartId = `${period}SalesChart`;
-        const chartElement = document.getElementById(chartId);
-        if (chartElement && data.salesByDate) {
-            renderSalesChart(data.salesByDate, period, chartId);
-        }
-    })
+    .then(data => renderSalesAnalytics(data, period))
     .catch(error => {
         console.error(`❌ Error loading ${period} sales analytics:`, error);
         // Show error message in the UI for this period
@@ -980,37 +1065,68 @@ function changeSalesPeriod(period) {
     loadSalesAnalytics(period);
 }
 
-// 🟢 Initialize Dashboard
-function initDashboard() {
-    // Get admin info
+// 🟢 Load Dashboard Bootstrap
+function loadDashboardBootstrap(period = 'month') {
     const token = localStorage.getItem("adminToken");
-    if (!token) {
-        window.location.href = "index.html";
-        return;
-    }
-    
-    // Get admin username
-    fetch(`${API_URL}/api/admin/profile`, {
+    if (!token) return;
+
+    const started = performance.now();
+    fetch(`${API_URL}/api/admin/dashboard/bootstrap?period=${period}`, {
         headers: { 
             "Authorization": `Bearer ${token}`, 
             "Content-Type": "application/json"
         }
     })
-    .then(response => response.json())
+    .then(response => {
+        if (response.status === 401 || response.status === 422) {
+            // Handle token expiration
+            localStorage.removeItem("adminToken");
+            window.location.href = "index.html";
+            throw new Error("Session expired");
+        }
+        return response.json();
+    })
     .then(data => {
-        document.getElementById("adminUsername").textContent = data.username;
+        if (data.error) throw new Error(data.error);
+        const errors = data.errors || {};
+
+        if (data.profile) document.getElementById("adminUsername").textContent = data.profile.username;
+        if (data.stats) renderDashboardStats(data.stats);
+        if (data.orders) renderOrders(data.orders);
+        if (data.sales) renderSalesAnalytics(data.sales, period);
+        if (data.categories) renderCategories(data.categories);
+        console.log(`Dashboard first render in ${(performance.now() - started).toFixed(0)} ms (server ${data.elapsed_ms} ms)`, data.timings);
+
+        // Panels the server left out (timeout or error) load on their own
+        if (errors.stats) loadDashboardStats();
+        if (errors.orders) loadOrders();
+        if (errors.sales) loadSalesAnalytics(period);
+        if (errors.categories) loadCategories();
     })
-    .catch(() => {
-        // Handle token expiration
-        localStorage.removeItem("adminToken");
-        window.location.href = "index.html";
+    .catch(error => {
+        console.error("❌ Error loading dashboard bootstrap:", error);
+        if (error.message === "Session expired") return;
+        loadDashboardStats();
+        loadOrders();
+        loadSalesAnalytics(period);
+        loadCategories();
     });
+}
+
+// 🟢 Initialize Dashboard
+function initDashboard() {
+    // Get admin info
+    const token = localStorage.getItem("adminToken");
+    if (!token) {
+        window.location.href = "index.html";
+        return;
+    }
+    
+    // Profile, stats, orders, sales and categories in one request
+    loadDashboardBootstrap('month');
     
     // Load data
-    loadDashboardStats();
     loadProducts();
-    loadOrders();
-    loadSalesAnalytics('month');
     
     // Setup event listeners
     setupSearchFilter();
@@ -1473,13 +1589,11 @@ document.addEventListener('DOMContentLoaded', function() {
     if (document.querySelector('.sidebar')) {
         console.log("Admin dashboard loaded, initializing...");
         
-        // Load dashboard stats right away
-        loadDashboardStats();
-        
-        // Initialize products, orders, etc.
+        // Stats, orders and categories come from initDashboard's bootstrap call
         loadProducts();
-        loadOrders();
-        loadCategories();
+        
+        // Live order updates instead of polling
+        subscribeOrderEvents();
         
         // Initialize sales tab if it exists
         if (document.querySelector('.tab-container')) {
@@ -0,0 +1,393 @@
+"""Columnar in-memory cube over order lines for ad-hoc admin reports.
+
+Each order line is kept as one slot in a set of NumPy arrays: order hour
+(hours since the epoch), order id, product id, category code, quantity and unit
+price. Filters become boolean masks and group-bys become ``bincount`` over a
+combined integer key, so a report over millions of lines is a handful of
+vectorized passes instead of a SQL scan per question.
+
+Lines are appended incrementally: every refresh reads the lines of orders
+created after the cube's watermark and up to ANALYTICS_SETTLE_SECONDS ago,
+from every order shard, and moves the watermark there. Order ids can't
+serve as the watermark because shards hand them out in per-process blocks
+and commit them out of order, while every checkout that stamped a
+created_at before the settle window has committed. Orders loaded in a
+refresh that failed halfway are remembered so the retry, or an order that
+``reshard`` moved to a shard read later, isn't loaded twice. The cube is
+per process, like the suggest index, and is refreshed when it is older than
+ANALYTICS_REFRESH_SECONDS. Order items are never edited after checkout, so
+appending is enough; a full rebuild every ANALYTICS_REBUILD_SECONDS picks up
+products moved to another category.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, or_, and_
+
+try:
+    import numpy as np
+except ImportError:  # only needed for the analytics endpoint
+    np = None
+
+MEASURES = ("revenue", "units", "lines", "orders")
+DIMENSIONS = ("category", "product", "hour", "weekday", "hour_of_week", "day", "month", "price_band")
+MAX_LIMIT = 1000
+
+# Beyond this many possible key combinations, groups are found with np.unique
+_DENSE_GROUPS = 1 << 22
+_EPOCH = datetime(1970, 1, 1)
+# Epoch hour 0 was Thursday 00:00; shifting by 72 hours makes Monday 00:00 slot 0
+_WEEK_SHIFT = 72
+
+
+def _epoch_hours(value):
+    return int((value - _EPOCH).total_seconds()) // 3600 if value else 0
+
+
+def _parse_day(value):
+    return _epoch_hours(datetime.strptime(value, "%Y-%m-%d"))
+
+
+def _range(keys):
+    """Shift ``keys`` to start at 0; returns ``(keys, size, first)``"""
+    if not len(keys):
+        return keys, 1, 0
+    first = int(keys.min())
+    return keys - first, int(keys.max()) - first + 1, first
+
+
+class OrderCube:
+    # Hour resolution is all the reports need and halves the timestamp column
+    COLUMNS = (
+        ("hour", "int32"),  # hours since the epoch
+        ("order_id", "int64"),  # sharded ids start at (shard + 1) * ORDER_SHARD_ID_SPAN, past int32
+        ("product_id", "int32"),
+        ("category", "int16"),
+        ("quantity", "int32"),
+        ("price", "float64"),
+    )
+
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise RuntimeError("The analytics cube needs the 'numpy' package installed")
+        self.size = 0
+        self.watermark = datetime.min  # lines of orders created up to here are loaded
+        self._loaded_orders = set()  # orders above the watermark already loaded
+        self._product_categories = {}  # product id -> category code
+        self.categories = []  # code -> category name
+        self._category_codes = {}
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in self.COLUMNS}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+        self.refreshed_at = self.built_at
+
+    def category_code(self, name):
+        code = self._category_codes.get(name)
+        if code is None:
+            code = self._category_codes[name] = len(self.categories)
+            self.categories.append(name)
+        return code
+
+    def column(self, name):
+        return self._columns[name][:self.size]
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self._columns["hour"])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, array in self._columns.items():
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._columns[name] = grown
+
+    def append(self, hour, order_id, product_id, category, quantity, price):
+        """Append equally long sequences of line values (categories as codes)"""
+        count = len(hour)
+        if not count:
+            return
+        with self._lock:
+            self._reserve(count)
+            end = self.size + count
+            for name, values in (("hour", hour), ("order_id", order_id), ("product_id", product_id),
+                                 ("category", category), ("quantity", quantity), ("price", price)):
+                self._columns[name][self.size:end] = values
+            self.size = end
+
+    def load(self, session, batch_size=50000, settle_seconds=60):
+        """Append the lines of orders created since the watermark, from every shard; returns lines added"""
+        import sharding
+
+        until = datetime.utcnow() - timedelta(seconds=settle_seconds)
+        if until <= self.watermark:
+            return 0
+        added = 0
+        for key in sharding.keys():
+            with sharding.use(key):
+                added += self._load_shard(session, until, batch_size)
+        # Orders created up to ``until`` are never read again
+        self.watermark = until
+        self._loaded_orders.clear()
+        self.refreshed_at = time.monotonic()
+        return added
+
+    def _load_shard(self, session, until, batch_size):
+        from models import Order, OrderItem, Product
+
+        item_table = OrderItem.__table__
+        order_table = Order.__table__
+        product_table = Product.__table__
+        added = 0
+        cursor = None
+        while True:
+            stmt = (
+                select(order_table.c.id, order_table.c.created_at)
+                .where(order_table.c.created_at > self.watermark, order_table.c.created_at <= until)
+                .order_by(order_table.c.created_at, order_table.c.id)
+                .limit(batch_size)
+            )
+            if cursor is not None:
+                stmt = stmt.where(or_(
+                    order_table.c.created_at > cursor[0],
+                    and_(order_table.c.created_at == cursor[0], order_table.c.id > cursor[1]),
+                ))
+            orders = session.execute(stmt).all()
+            if not orders:
+                break
+            cursor = (orders[-1].created_at, orders[-1].id)
+            created = {order_id: created_at for order_id, created_at in orders
+                       if order_id not in self._loaded_orders}
+            if not created:
+                continue
+
+            rows = session.execute(
+                select(item_table.c.order_id, item_table.c.product_id, item_table.c.quantity, item_table.c.price)
+                .where(item_table.c.order_id.in_(list(created)))
+                .order_by(item_table.c.order_id, item_table.c.id)
+            ).all()
+            # Products live in the main database, which may not be the one holding the orders
+            missing = {row[1] for row in rows} - self._product_categories.keys()
+            if missing:
+                found = dict(session.execute(
+                    select(product_table.c.id, product_table.c.category).where(product_table.c.id.in_(missing))
+                ).all())
+                for product_id in missing:
+                    self._product_categories[product_id] = self.category_code(found.get(product_id) or "")
+            categories = self._product_categories
+            self.append(
+                [_epoch_hours(created[row[0]]) for row in rows],
+                [row[0] for row in rows],
+                [row[1] for row in rows],
+                [categories[row[1]] for row in rows],
+                [row[2] for row in rows],
+                [row[3] for row in rows],
+            )
+            self._loaded_orders.update(created)
+            added += len(rows)
+        return added
+
+    def loaded_through(self):
+        """created_at of the newest orders loaded, ISO formatted, None before the first load"""
+        return self.watermark.isoformat() if self.watermark != datetime.min else None
+
+    def _mask(self, filters):
+        """Boolean mask of matching lines, or None when nothing is filtered"""
+        conditions = []
+        if filters.get("from"):
+            conditions.append(self.column("hour") >= _parse_day(filters["from"]))
+        if filters.get("to"):
+            # ``to`` is inclusive, like the date pickers that send it
+            conditions.append(self.column("hour") < _parse_day(filters["to"]) + 24)
+        if filters.get("category"):
+            codes = [self._category_codes[name] for name in filters["category"] if name in self._category_codes]
+            conditions.append(np.isin(self.column("category"), codes))
+        if filters.get("product_id"):
+            conditions.append(np.isin(self.column("product_id"), [int(pid) for pid in filters["product_id"]]))
+        if filters.get("min_price") is not None:
+            conditions.append(self.column("price") >= float(filters["min_price"]))
+        if filters.get("max_price") is not None:
+            conditions.append(self.column("price") <= float(filters["max_price"]))
+        if not conditions:
+            return None
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask &= condition
+        return mask
+
+    def _dimension(self, name, column, price_band):
+        """Return ``(keys, size, label)`` with integer keys in ``[0, size)``"""
+        if name == "category":
+            return column("category"), max(len(self.categories), 1), lambda key: self.categories[key]
+        if name == "product":
+            keys, size, first = _range(column("product_id"))
+            return keys, size, lambda key: first + key
+        if name == "price_band":
+            keys, size, first = _range(np.floor(column("price") / price_band).astype(np.int32))
+            return keys, size, lambda key: (first + key) * price_band
+
+        hours = column("hour")
+        if name == "hour":
+            return hours % 24, 24, int
+        if name == "hour_of_week":
+            return (hours + _WEEK_SHIFT) % 168, 168, int
+        if name == "weekday":
+            return (hours + _WEEK_SHIFT) % 168 // 24, 7, int
+        if name == "day":
+            keys, size, first = _range(hours // 24)
+            return keys, size, lambda key: str(np.datetime64(first + key, "D"))
+        if name == "month":
+            days, size, first = _range(hours // 24)
+            # Map the (short) span of days to months once, then gather
+            months = np.arange(first, first + size).astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+            month_of_day, size, first_month = _range(months)
+            return month_of_day[days], size, lambda key: str(np.datetime64(first_month + key, "M"))
+        raise ValueError(f"Unknown dimension '{name}'. Must be one of: {', '.join(DIMENSIONS)}")
+
+    def query(self, group_by=(), measures=("revenue",), filters=None, sort=None, limit=100,
+              price_band=25.0):
+        """Aggregate lines matching ``filters`` per ``group_by`` combination.
+
+        Returns ``(rows, groups, lines)``: the top ``limit`` result dicts by
+        ``sort`` (descending), the number of non-empty groups and the number
+        of lines that matched.
+        """
+        for measure in measures:
+            if measure not in MEASURES:
+                raise ValueError(f"Unknown measure '{measure}'. Must be one of: {', '.join(MEASURES)}")
+        sort = sort or measures[0]
+        if sort not in measures:
+            raise ValueError("sort must be one of the requested measures")
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        if price_band <= 0:
+            raise ValueError("price_band width must be positive")
+
+        with self._lock:
+            mask = self._mask(filters or {})
+            # Gathering by index is several times faster than boolean indexing
+            rows = None if mask is None else np.flatnonzero(mask)
+            selected = {}
+
+            def column(name):
+                # Filtered copies are made once per column and only when used
+                if name not in selected:
+                    selected[name] = self.column(name) if rows is None else self.column(name).take(rows)
+                return selected[name]
+
+            # Combine the dimension keys into one mixed-radix integer key
+            matched = self.size if rows is None else len(rows)
+            key = np.zeros(matched, dtype=np.int64)
+            space = 1
+            dimensions = []
+            for name in group_by:
+                keys, size, label = self._dimension(name, column, price_band)
+                key *= size
+                key += keys
+                space *= size
+                dimensions.append((name, size, label))
+
+            if space <= _DENSE_GROUPS:
+                groups, inverse, count = None, key, space
+            else:
+                groups, inverse = np.unique(key, return_inverse=True)
+                count = len(groups)
+
+            lines = np.bincount(inverse, minlength=count)
+            values = {}
+            for measure in measures:
+                if measure == "revenue":
+                    values[measure] = np.bincount(inverse, weights=column("price") * column("quantity"),
+                                                  minlength=count)
+                elif measure == "units":
+                    values[measure] = np.bincount(inverse, weights=column("quantity"), minlength=count)
+                elif measure == "lines":
+                    values[measure] = lines
+                elif measure == "orders":
+                    # Distinct orders per group. Lines of one order are adjacent,
+                    # so order-major pair keys are nearly sorted already and the
+                    # stable (timsort) sort is close to a single pass.
+                    pairs = np.sort(column("order_id") * count + inverse, kind="stable")
+                    first = np.empty(len(pairs), dtype=bool)
+                    first[:1] = True
+                    np.not_equal(pairs[1:], pairs[:-1], out=first[1:])
+                    values[measure] = np.bincount(pairs[first] % count, minlength=count)
+
+            present = np.flatnonzero(lines)
+            found = len(present)
+            ranked = values[sort][present]
+            if len(present) > limit:
+                top = np.argpartition(-ranked, limit - 1)[:limit]
+                present, ranked = present[top], ranked[top]
+            present = present[np.argsort(-ranked, kind="stable")]
+
+        result = []
+        for slot in present:
+            combined = int(groups[slot]) if groups is not None else int(slot)
+            row = {}
+            for name, size, label in reversed(dimensions):
+                combined, part = divmod(combined, size)
+                row[name] = label(part)
+            for measure in measures:
+                value = values[measure][slot]
+                row[measure] = round(float(value), 2) if measure == "revenue" else int(value)
+            result.append(row)
+        return result, found, matched
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_cube(app, session):
+    """Return the process-wide cube, loading new lines when it is stale"""
+    global _cube
+    refresh = app.config.get("ANALYTICS_REFRESH_SECONDS", 30)
+    rebuild = app.config.get("ANALYTICS_REBUILD_SECONDS", 3600)
+    settle = app.config.get("ANALYTICS_SETTLE_SECONDS", 60)
+    with _cube_lock:
+        now = time.monotonic()
+        if _cube is None or (rebuild and now - _cube.built_at > rebuild):
+            cube = OrderCube()
+            cube.load(session, settle_seconds=settle)
+            _cube = cube
+        elif now - _cube.refreshed_at > refresh:
+            _cube.load(session, settle_seconds=settle)
+        return _cube
+
+
+def run_query(app, session, spec):
+    """Answer an analytics query document (see the admin endpoint)"""
+    if not isinstance(spec, dict):
+        raise ValueError("Query must be a JSON object")
+    group_by = spec.get("group_by") or []
+    measures = spec.get("measures") or ["revenue"]
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    if isinstance(measures, str):
+        measures = [measures]
+    if len(group_by) > 3:
+        raise ValueError("At most 3 group_by dimensions are supported")
+    filters = spec.get("filters") or {}
+    for name in ("category", "product_id"):
+        if isinstance(filters.get(name), (str, int)):
+            filters[name] = [filters[name]]
+
+    cube = get_cube(app, session)
+    started = time.perf_counter()
+    rows, groups, lines = cube.query(
+        group_by=group_by,
+        measures=measures,
+        filters=filters,
+        sort=spec.get("sort"),
+        limit=spec.get("limit", 100),
+        price_band=float(spec.get("price_band", 25)),
+    )
+    return {
+        "rows": rows,
+        "groups": groups,
+        "lines": lines,
+        "loaded_through": cube.loaded_through(),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -2,20 +2,20 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from flask_migrate import Migrate
 from config import Config
+from replicas import ReplicaSession
 import logging
 import os
 
 # Create extensions but don't initialize them yet
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": ReplicaSession})
 jwt = JWTManager()
 
-def create_app():
+def create_app(config_object='config.Config'):
     app = Flask(__name__)
     
     # Configure app
-    app.config.from_object('config.Config')
+    app.config.from_object(config_object)
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
     
     # Initialize extensions with app
@@ -24,16 +24,67 @@ def create_app():
         "origins": ["http://127.0.0.1:5500", "http://localhost:5500", 
                     "http://127.0.0.1:5501", "http://localhost:5501"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"]
     }
 }, supports_credentials=True)
+    import sharding
+    import replicas
+    sharding.configure(app)
+    replicas.configure(app)
     db.init_app(app)
     jwt.init_app(app)
+    replicas.init_replicas(app)
+    
+    from compression import init_compression
+    init_compression(app)
+    
+    from uploads import init_uploads
+    init_uploads(app)
+    
+    from reviews import register_commands as register_review_commands
+    register_review_commands(app)
+    
+    from feeds import register_commands as register_feed_commands
+    register_feed_commands(app)
+    
+    from recommendations import register_commands as register_recommendation_commands
+    register_recommendation_commands(app)
+    
+    from archive import register_commands as register_archive_commands
+    register_archive_commands(app)
+    
+    sharding.register_commands(app)
+    
+    from backfill import register_commands as register_backfill_commands
+    register_backfill_commands(app)
+    
+    from idempotency import register_commands as register_idempotency_commands
+    register_idempotency_commands(app)
+    
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create missing tables on the main database and the order shards"""
+        db.create_all()
+        sharding.create_all()
+        print("Tables ready")
+    
+    from jobs import init_jobs
+    init_jobs(app)
+    
+    from events import init_events
+    init_events(app)
+    
+    from eventlog import init_event_log
+    init_event_log(app)
     
     # Register blueprints
-    from routes import admin_bp, user_bp, public_bp
+    from routes import admin_bp, user_bp, public_bp, assets_bp
     app.register_blueprint(admin_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(public_bp)
+    app.register_blueprint(assets_bp)
+    
+    from ratelimit import init_rate_limiting
+    init_rate_limiting(app)
     
     return app
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""Time-based archival of closed orders into compressed NDJSON files.
+
+``archive_orders`` moves Delivered and Cancelled orders created before a
+cutoff out of ``order``/``order_item`` in id chunks. Each chunk is written
+as one gzip NDJSON file per month of ``created_at``
+(``orders/YYYY/MM/<first>-<last>.ndjson.gz``, one order with its items per
+line). One transaction on the main database then records the file in
+``archive_part``, maps every order to its file in ``archived_order`` and
+adds the chunk to the daily and per-product sales summaries. A file is
+written and renamed into place before that transaction commits; if the
+commit fails it is removed again, so the manifest only ever lists complete
+files. Only after that commit are the rows deleted, in a transaction of
+their own on the database holding the orders (their shard, with
+ORDER_SHARDS set), which has kept them locked meanwhile. If that delete
+fails the orders are in both places until the next run, which finds them
+in ``archived_order`` and only deletes them.
+
+Single order lookups fall back to ``find_order``. Reports over archived
+periods read the summaries instead of the files.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, insert, delete, func, bindparam
+
+from app import db
+from models import (Order, OrderItem, Product, ArchivePart, ArchivedOrder,
+                    ArchivedDailySales, ArchivedProductSales)
+import sharding
+
+ARCHIVABLE_STATUSES = ("Delivered", "Cancelled")
+
+order_table = Order.__table__
+item_table = OrderItem.__table__
+product_table = Product.__table__
+part_table = ArchivePart.__table__
+archived_table = ArchivedOrder.__table__
+daily_table = ArchivedDailySales.__table__
+product_sales_table = ArchivedProductSales.__table__
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _order_record(order, items):
+    # "id" first, so lookups can find a line without parsing the others
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "status": order.status,
+        "total": order.total,
+        "created_at": order.created_at.strftime(TIME_FORMAT) if order.created_at else None,
+        "items": [
+            {"id": item.id, "product_id": item.product_id, "quantity": item.quantity, "price": item.price}
+            for item in items
+        ],
+    }
+
+
+def _write_part(folder, period, records):
+    """Write one gzip NDJSON file; returns ``(relative path, bytes, sha256)``"""
+    year, month = period.split("-")
+    relative = os.path.join("orders", year, month, f"{records[0]['id']}-{records[-1]['id']}.ndjson.gz")
+    path = os.path.join(folder, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out:
+            for record in records:
+                out.write(json.dumps(record, separators=(",", ":")).encode())
+                out.write(b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return relative, os.path.getsize(path), digest.hexdigest()
+
+
+def _add_to_summary(table, key_columns, totals, batch_size=500):
+    """Add ``{key tuple: {column: amount}}`` to a summary table"""
+    if not totals:
+        return
+    keys = list(totals)
+    columns = [table.c[name] for name in key_columns]
+    existing = set()
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        stmt = select(*columns)
+        for i, column in enumerate(columns):
+            # One IN per key column; a superset of the batch is fine here
+            stmt = stmt.where(column.in_({key[i] for key in batch}))
+        existing.update(tuple(row) for row in db.session.execute(stmt))
+
+    measures = list(next(iter(totals.values())))
+    updates = [
+        {**{f"k_{name}": value for name, value in zip(key_columns, key)}, **{f"d_{m}": totals[key][m] for m in measures}}
+        for key in keys if key in existing
+    ]
+    inserts = [
+        {**dict(zip(key_columns, key)), **totals[key]}
+        for key in keys if key not in existing
+    ]
+    if updates:
+        stmt = update(table)
+        for column, name in zip(columns, key_columns):
+            stmt = stmt.where(column == bindparam(f"k_{name}"))
+        db.session.execute(
+            stmt.values({m: table.c[m] + bindparam(f"d_{m}") for m in measures}), updates
+        )
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+
+def _archive_chunk(folder, engine, order_ids):
+    """Archive ``order_ids`` from the orders database ``engine``; returns ``(orders, items)`` removed"""
+    with engine.begin() as source:
+        orders = source.execute(
+            select(order_table).where(order_table.c.id.in_(order_ids)).order_by(order_table.c.id).with_for_update()
+        ).all()
+        items_by_order = defaultdict(list)
+        for item in source.execute(
+            select(item_table).where(item_table.c.order_id.in_(order_ids)).order_by(item_table.c.id)
+        ):
+            items_by_order[item.order_id].append(item)
+
+        # Left behind by a run whose delete failed after the archive committed
+        archived = set(db.session.execute(
+            select(archived_table.c.order_id).where(archived_table.c.order_id.in_([order.id for order in orders]))
+        ).scalars())
+
+        by_period = defaultdict(list)
+        daily = defaultdict(lambda: {"orders": 0, "revenue": 0.0})
+        product_sales = defaultdict(lambda: {"units": 0, "revenue": 0.0})
+        created_at = {}
+        for order in orders:
+            if order.id in archived:
+                continue
+            items = items_by_order.get(order.id, [])
+            created_at[order.id] = order.created_at
+            created = order.created_at or datetime(1970, 1, 1)
+            by_period[created.strftime("%Y-%m")].append(_order_record(order, items))
+            day = created.date()
+            daily[(day,)]["orders"] += 1
+            for item in items:
+                amount = item.price * item.quantity
+                daily[(day,)]["revenue"] += amount
+                product_sales[(day, item.product_id)]["units"] += item.quantity
+                product_sales[(day, item.product_id)]["revenue"] += amount
+
+        written = []
+        try:
+            for period, records in by_period.items():
+                relative, size, sha256 = _write_part(folder, period, records)
+                written.append(os.path.join(folder, relative))
+                part_id = db.session.execute(insert(part_table).values(
+                    path=relative, period=period,
+                    first_order_id=records[0]["id"], last_order_id=records[-1]["id"],
+                    orders=len(records), items=sum(len(r["items"]) for r in records),
+                    bytes=size, sha256=sha256, created_at=datetime.utcnow(),
+                )).inserted_primary_key[0]
+                db.session.execute(insert(archived_table), [
+                    {"order_id": r["id"], "user_id": r["user_id"], "part_id": part_id,
+                     "created_at": created_at[r["id"]]}
+                    for r in records
+                ])
+
+            _add_to_summary(daily_table, ("day",), daily)
+            _add_to_summary(product_sales_table, ("day", "product_id"), product_sales)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        # The archive is committed, the rows can go; leaving the block commits the delete
+        ids = [order.id for order in orders]
+        source.execute(delete(item_table).where(item_table.c.order_id.in_(ids)))
+        source.execute(delete(order_table).where(order_table.c.id.in_(ids)))
+    return len(orders), sum(len(items) for items in items_by_order.values())
+
+
+def archive_orders(folder, cutoff, chunk_size=1000, max_orders=None):
+    """Move closed orders created before ``cutoff`` to the archive.
+
+    Goes through the order shards one after another, committing the archive
+    and then the delete once per chunk. Returns a dict with the number of orders and
+    items moved and the elapsed seconds.
+    """
+    started = time.perf_counter()
+    moved_orders = moved_items = 0
+    for key in sharding.keys():
+        last_id = 0
+        engine = db.engines[key]
+        with sharding.use(key):
+            while max_orders is None or moved_orders < max_orders:
+                limit = chunk_size if max_orders is None else min(chunk_size, max_orders - moved_orders)
+                order_ids = db.session.execute(
+                    select(order_table.c.id)
+                    .where(order_table.c.id > last_id,
+                           order_table.c.created_at < cutoff,
+                           order_table.c.status.in_(ARCHIVABLE_STATUSES))
+                    .order_by(order_table.c.id)
+                    .limit(limit)
+                ).scalars().all()
+                if not order_ids:
+                    break
+                # Done with the listing transaction before the chunk commits on both databases
+                db.session.commit()
+                orders, items = _archive_chunk(folder, engine, order_ids)
+                moved_orders += orders
+                moved_items += items
+                last_id = order_ids[-1]
+    return {"orders": moved_orders, "items": moved_items, "seconds": time.perf_counter() - started}
+
+
+def find_order(folder, order_id):
+    """Return an archived order as stored (with its items), or None"""
+    part_path = db.session.execute(
+        select(part_table.c.path)
+        .join(archived_table, archived_table.c.part_id == part_table.c.id)
+        .where(archived_table.c.order_id == order_id)
+    ).scalar()
+    if part_path is None:
+        return None
+
+    prefix = f'{{"id":{order_id},'.encode()
+    with gzip.open(os.path.join(folder, part_path), "rb") as f:
+        for line in f:
+            if line.startswith(prefix):
+                return json.loads(line)
+    return None
+
+
+def order_detail(folder, order_id):
+    """An archived order in the shape the order detail views return, or None"""
+    record = find_order(folder, order_id)
+    if record is None:
+        return None
+    product_ids = {item["product_id"] for item in record["items"]}
+    products = {
+        row.id: row for row in db.session.execute(
+            select(product_table.c.id, product_table.c.name, product_table.c.img)
+            .where(product_table.c.id.in_(product_ids))
+        )
+    } if product_ids else {}
+
+    items = []
+    total = 0
+    for item in record["items"]:
+        product = products.get(item["product_id"])
+        item_total = item["price"] * item["quantity"]
+        total += item_total
+        items.append({
+            "id": item["id"],
+            "product_id": item["product_id"],
+            "product_name": product.name if product else "Unknown Product",
+            "product_img": product.img if product else None,
+            "quantity": item["quantity"],
+            "price": item["price"],
+            "total": item_total,
+        })
+    return {
+        "id": record["id"],
+        "user_id": record["user_id"],
+        "status": record["status"],
+        "created_at": record["created_at"] or "",
+        "items": items,
+        "total": total,
+        "archived": True,
+    }
+
+
+def sales_between(start, end=None):
+    """Archived sales from the summaries: ``(daily, products)``.
+
+    ``daily`` maps each date to ``(orders, revenue)`` and ``products`` maps
+    product id to revenue, both for ``start <= day <= end``.
+    """
+    start_day = start.date() if isinstance(start, datetime) else start
+    daily_stmt = select(daily_table.c.day, daily_table.c.orders, daily_table.c.revenue).where(
+        daily_table.c.day >= start_day
+    )
+    product_stmt = select(product_sales_table.c.product_id, func.sum(product_sales_table.c.revenue)).where(
+        product_sales_table.c.day >= start_day
+    ).group_by(product_sales_table.c.product_id)
+    if end is not None:
+        end_day = end.date() if isinstance(end, datetime) else end
+        daily_stmt = daily_stmt.where(daily_table.c.day <= end_day)
+        product_stmt = product_stmt.where(product_sales_table.c.day <= end_day)
+
+    daily = {day: (orders, revenue) for day, orders, revenue in db.session.execute(daily_stmt)}
+    products = dict(db.session.execute(product_stmt).all())
+    return daily, products
+
+
+def totals():
+    """``(orders, revenue)`` over everything archived"""
+    orders, revenue = db.session.execute(
+        select(func.coalesce(func.sum(daily_table.c.orders), 0), func.coalesce(func.sum(daily_table.c.revenue), 0))
+    ).one()
+    return int(orders), float(revenue)
+
+
+def cutoff_for(config, now=None):
+    return (now or datetime.utcnow()) - timedelta(days=config.get("ARCHIVE_AFTER_DAYS", 730))
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("archive-orders")
+    @click.option("--before", default=None, help="Archive orders created before this date (YYYY-MM-DD)")
+    @click.option("--max-orders", type=int, default=None, help="Stop after this many orders")
+    def archive_orders_command(before, max_orders):
+        """Move old Delivered/Cancelled orders to compressed archive files"""
+        cutoff = datetime.strptime(before, "%Y-%m-%d") if before else cutoff_for(app.config)
+        stats = archive_orders(
+            app.config["ARCHIVE_FOLDER"], cutoff,
+            chunk_size=app.config.get("ARCHIVE_CHUNK_SIZE", 1000), max_orders=max_orders,
+        )
+        print(f"Archived {stats['orders']} order(s) with {stats['items']} item(s) "
+              f"created before {cutoff:%Y-%m-%d} in {stats['seconds']:.1f}s")
@@ -0,0 +1,244 @@
+"""Chunked, resumable backfills for data migrations on big tables.
+
+One ``UPDATE "order" SET ...`` over millions of rows holds its row locks
+until it commits and reaches the replicas as one huge transaction. A
+backfill instead walks the table in primary key order, ``chunk_size`` rows
+at a time, and commits every chunk in its own short transaction together
+with its checkpoint (see checkpoints.py). Live traffic only ever waits on
+one chunk's locks, and an interrupted run resumes after the last committed
+chunk. Between chunks it sleeps ``pause`` seconds plus ``throttle`` times
+as long as the chunk took, and while a read replica (see replicas.py) lags
+more than ``max_lag`` seconds.
+
+Chunk boundaries come from the existing keys, so sparse ids (each order
+shard starts its ids at a different offset) cost nothing. The table is
+walked up to the highest key present at the start: rows inserted later
+must already be written in the new shape by the application. Order tables
+sharded by sharding.py are walked shard by shard, with one checkpoint each,
+kept in the main database. A crash between a shard's commit and the
+checkpoint's may redo a chunk, so chunks must be safe to repeat, e.g. by
+only touching rows that are still NULL.
+
+Backfills are registered in backfill_tasks.py and run with ``flask
+backfill NAME``; ``flask backfill`` lists them with their progress. In an
+Alembic migration, add the column and run the backfill after the schema
+change has committed: on MySQL, where DDL commits at once, ``run(NAME)``
+can be called straight from ``upgrade()``.
+"""
+import logging
+import time
+
+import click
+from sqlalchemy import select, update, func
+from flask import current_app
+
+from app import db
+import checkpoints
+import sharding
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PREFIX = "backfill:"
+# Checkpoint.name is 50 characters, leave room for ":order_shard_NN"
+MAX_NAME = 50 - len(CHECKPOINT_PREFIX) - len(sharding.BIND_PREFIX) - 4
+
+BACKFILLS = {}
+
+
+class Backfill:
+    """``UPDATE table SET values WHERE where`` over one primary key range per chunk.
+
+    ``statement(low, high)`` may be given instead of ``values`` to build the
+    chunk's statement for keys in ``(low, high]`` some other way.
+    """
+
+    def __init__(self, name, table, values=None, where=None, statement=None, description=""):
+        if len(name) > MAX_NAME:
+            raise ValueError(f"Backfill name '{name}' is longer than {MAX_NAME} characters")
+        if (values is None) == (statement is None):
+            raise ValueError("Give either values or statement")
+        (self.key,) = table.primary_key.columns
+        self.name = name
+        self.table = table
+        self.values = values
+        self.where = where
+        self._statement = statement
+        self.description = description
+        self.sharded = table.name in sharding.SHARDED_TABLES
+
+    def statement(self, low, high):
+        if self._statement is not None:
+            return self._statement(low, high)
+        stmt = update(self.table).where(self.key > low, self.key <= high)
+        if self.where is not None:
+            stmt = stmt.where(self.where)
+        return stmt.values(self.values)
+
+    def checkpoint(self, shard):
+        name = CHECKPOINT_PREFIX + self.name
+        return name if shard is None else f"{name}:{shard}"
+
+    def shards(self):
+        return sharding.keys() if self.sharded else [None]
+
+
+def register(name, table, **kwargs):
+    """Define a backfill runnable by name; see ``Backfill`` for the arguments"""
+    if name in BACKFILLS:
+        raise ValueError(f"Backfill '{name}' is already registered")
+    BACKFILLS[name] = backfill = Backfill(name, table, **kwargs)
+    return backfill
+
+
+def get(name):
+    import backfill_tasks  # noqa: F401  registers the backfills
+
+    try:
+        return BACKFILLS[name]
+    except KeyError:
+        raise ValueError(f"Unknown backfill '{name}'. Registered: {', '.join(sorted(BACKFILLS)) or 'none'}") from None
+
+
+def _wait_for_replicas(max_lag):
+    pool = current_app.extensions.get("replicas")
+    if pool is None or max_lag is None:
+        return
+    while True:
+        lag = pool.current_lag()
+        if lag <= max_lag:
+            return
+        logger.info("Replicas are %s seconds behind, waiting", lag)
+        time.sleep(min(lag - max_lag, 5))
+
+
+def _chunk_end(key, position, chunk_size, end):
+    """Key of the ``chunk_size``-th row after ``position``, or ``end`` for the last chunk"""
+    boundary = db.session.execute(
+        select(key).where(key > position, key <= end).order_by(key).offset(chunk_size - 1).limit(1)
+    ).scalar()
+    return end if boundary is None else boundary
+
+
+def _run_shard(backfill, shard, chunk_size, pause, throttle, max_lag, progress):
+    checkpoint = backfill.checkpoint(shard)
+    position = checkpoints.load(checkpoint)
+    first, end = db.session.execute(
+        select(func.min(backfill.key), func.max(backfill.key)).where(backfill.key > position)
+    ).one()
+    db.session.commit()
+    if end is None:
+        return 0
+    # Progress counts from the first key left, shards' ids start far above 0
+    start = first - 1
+    rows = chunks = 0
+    started = time.monotonic()
+    while position < end:
+        _wait_for_replicas(max_lag)
+        chunk_started = time.monotonic()
+        try:
+            high = _chunk_end(backfill.key, position, chunk_size, end)
+            rows += db.session.execute(backfill.statement(position, high)).rowcount
+            checkpoints.save(checkpoint, high)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        position = high
+        chunks += 1
+        elapsed = time.monotonic() - started
+        done = (position - start) / (end - start)
+        if progress is not None:
+            progress({
+                "name": backfill.name, "shard": shard, "position": position, "end": end,
+                "rows": rows, "chunks": chunks, "elapsed": elapsed, "done": done,
+                "rows_per_second": rows / elapsed if elapsed else 0.0,
+                "eta": elapsed / done - elapsed if done else None,
+            })
+        if position < end:
+            time.sleep(pause + throttle * (time.monotonic() - chunk_started))
+    return rows
+
+
+def run(name, chunk_size=None, pause=None, throttle=None, max_lag=None, restart=False, progress=None):
+    """Run backfill ``name`` (or a ``Backfill``) to the end; returns rows changed per shard.
+
+    Options default to the BACKFILL_* settings. ``restart`` starts over
+    from the lowest key, ``progress`` is called with a dict of stats after
+    every chunk.
+    """
+    backfill = name if isinstance(name, Backfill) else get(name)
+    config = current_app.config
+    chunk_size = chunk_size or config.get("BACKFILL_CHUNK_SIZE", 1000)
+    pause = config.get("BACKFILL_PAUSE", 0.0) if pause is None else pause
+    throttle = config.get("BACKFILL_THROTTLE", 0.5) if throttle is None else throttle
+    max_lag = config.get("BACKFILL_MAX_REPLICA_LAG") if max_lag is None else max_lag
+
+    changed = {}
+    for shard in backfill.shards():
+        with sharding.use(shard):
+            if restart:
+                checkpoints.save(backfill.checkpoint(shard), 0)
+                db.session.commit()
+            changed[shard] = _run_shard(backfill, shard, chunk_size, pause, throttle, max_lag, progress)
+    return changed
+
+
+def status(name):
+    """``[(shard, position, end)]`` of backfill ``name``"""
+    backfill = get(name)
+    rows = []
+    for shard in backfill.shards():
+        with sharding.use(shard):
+            end = db.session.execute(select(func.max(backfill.key))).scalar() or 0
+            rows.append((shard, checkpoints.load(backfill.checkpoint(shard)), end))
+    return rows
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def register_commands(app):
+    @app.cli.command("backfill")
+    @click.argument("name", required=False)
+    @click.option("--chunk-size", type=int, default=None, help="Rows per transaction [BACKFILL_CHUNK_SIZE]")
+    @click.option("--pause", type=float, default=None, help="Seconds to sleep after each chunk [BACKFILL_PAUSE]")
+    @click.option("--throttle", type=float, default=None,
+                  help="Also sleep this many times as long as each chunk took [BACKFILL_THROTTLE]")
+    @click.option("--restart", is_flag=True, help="Start over instead of resuming from the checkpoint")
+    @click.option("--report-every", type=float, default=5.0, show_default=True, help="Seconds between progress lines")
+    def backfill_command(name, chunk_size, pause, throttle, restart, report_every):
+        """Run backfill NAME in small resumable chunks; without NAME, list backfills"""
+        if name is None:
+            import backfill_tasks  # noqa: F401  registers the backfills
+            for backfill in sorted(BACKFILLS.values(), key=lambda b: b.name):
+                print(f"{backfill.name}: {backfill.description}")
+                for shard, position, end in status(backfill.name):
+                    state = "done" if position >= end else f"at {position:,} of {end:,}"
+                    print(f"  {shard or 'main database'}: {state}")
+            return
+
+        last = [0.0]
+
+        def report(stats):
+            now = time.monotonic()
+            if now - last[0] < report_every and stats["position"] < stats["end"]:
+                return
+            last[0] = now
+            print(f"{stats['name']} [{stats['shard'] or 'main'}] {stats['done']:6.1%}  "
+                  f"{stats['rows']:,} rows  {stats['rows_per_second']:,.0f} rows/s  "
+                  f"ETA {_format_seconds(stats['eta'])}")
+
+        try:
+            changed = run(name, chunk_size=chunk_size, pause=pause, throttle=throttle,
+                          restart=restart, progress=report)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        except KeyboardInterrupt:
+            print("Interrupted, run again to resume from the last chunk")
+            return
+        print(f"Backfill {name} done, {sum(changed.values()):,} rows changed")
@@ -0,0 +1,18 @@
+"""Backfills runnable with ``flask backfill NAME`` (see backfill.py)"""
+from sqlalchemy import select, func
+
+from backfill import register
+from models import Order, OrderItem
+
+order_table = Order.__table__
+item_table = OrderItem.__table__
+
+# create_order only started filling in order.total alongside this backfill
+register(
+    "order-totals", order_table,
+    values={"total": select(func.coalesce(func.sum(item_table.c.price * item_table.c.quantity), 0))
+            .where(item_table.c.order_id == order_table.c.id)
+            .scalar_subquery()},
+    where=order_table.c.total.is_(None),
+    description="Fill in order.total from the order's items",
+)
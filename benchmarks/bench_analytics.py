@@ -0,0 +1,124 @@
+"""Ad-hoc order reports: NumPy order line cube vs the same GROUP BY in SQL.
+
+Seeds LINES order lines (10M by default, pass a smaller number as the first
+argument for a quick run) and answers three merchandising questions both
+ways. SQL timings are for SQLite; the shape of the comparison is what
+matters, a server database scans the same rows.
+"""
+import sys
+import time
+
+import numpy as np
+
+from bench_utils import make_app, report
+
+LINES = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+LINES_PER_ORDER = 4
+PRODUCTS = 10_000
+CATEGORIES = 20
+DAYS = 365
+
+
+def seed(db):
+    rng = np.random.default_rng(7)
+    orders = LINES // LINES_PER_ORDER
+    start = np.datetime64("2025-01-01T00:00:00")
+    created = start + rng.integers(0, DAYS * 86400, orders).astype("timedelta64[s]")
+    created_text = np.datetime_as_string(created, unit="us")
+    created_text = np.char.replace(created_text, "T", " ")
+    prices = np.round(rng.gamma(2.0, 30.0, PRODUCTS) + 1, 2)
+
+    raw = db.engine.raw_connection()
+    cursor = raw.cursor()
+    cursor.execute("INSERT INTO user (id, username, email, password) VALUES (1, 'u', 'u@example.com', 'x')")
+    cursor.executemany(
+        "INSERT INTO product (id, name, category, price, stock, change_seq) VALUES (?, ?, ?, ?, 100, 0)",
+        [(i + 1, f"Product {i}", f"cat{i % CATEGORIES}", float(prices[i])) for i in range(PRODUCTS)],
+    )
+    cursor.executemany(
+        "INSERT INTO \"order\" (id, user_id, status, created_at) VALUES (?, 1, 'Delivered', ?)",
+        zip(range(1, orders + 1), created_text.tolist()),
+    )
+    chunk = 1_000_000
+    for offset in range(0, LINES, chunk):
+        count = min(chunk, LINES - offset)
+        ids = np.arange(offset + 1, offset + count + 1)
+        product_ids = rng.integers(1, PRODUCTS + 1, count)
+        cursor.executemany(
+            "INSERT INTO order_item (id, order_id, product_id, quantity, price) VALUES (?, ?, ?, ?, ?)",
+            zip(ids.tolist(), ((ids - 1) // LINES_PER_ORDER + 1).tolist(), product_ids.tolist(),
+                rng.integers(1, 4, count).tolist(), prices[product_ids - 1].tolist()),
+        )
+    raw.commit()
+    raw.close()
+
+
+def timed(fn, repeat=3):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    app = make_app()
+    from app import db
+    from sqlalchemy import text
+    import analytics
+
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db)
+        report(f"seed {LINES:,} lines", time.perf_counter() - start)
+
+        cube = analytics.OrderCube()
+        start = time.perf_counter()
+        cube.load(db.session)
+        report("cube load from database", time.perf_counter() - start)
+        memory = sum(cube.column(name).nbytes for name, _ in cube.COLUMNS)
+        print(f"{'cube memory':<40} {memory / 1e6:10.1f} MB")
+
+        questions = [
+            (
+                "revenue by category x hour-of-week",
+                dict(group_by=["category", "hour_of_week"], measures=["revenue"], limit=1000),
+                """SELECT p.category, (CAST(strftime('%w', o.created_at) AS INTEGER) + 6) % 7 * 24
+                          + CAST(strftime('%H', o.created_at) AS INTEGER) AS how,
+                          SUM(i.price * i.quantity) AS revenue
+                   FROM order_item i JOIN "order" o ON o.id = i.order_id
+                   JOIN product p ON p.id = i.product_id
+                   GROUP BY 1, 2 ORDER BY revenue DESC LIMIT 1000""",
+                2,
+            ),
+            (
+                "revenue + orders by price band",
+                dict(group_by=["price_band"], measures=["revenue", "orders"], price_band=25),
+                """SELECT CAST(i.price / 25 AS INTEGER) AS band, SUM(i.price * i.quantity) AS revenue,
+                          COUNT(DISTINCT i.order_id) AS orders
+                   FROM order_item i GROUP BY 1 ORDER BY revenue DESC""",
+                1,
+            ),
+            (
+                "top 20 products in one quarter",
+                dict(group_by=["product"], measures=["revenue", "units"], limit=20,
+                     filters={"from": "2025-04-01", "to": "2025-06-30"}),
+                """SELECT i.product_id, SUM(i.price * i.quantity) AS revenue, SUM(i.quantity) AS units
+                   FROM order_item i JOIN "order" o ON o.id = i.order_id
+                   WHERE o.created_at >= '2025-04-01' AND o.created_at < '2025-07-01'
+                   GROUP BY 1 ORDER BY revenue DESC LIMIT 20""",
+                1,
+            ),
+        ]
+        for label, spec, sql, revenue_column in questions:
+            cube_seconds, (rows, _, _) = timed(lambda: cube.query(**spec))
+            sql_seconds, sql_rows = timed(lambda: db.session.execute(text(sql)).all(), repeat=1)
+            # Both sides must agree on the top group's revenue
+            assert abs(rows[0]["revenue"] - sql_rows[0][revenue_column]) < 0.01 * rows[0]["revenue"]
+            print(label)
+            report("  cube", cube_seconds)
+            report("  sql", sql_seconds)
+
+
+if __name__ == "__main__":
+    main()
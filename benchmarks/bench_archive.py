@@ -0,0 +1,66 @@
+"""Archival throughput, archived order lookup and live-table COUNT before/after.
+
+Seeds ORDERS orders spread over three years, archives the closed ones older
+than two years and reports what counting and listing live orders costs with
+and without them.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import make_app, cpu_per_call, report
+
+ORDERS = 200_000
+ITEMS_PER_ORDER = 3
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="bench_archive_")
+    app = make_app(ARCHIVE_FOLDER=folder)
+    from app import db
+    from models import User, Product, Order, OrderItem, ArchivePart
+    import archive
+
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add(User(id=1, username="u", email="u@example.com", password="x"))
+        db.session.bulk_insert_mappings(Product, [{
+            "id": i, "name": f"Product {i}", "category": "misc", "price": 10.0, "stock": 10
+        } for i in range(1, 1001)])
+        db.session.bulk_insert_mappings(Order, [{
+            "id": i, "user_id": 1, "status": rng.choice(["Delivered", "Delivered", "Cancelled", "Shipped"]),
+            "created_at": now - timedelta(days=3 * 365) + timedelta(seconds=i * 3 * 365 * 86400 // ORDERS),
+        } for i in range(1, ORDERS + 1)])
+        db.session.bulk_insert_mappings(OrderItem, [{
+            "order_id": i, "product_id": rng.randint(1, 1000), "quantity": 1, "price": 10.0
+        } for i in range(1, ORDERS + 1) for _ in range(ITEMS_PER_ORDER)])
+        db.session.commit()
+
+        count = lambda: Order.query.count()
+        listing = lambda: Order.query.order_by(Order.created_at.desc()).limit(10).all()
+        report("orders COUNT before", cpu_per_call(count, 20))
+        report("orders listing page before", cpu_per_call(listing, 20))
+
+        stats = archive.archive_orders(folder, archive.cutoff_for(app.config), chunk_size=app.config["ARCHIVE_CHUNK_SIZE"])
+        report(f"archive {stats['orders']:,} orders", stats["seconds"])
+        size = sum(part.bytes for part in ArchivePart.query.all())
+        print(f"{'archive size':<40} {size / 1e6:10.1f} MB in {ArchivePart.query.count()} files")
+
+        report("orders COUNT after", cpu_per_call(count, 20))
+        report("orders listing page after", cpu_per_call(listing, 20))
+
+        archived_ids = [rng.randint(1, stats["orders"]) for _ in range(200)]
+        archived_ids = [oid for oid in archived_ids if db.session.get(Order, oid) is None]
+        ids = iter(archived_ids * 10)
+        report("archived order lookup", cpu_per_call(lambda: archive.order_detail(folder, next(ids)), 100))
+
+        start = time.perf_counter()
+        archive.sales_between(now - timedelta(days=3 * 365))
+        report("archived sales summary, 3 years", time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Filling in order.total: one UPDATE against the chunked backfill.
+
+Seeds ORDERS orders without totals. While the backfill runs, a writer
+thread keeps committing small stock updates, the kind of write checkout
+does, and records how long each waits. SQLite locks the whole database
+for writes, the worst case of an UPDATE's row locks. Then an interrupted
+run is resumed and the backfill is run on 3 order shards, and once more
+with a read replica configured so the backfill waits on its lag; totals
+are checked against the items every time.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import sqlalchemy as sa
+
+from bench_utils import make_app
+
+ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+
+def seed(db):
+    from models import User, Product, Order, OrderItem
+
+    rng = random.Random(3)
+    db.session.bulk_insert_mappings(User, [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, 1001)
+    ])
+    db.session.bulk_insert_mappings(Product, [
+        {"id": i, "name": f"Product {i}", "category": "misc", "price": float(i), "stock": 10**9} for i in range(1, 201)
+    ])
+    orders, items = [], []
+    for order_id in range(1, ORDERS + 1):
+        orders.append({"id": order_id, "user_id": rng.randint(1, 1000), "status": "Delivered"})
+        items.extend({"order_id": order_id, "product_id": rng.randint(1, 200), "quantity": rng.randint(1, 3),
+                      "price": float(rng.randint(1, 200))} for _ in range(rng.randint(1, 4)))
+    db.session.bulk_insert_mappings(Order, orders)
+    db.session.bulk_insert_mappings(OrderItem, items)
+    db.session.commit()
+
+
+class Writer(threading.Thread):
+    """Commits one small write every few milliseconds and records its latency"""
+
+    def __init__(self, engine):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.latencies = []
+        self.errors = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(sa.text("UPDATE product SET stock = stock - 1 WHERE id = 1"))
+            except sa.exc.OperationalError:
+                self.errors += 1  # "database is locked" after the 5s busy timeout
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.99)], latencies[-1], self.errors
+
+
+def reset_totals():
+    from app import db
+    from models import Order
+    import sharding
+
+    for key in sharding.keys():
+        with sharding.use(key):
+            db.session.execute(sa.update(Order.__table__).values(total=None))
+    db.session.commit()
+
+
+def check_totals():
+    from app import db
+    from models import Order, OrderItem
+    import sharding
+
+    order_table, item_table = Order.__table__, OrderItem.__table__
+    for key in sharding.keys():
+        with sharding.use(key):
+            wrong = db.session.execute(
+                sa.select(sa.func.count()).select_from(order_table).where(
+                    sa.or_(order_table.c.total.is_(None), sa.func.abs(order_table.c.total - (
+                        sa.select(sa.func.sum(item_table.c.price * item_table.c.quantity))
+                        .where(item_table.c.order_id == order_table.c.id).scalar_subquery()
+                    )) > 0.001)
+                )
+            ).scalar()
+            assert wrong == 0, f"{wrong} orders with a wrong total on {key or 'main'}"
+
+
+def timed(label, fn):
+    from app import db
+
+    writer = Writer(db.engines[None])
+    writer.start()
+    time.sleep(0.2)
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    time.sleep(0.2)
+    p99, worst, errors = writer.stop()
+    print(f"{label:<34} {elapsed:7.2f}s   writer p99 {p99 * 1000:7.1f}ms  max {worst * 1000:7.1f}ms  "
+          f"failed {errors}")
+    return result
+
+
+def main():
+    import backfill
+
+    folder = tempfile.mkdtemp(prefix="bench_backfill_")
+    db_path = os.path.join(folder, "main.db")
+    app = make_app(db_path, RATELIMIT_ENABLED=False)
+    from app import db
+    with app.app_context():
+        seed(db)
+        task = backfill.get("order-totals")
+        print(f"{ORDERS:,} orders without totals")
+
+        def single_update():
+            db.session.execute(task.statement(0, ORDERS))
+            db.session.commit()
+
+        timed("one UPDATE", single_update)
+        check_totals()
+
+        for chunk_size, throttle in ((1000, 0.0), (1000, 0.5), (5000, 0.5)):
+            reset_totals()
+            changed = timed(f"backfill, {chunk_size} rows, throttle {throttle}",
+                            lambda: backfill.run(task, chunk_size=chunk_size, throttle=throttle, restart=True))
+            assert sum(changed.values()) == ORDERS
+            check_totals()
+
+        # Interrupt after 50 chunks, then resume
+        reset_totals()
+        seen = []
+
+        def interrupt(stats):
+            seen.append(stats)
+            if len(seen) == 50:
+                raise KeyboardInterrupt
+
+        try:
+            backfill.run(task, chunk_size=1000, throttle=0, restart=True, progress=interrupt)
+        except KeyboardInterrupt:
+            pass
+        db.session.rollback()
+        last = seen[-1]
+        print(f"interrupted at {last['done']:.1%}, {last['rows_per_second']:,.0f} rows/s, "
+              f"ETA was {last['eta']:.1f}s")
+        changed = backfill.run(task, chunk_size=1000, throttle=0)
+        print(f"resumed: {sum(changed.values()):,} more rows")
+        assert last["rows"] + sum(changed.values()) == ORDERS
+        check_totals()
+
+    shards = [f"sqlite:///{os.path.join(folder, f'shard{i}.db')}" for i in range(3)]
+    app = make_app(db_path, RATELIMIT_ENABLED=False, ORDER_SHARDS=shards)
+    import sharding
+    with app.app_context():
+        sharding.reshard()
+        reset_totals()
+        started = time.perf_counter()
+        changed = backfill.run("order-totals", chunk_size=1000, throttle=0, restart=True)
+        print(f"3 shards: {changed} in {time.perf_counter() - started:.2f}s")
+        assert sum(changed.values()) == ORDERS
+        check_totals()
+
+    # With a read replica the backfill checks its lag before every chunk. The
+    # replica is the main database file itself, so it never lags.
+    app = make_app(db_path, RATELIMIT_ENABLED=False, ORDER_SHARDS=shards, REPLICA_URIS=[f"sqlite:///{db_path}"])
+    with app.app_context():
+        pool = app.extensions["replicas"]
+        reset_totals()
+        checked = []
+        current_lag = pool.current_lag
+        pool.current_lag = lambda: checked.append(1) or current_lag()
+        changed = backfill.run("order-totals", chunk_size=5000, throttle=0, restart=True)
+        print(f"with a replica: {sum(changed.values()):,} rows, replica lag checked {len(checked)} times")
+        assert sum(changed.values()) == ORDERS and checked
+        check_totals()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare the ORM and Core read paths behind the public catalog endpoints"""
+import random
+
+from bench_utils import make_app, cpu_per_call, report
+
+PRODUCTS = 5000
+PER_PAGE = 48
+
+
+def seed(db, Product):
+    categories = ["keyboards", "mice", "headphones", "storage", "cooling"]
+    db.session.bulk_insert_mappings(Product, [{
+        "name": f"Product {i}",
+        "category": random.choice(categories),
+        "price": round(random.uniform(5, 500), 2),
+        "stock": random.randint(0, 100),
+        "img": f"product{i}.jpeg",
+        "description": "Lorem ipsum " * 20,
+    } for i in range(PRODUCTS)])
+    db.session.commit()
+
+
+def main():
+    app = make_app()
+    from app import db
+    from models import Product
+    import catalog_reads
+
+    with app.app_context():
+        seed(db, Product)
+
+        def orm_listing():
+            page = Product.query.order_by(Product.price.asc()).paginate(
+                page=3, per_page=PER_PAGE, error_out=False
+            )
+            result = [{
+                "id": p.id, "name": p.name, "category": p.category, "price": p.price,
+                "stock": p.stock, "img": p.img, "description": p.description
+            } for p in page.items]
+            db.session.remove()
+            return result
+
+        def core_listing():
+            rows, _, _ = catalog_reads.list_products(3, PER_PAGE, sort_by="price")
+            result = [catalog_reads.product_to_dict(row) for row in rows]
+            db.session.remove()
+            return result
+
+        def orm_single():
+            product = Product.query.get(PRODUCTS // 2)
+            result = {"id": product.id, "name": product.name, "description": product.description}
+            db.session.remove()
+            return result
+
+        def core_single():
+            result = catalog_reads.product_to_dict(catalog_reads.get_product(PRODUCTS // 2))
+            db.session.remove()
+            return result
+
+        assert orm_listing() == core_listing()
+
+        orm, core = cpu_per_call(orm_listing), cpu_per_call(core_listing)
+        report("listing (ORM paginate)", orm)
+        report("listing (catalog_reads)", core)
+        report("  saved per request", orm - core)
+
+        orm, core = cpu_per_call(orm_single, 2000), cpu_per_call(core_single, 2000)
+        report("single product (ORM get)", orm)
+        report("single product (catalog_reads)", core)
+        report("  saved per request", orm - core)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Dashboard load: five panel requests in a row vs one parallel bootstrap call.
+
+Wall time is what the admin waits before every panel can render. SQLite
+runs in-process, so a short sleep per statement stands in for the network
+round trip to a database server; that waiting is what the parallel panels
+overlap.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import make_app, report
+
+PRODUCTS = 500
+ORDERS = 2000
+RUNS = 5
+QUERY_RTT = 0.0005  # seconds added to every statement
+
+
+def main():
+    app = make_app()
+    from app import db
+    from models import User, Product, Order, OrderItem, Admin
+    from flask_jwt_extended import create_access_token
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import event
+
+    with app.app_context():
+        admin = Admin(username="bench", password=generate_password_hash("x"))
+        db.session.add(admin)
+        db.session.bulk_insert_mappings(Product, [{
+            "name": f"Product {i}", "category": f"cat{i % 12}", "price": 10.0 + i % 90, "stock": i % 40
+        } for i in range(PRODUCTS)])
+        db.session.bulk_insert_mappings(User, [{
+            "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"
+        } for i in range(200)])
+        now = datetime.now()
+        db.session.bulk_insert_mappings(Order, [{
+            "user_id": random.randint(1, 200), "status": "Pending",
+            "created_at": now - timedelta(hours=random.randint(0, 24 * 20))
+        } for _ in range(ORDERS)])
+        db.session.bulk_insert_mappings(OrderItem, [{
+            "order_id": order_id, "product_id": random.randint(1, PRODUCTS),
+            "quantity": random.randint(1, 3), "price": 25.0
+        } for order_id in range(1, ORDERS + 1) for _ in range(2)])
+        db.session.commit()
+        token = create_access_token(identity=str(admin.id))
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *args: time.sleep(QUERY_RTT))
+
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    panels = ["/api/admin/profile", "/api/admin/dashboard/stats", "/api/admin/orders",
+              "/api/admin/sales?period=month", "/api/admin/categories"]
+
+    def sequential():
+        for url in panels:
+            assert client.get(url, headers=headers).status_code == 200
+
+    def bootstrap():
+        response = client.get("/api/admin/dashboard/bootstrap?period=month", headers=headers)
+        assert response.status_code == 200 and not response.get_json()["errors"]
+
+    for label, fn in (("5 panel requests, sequential", sequential), ("bootstrap, parallel panels", bootstrap)):
+        fn()
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            fn()
+        report(label, (time.perf_counter() - start) / RUNS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Order event log: append throughput and replay speed.
+
+Appends EVENTS order events with the background fsync (the default) and
+with an fsync after every append, from one and from several threads, then
+replays the log from offset 0 without decoding (the mmap views only) and
+decoded into dicts, and resumes a checkpointed consumer. Segments are kept
+small so replay crosses a few of them.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import make_app
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+SYNC_EVENTS = 2000
+THREADS = 8
+
+
+def order_event(i):
+    return {"type": "order_created", "order_id": i, "user_id": i % 997, "status": "Pending",
+            "ts": 1760000000.0 + i, "items": [{"product_id": i % 5000 + 1, "quantity": 1, "price": 19.99}]}
+
+
+def rate(label, count, seconds):
+    print(f"{label:<40} {count / seconds:12,.0f} events/s")
+
+
+def append_all(log, count, threads=1, sync=False):
+    def worker(start):
+        for i in range(start, count, threads):
+            log.append(order_event(i), sync=sync)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    log.flush()
+    return time.perf_counter() - started
+
+
+def main():
+    import eventlog
+
+    def fresh_log():
+        return eventlog.EventLog(tempfile.mkdtemp(prefix="bench_eventlog_"), segment_bytes=16 << 20)
+
+    log = fresh_log()
+    rate("append, batched fsync", EVENTS, append_all(log, EVENTS))
+    print(f"{'  fsyncs issued':<40} {log.fsyncs:12,}")
+    log.close()
+
+    log = fresh_log()
+    rate(f"append, {THREADS} threads, batched fsync", EVENTS, append_all(log, EVENTS, THREADS))
+    log.close()
+
+    log = fresh_log()
+    rate("append, fsync per event", SYNC_EVENTS, append_all(log, SYNC_EVENTS, sync=True))
+    log.close()
+
+    log = fresh_log()
+    append_all(log, EVENTS)
+    log.close()
+    folder = log.folder
+    size = sum(os.path.getsize(os.path.join(folder, segment))
+               for segment in map(eventlog.segment_name, eventlog.list_segments(folder)))
+    print(f"{'log size':<40} {size / 1e6:12.1f} MB in {len(eventlog.list_segments(folder))} segment(s)")
+
+    started = time.perf_counter()
+    count = sum(1 for _ in eventlog.read(folder))
+    rate("replay, mmap views (crc checked)", count, time.perf_counter() - started)
+    assert count == EVENTS
+
+    started = time.perf_counter()
+    count = sum(1 for _ in eventlog.read(folder, verify=False))
+    rate("replay, mmap views (no crc)", count, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    count = sum(1 for _ in eventlog.events(folder))
+    rate("replay, decoded", count, time.perf_counter() - started)
+
+    app = make_app(EVENTLOG_ENABLED=False)
+    with app.app_context():
+        seen = []
+        started = time.perf_counter()
+        eventlog.consume(folder, "bench", lambda offset, event: seen.append(event["order_id"]),
+                         max_events=EVENTS // 2)
+        eventlog.consume(folder, "bench", lambda offset, event: seen.append(event["order_id"]))
+        rate("consumer, resumed at checkpoint", len(seen), time.perf_counter() - started)
+        assert seen == list(range(EVENTS)), "consumer skipped or repeated events"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Fan-out latency and per-connection cost of the in-process event broker"""
+import threading
+import time
+import tracemalloc
+
+from bench_utils import report
+from events import MemoryBroker, ADMIN_CHANNEL, user_channel
+
+CONNECTIONS = 5000
+EVENTS = 50
+
+
+def main():
+    broker = MemoryBroker(queue_size=EVENTS + 1)
+
+    tracemalloc.start()
+    subscriptions = [broker.subscribe([user_channel(i % 100), ADMIN_CHANNEL]) for i in range(CONNECTIONS)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'idle subscription memory':<40} {memory / CONNECTIONS:10.0f} bytes each")
+
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        broker.publish(ADMIN_CHANNEL, {"type": "order_created", "order_id": i, "published_at": time.time()})
+    report(f"publish to {CONNECTIONS} subscribers", (time.perf_counter() - start) / EVENTS)
+
+    # Drain with a handful of threads, as blocked SSE handlers would
+    def drain(chunk):
+        for subscription in chunk:
+            while True:
+                event = subscription.get(0)
+                if event is None:
+                    break
+                broker.record_delivery(event)
+
+    threads = [threading.Thread(target=drain, args=(subscriptions[i::8],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = broker.stats()
+    print(f"{'connections':<40} {stats['connections']:10d}")
+    print(f"{'delivered':<40} {stats['delivered']:10d}")
+    print(f"{'fan-out latency p50 / p99':<40} {stats['fanout_latency_ms']['p50']:8.2f} / "
+          f"{stats['fanout_latency_ms']['p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
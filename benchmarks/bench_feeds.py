@@ -0,0 +1,45 @@
+"""Full and incremental feed generation time and memory on 1M products"""
+import resource
+import tempfile
+import time
+
+from bench_utils import make_app, report
+
+PRODUCTS = 1_000_000
+BATCH = 50_000
+
+
+def main():
+    app = make_app(FEED_FOLDER=tempfile.mkdtemp(prefix="feeds_"))
+    from app import db
+    from models import Product
+    import changefeed
+    import feeds
+
+    with app.app_context():
+        start = time.perf_counter()
+        for offset in range(0, PRODUCTS, BATCH):
+            db.session.bulk_insert_mappings(Product, [{
+                "name": f"Product {i}", "category": "accessories", "price": 9.99 + i % 100,
+                "stock": i % 7, "img": f"product{i}.jpeg", "description": "Feed description " * 8,
+            } for i in range(offset, offset + BATCH)])
+            db.session.commit()
+        report("seed 1M products", time.perf_counter() - start)
+
+        for fmt in feeds.FORMATS:
+            stats = feeds.generate_all(app, [fmt], full=True)[0]
+            report(f"full {fmt} feed ({stats['chunks']} chunks)", stats["seconds"])
+
+        # Touch a few products spread over three chunks
+        changefeed.mark_changed([5, 6, 250_000, 999_000])
+        db.session.commit()
+        for fmt in feeds.FORMATS:
+            stats = feeds.generate_all(app, [fmt])[0]
+            report(f"incremental {fmt} ({stats['rendered']} chunks)", stats["seconds"])
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{'peak RSS':<40} {peak / 1024:10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
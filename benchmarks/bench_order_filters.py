@@ -0,0 +1,219 @@
+"""Filtered and sorted admin order lists (see order_reads.py).
+
+Seeds ORDERS orders with statuses, dates and totals, then times
+/api/admin/orders with each filter and sort, first without the order
+list indexes and then with them. Every page and count is checked against
+the same filter applied in Python to all orders, unsharded and on 3
+shards, and so are the first pages walked with the next_after cursor; a
+broad filter shows the capped count.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from bench_utils import make_app, cpu_per_call, report
+
+ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+USERS = 5000
+PRODUCTS = 500
+STATUSES = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled"]
+START = datetime(2025, 1, 1)
+
+INDEXES = ["ix_order_created_at_id", "ix_order_status_created_at", "ix_order_user_id_created_at",
+           "ix_order_total_id", "ix_order_item_product_id_order_id"]
+
+VIEWS = [
+    ("newest", ""),
+    ("newest, page 20", "page=20"),
+    ("status Pending", "status=Pending"),
+    ("status Pending,Shipped by total", "status=Pending,Shipped&sort_by=total"),
+    ("one week", "created_from=2025-03-01&created_to=2025-03-08"),
+    ("customer 42", "user_id=42"),
+    ("email user12*", "email=user12"),
+    ("product 7", "product_id=7"),
+    ("total 100-110", "min_total=100&max_total=110"),
+    ("largest totals", "sort_by=total"),
+    ("smallest totals", "sort_by=total&sort_order=asc"),
+    ("by status, oldest first", "sort_by=status&sort_order=asc"),
+    ("Delivered, week, over 500", "status=Delivered&created_from=2025-03-01&created_to=2025-03-08&min_total=500"),
+]
+
+
+def seed(db):
+    from models import User, Product, Order, OrderItem
+
+    rng = random.Random(11)
+    db.session.bulk_insert_mappings(User, [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"}
+        for i in range(1, USERS + 1)
+    ])
+    db.session.bulk_insert_mappings(Product, [
+        {"id": i, "name": f"Product {i}", "category": "misc", "price": float(i), "stock": 1_000_000}
+        for i in range(1, PRODUCTS + 1)
+    ])
+    orders, items = [], []
+    for order_id in range(1, ORDERS + 1):
+        lines = [(rng.randint(1, PRODUCTS), rng.randint(1, 3), float(rng.randint(1, 300))) for _ in range(rng.randint(1, 4))]
+        orders.append({
+            "id": order_id, "user_id": rng.randint(1, USERS), "status": rng.choice(STATUSES),
+            "created_at": START + timedelta(minutes=rng.randint(0, 400_000)),
+            # A few old orders still wait for the order-totals backfill
+            "total": None if rng.random() < 0.01 else sum(price * quantity for _, quantity, price in lines),
+        })
+        items.extend({"order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price}
+                     for product_id, quantity, price in lines)
+    db.session.bulk_insert_mappings(Order, orders)
+    db.session.bulk_insert_mappings(OrderItem, items)
+    db.session.commit()
+
+
+def all_orders(app):
+    """Every order with its customer's email and product ids, from every shard"""
+    from app import db
+    from models import Order, OrderItem, User
+    import sharding
+
+    with app.app_context():
+        emails = dict(db.session.query(User.id, User.email))
+
+        def shard_orders():
+            products = {}
+            for order_id, product_id in db.session.query(OrderItem.order_id, OrderItem.product_id):
+                products.setdefault(order_id, set()).add(product_id)
+            return [(order, products.get(order.id, set())) for order in db.session.query(
+                Order.id, Order.user_id, Order.status, Order.total, Order.created_at
+            )]
+
+        return [(order, emails.get(order.user_id, ""), products)
+                for _, rows in sharding.gather(shard_orders) for order, products in rows]
+
+
+def expected(orders, query, per_page=10):
+    """Ids on the requested page and the match count, by brute force"""
+    import order_reads
+
+    args = dict(part.split("=", 1) for part in query.split("&") if part)
+    filters = order_reads.parse_filters(args)
+    page = int(args.get("page", 1))
+    sort_by = args.get("sort_by", "created_at")
+
+    def matches(order, email, products):
+        return ((order.status in filters.get("status", [order.status]))
+                and ("created_from" not in filters or order.created_at >= filters["created_from"])
+                and ("created_to" not in filters or order.created_at < filters["created_to"])
+                and ("user_id" not in filters or order.user_id == filters["user_id"])
+                and email.startswith(filters.get("email", ""))
+                and ("product_id" not in filters or filters["product_id"] in products)
+                and ("min_total" not in filters or (order.total is not None and order.total >= filters["min_total"]))
+                and ("max_total" not in filters or (order.total is not None and order.total <= filters["max_total"])))
+
+    found = sorted((order for order, email, products in orders if matches(order, email, products)),
+                   key=order_reads.sort_key(sort_by), reverse=args.get("sort_order", "desc") == "desc")
+    return [order.id for order in found[(page - 1) * per_page:page * per_page]], len(found)
+
+
+def admin_client(app):
+    from flask_jwt_extended import create_access_token
+    from app import db
+    from models import Admin
+
+    with app.app_context():
+        if db.session.get(Admin, 1) is None:
+            db.session.add(Admin(id=1, username="admin", password="x"))
+            db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    client = app.test_client()
+    return lambda query: client.get(f"/api/admin/orders?{query}" if "per_page=" in query
+                                    else f"/api/admin/orders?per_page=10&{query}", headers=headers)
+
+
+def check(app, orders, label):
+    get = admin_client(app)
+    for name, query in VIEWS:
+        body = get(query).get_json()
+        ids, count = expected(orders, query)
+        assert [order["id"] for order in body["orders"]] == ids, f"{label}: wrong page for {name}"
+        assert body["total"] == count and not body["total_capped"], f"{label}: wrong count for {name}"
+    print(f"{label}: {len(VIEWS)} views match a full scan")
+
+    # Walking 5 pages through next_after gives the same pages as page numbers
+    for name, query in VIEWS:
+        if "page=" in query:
+            continue
+        after = None
+        for page in range(1, 6):
+            body = get(query + (f"&after={after}" if after else "")).get_json()
+            ids, _ = expected(orders, f"{query}&page={page}")
+            assert [order["id"] for order in body["orders"]] == ids, f"{label}: wrong page {page} after cursor for {name}"
+            after = body["next_after"]
+            if after is None:
+                break
+    assert len(get("per_page=1000").get_json()["orders"]) == 100
+    assert get("page=100000").status_code == 400 and get("after=bogus").status_code == 400
+    print(f"{label}: cursor pages match too")
+
+
+def time_all(app, label):
+    get = admin_client(app)
+    print(label)
+    for name, query in VIEWS:
+        assert get(query).status_code == 200
+        report(f"  {name}", cpu_per_call(lambda: get(query), 5))
+
+
+def main():
+    import sharding
+
+    folder = tempfile.mkdtemp(prefix="bench_order_filters_")
+    db_path = os.path.join(folder, "main.db")
+    overrides = {"RATELIMIT_ENABLED": False, "ORDER_COUNT_CAP": 0}
+
+    app = make_app(db_path, **overrides)
+    from app import db
+    with app.app_context():
+        seed(db)
+        for index in INDEXES:
+            db.session.execute(sa.text(f"DROP INDEX {index}"))
+        db.session.execute(sa.text("ANALYZE"))
+        db.session.commit()
+    print(f"seeded {ORDERS:,} orders")
+    orders = all_orders(app)
+    check(app, orders, "unsharded")
+    time_all(app, "without the order list indexes")
+
+    with app.app_context():
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in INDEXES:
+                    index.create(db.engine)
+        db.session.execute(sa.text("ANALYZE"))
+        db.session.commit()
+    time_all(app, "with the indexes")
+
+    app = make_app(db_path, **dict(overrides, ORDER_COUNT_CAP=1000))
+    get = admin_client(app)
+    body = get("status=Pending").get_json()
+    print(f"count capped at 1000: total {body['total']:,}, capped {body['total_capped']}")
+    assert body["total"] == 1000 and body["total_capped"]
+    report("  status Pending, capped count", cpu_per_call(lambda: get("status=Pending"), 5))
+    body = get("user_id=42").get_json()
+    assert not body["total_capped"] and body["total"] == expected(orders, "user_id=42")[1]
+
+    shards = [f"sqlite:///{os.path.join(folder, f'shard{i}.db')}" for i in range(3)]
+    app = make_app(db_path, ORDER_SHARDS=shards, **overrides)
+    with app.app_context():
+        sharding.reshard()
+        for key in sharding.keys():
+            with sharding.use(key):
+                db.session.execute(sa.text("ANALYZE"))
+                db.session.commit()
+    check(app, all_orders(app), "3 shards")
+    time_all(app, "3 shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Co-purchase build cost and recommendation lookup latency.
+
+Seeds ORDERS orders over PRODUCTS products where products mostly sell with
+a few "companion" products, runs a full build, folds in a batch of new
+orders incrementally (checking the result matches a full rebuild) and
+times product and cart lookups.
+"""
+import random
+import time
+from datetime import datetime
+
+from bench_utils import make_app, cpu_per_call, report
+
+PRODUCTS = 5000
+ORDERS = 100_000
+NEW_ORDERS = 2000
+
+
+def seed_orders(db, Order, OrderItem, first_id, count, rng):
+    orders, items = [], []
+    for order_id in range(first_id, first_id + count):
+        orders.append({"id": order_id, "user_id": 1, "status": "Delivered", "created_at": datetime.utcnow()})
+        anchor = rng.randint(1, PRODUCTS)
+        basket = {anchor}
+        for _ in range(rng.randint(0, 4)):
+            # Companions sit close to the anchor, with some random noise
+            basket.add(rng.randint(1, PRODUCTS) if rng.random() < 0.3 else (anchor + rng.randint(1, 5)) % PRODUCTS + 1)
+        items.extend({"order_id": order_id, "product_id": pid, "quantity": 1, "price": 10.0} for pid in basket)
+    db.session.bulk_insert_mappings(Order, orders)
+    db.session.bulk_insert_mappings(OrderItem, items)
+    db.session.commit()
+
+
+def main():
+    app = make_app()
+    from app import db
+    from models import User, Product, Order, OrderItem, ProductRecommendation
+    import recommendations
+
+    rng = random.Random(11)
+    with app.app_context():
+        db.session.add(User(id=1, username="u", email="u@example.com", password="x"))
+        db.session.bulk_insert_mappings(Product, [{
+            "id": i, "name": f"Product {i}", "category": "misc", "price": 10.0, "stock": 10
+        } for i in range(1, PRODUCTS + 1)])
+        seed_orders(db, Order, OrderItem, 1, ORDERS, rng)
+
+        start = time.perf_counter()
+        recommendations.build(settle_seconds=0)
+        report(f"full build, {ORDERS:,} orders", time.perf_counter() - start)
+
+        seed_orders(db, Order, OrderItem, ORDERS + 1, NEW_ORDERS, rng)
+        start = time.perf_counter()
+        recommendations.build(settle_seconds=0)
+        report(f"incremental, {NEW_ORDERS:,} new orders", time.perf_counter() - start)
+
+        incremental = {row.product_id: row.neighbors for row in ProductRecommendation.query.all()}
+        recommendations.build(full=True, settle_seconds=0)
+        rebuilt = {row.product_id: row.neighbors for row in ProductRecommendation.query.all()}
+        assert incremental == rebuilt, "incremental build differs from a full rebuild"
+
+        cart = [rng.randint(1, PRODUCTS) for _ in range(5)]
+        recommendations.clear_cache()
+        start = time.perf_counter()
+        recommendations.for_products(app, [cart[0]])
+        report("product lookup, cold cache", time.perf_counter() - start)
+        report("product lookup, cached", cpu_per_call(lambda: recommendations.for_products(app, [cart[0]]), 2000))
+        report("5-item cart lookup, cached", cpu_per_call(lambda: recommendations.for_products(app, cart), 2000))
+
+        client = app.test_client()
+        report("GET /api/recommendations (cart)",
+               cpu_per_call(lambda: client.get(f"/api/recommendations?product_ids={','.join(map(str, cart))}"), 200))
+
+
+if __name__ == "__main__":
+    main()
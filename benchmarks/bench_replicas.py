@@ -0,0 +1,112 @@
+"""Read-replica routing with SQLite copies standing in for replicas.
+
+The replicas are copies of the main database taken after seeding, so they
+never see later writes, like replicas with unbounded lag. Counts the
+statements each database receives for customer order list requests, checks
+that a customer's own checkout stays visible for the stickiness window (and
+that the stale replica takes over after it), takes a replica out of
+rotation by breaking it and times the per-request routing overhead.
+"""
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import sqlalchemy as sa
+
+from bench_utils import make_app, cpu_per_call, report
+
+REQUESTS = 300
+STICKY_SECONDS = 0.5
+
+
+def seed(app):
+    from app import db
+    from models import User, Product, Order, OrderItem
+
+    with app.app_context():
+        db.session.add(User(id=1, username="u", email="u@example.com", password="x"))
+        db.session.add(Product(id=1, name="Product 1", category="misc", price=10.0, stock=1000))
+        for order_id in range(1, 21):
+            db.session.add(Order(id=order_id, user_id=1, status="Delivered"))
+            db.session.add(OrderItem(order_id=order_id, product_id=1, quantity=1, price=10.0))
+        db.session.commit()
+
+
+def count_statements(app, names):
+    """Count statements per database, by bind key"""
+    from app import db
+
+    counts = Counter()
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = names.get(key, key)
+            sa.event.listen(engine, "before_cursor_execute",
+                            lambda *args, name=name: counts.update([name]))
+    return counts
+
+
+def main():
+    folder = tempfile.mkdtemp(prefix="bench_replicas_")
+    db_path = os.path.join(folder, "main.db")
+    seed(make_app(db_path))
+    replica_paths = [os.path.join(folder, f"replica{i}.db") for i in range(2)]
+    for path in replica_paths:
+        shutil.copy(db_path, path)
+
+    # Apps share ``db``, whose metadata keeps every bind seen so far: build
+    # the one without replicas first
+    plain = make_app(db_path, RATELIMIT_ENABLED=False)
+    app = make_app(
+        db_path, RATELIMIT_ENABLED=False, REPLICA_STICKY_SECONDS=STICKY_SECONDS, REPLICA_HEALTH_INTERVAL=3600,
+        REPLICA_URIS=[f"sqlite:///{path}" for path in replica_paths],
+    )
+    counts = count_statements(app, {None: "primary"})
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    client = app.test_client()
+
+    for _ in range(REQUESTS):
+        assert client.get("/api/user/orders", headers=headers).status_code == 200
+    print(f"{REQUESTS} order list requests: {dict(counts)}")
+    assert counts["primary"] == 0 and abs(counts["replica_0"] - counts["replica_1"]) <= counts["replica_0"] // 10
+
+    counts.clear()
+    response = client.post("/api/orders", json={"items": [{"product_id": 1, "quantity": 1}]}, headers=headers)
+    order_id = response.get_json()["order_id"]
+    print(f"checkout: {dict(counts)}")
+    assert set(counts) == {"primary"}
+
+    counts.clear()
+    listed = [order["id"] for order in client.get("/api/user/orders", headers=headers).get_json()["orders"]]
+    print(f"order list right after checkout: {dict(counts)}, new order listed: {order_id in listed}")
+    assert order_id in listed and set(counts) == {"primary"}
+
+    time.sleep(STICKY_SECONDS + 0.1)
+    counts.clear()
+    listed = [order["id"] for order in client.get("/api/user/orders", headers=headers).get_json()["orders"]]
+    print(f"order list after the window: {dict(counts)}, new order listed: {order_id in listed}")
+    assert order_id not in listed and "primary" not in counts
+
+    # SQLite can't open a directory, so the health check fails
+    os.remove(replica_paths[1])
+    os.mkdir(replica_paths[1])
+    pool = app.extensions["replicas"]
+    # Pooled connections still hold the old file open; a dead server drops them
+    pool.engines["replica_1"].dispose()
+    pool.check()
+    counts.clear()
+    for _ in range(20):
+        client.get("/api/user/orders", headers=headers)
+    print(f"with replica_1 down: {dict(counts)}")
+    assert set(counts) == {"replica_0"}
+
+    plain_client = plain.test_client()
+    report("order list, primary only", cpu_per_call(lambda: plain_client.get("/api/user/orders", headers=headers), 300))
+    report("order list, via replica", cpu_per_call(lambda: client.get("/api/user/orders", headers=headers), 300))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Rating reads with maintained aggregates vs aggregating 100k reviews at read time"""
+import random
+import time
+
+from bench_utils import make_app, cpu_per_call, report
+
+PRODUCTS = 20
+REVIEWS_PER_PRODUCT = 100_000 // PRODUCTS  # 100k reviews in total
+
+
+def main():
+    app = make_app()
+    from app import db
+    from models import User, Product, Review
+    from sqlalchemy import select, func
+    import reviews
+    import catalog_reads
+
+    with app.app_context():
+        db.session.bulk_insert_mappings(Product, [{
+            "name": f"Product {i}", "category": "audio", "price": 20.0, "stock": 10
+        } for i in range(PRODUCTS)])
+        db.session.bulk_insert_mappings(User, [{
+            "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"
+        } for i in range(REVIEWS_PER_PRODUCT)])
+        for product_id in range(1, PRODUCTS + 1):
+            db.session.bulk_insert_mappings(Review, [{
+                "product_id": product_id, "user_id": user_id, "rating": random.randint(1, 5)
+            } for user_id in range(1, REVIEWS_PER_PRODUCT + 1)])
+        db.session.commit()
+
+        start = time.perf_counter()
+        reviews.reconcile_ratings()
+        report("reconcile 100k reviews", time.perf_counter() - start)
+
+        review_table = Review.__table__
+
+        def aggregate_at_read():
+            return db.session.execute(
+                select(review_table.c.product_id, func.avg(review_table.c.rating))
+                .group_by(review_table.c.product_id)
+                .order_by(func.avg(review_table.c.rating).desc())
+            ).all()
+
+        def maintained():
+            return catalog_reads.list_products(1, PRODUCTS, sort_by="rating", sort_order="desc",
+                                               fields=("id", "rating"))
+
+        report("sort by rating (GROUP BY reviews)", cpu_per_call(aggregate_at_read, 5))
+        report("sort by rating (Product.rating)", cpu_per_call(maintained, 200))
+
+        report("first review page (keyset)", cpu_per_call(lambda: reviews.list_reviews(1, 20), 200))
+        report("deep review page (keyset)", cpu_per_call(lambda: reviews.list_reviews(1, 20, after=200), 200))
+
+        def add_and_remove():
+            review = reviews.add_review(2, 1_000_000, 5)
+            reviews.delete_review(review)
+            db.session.commit()
+
+        report("add + delete review with deltas", cpu_per_call(add_and_remove, 200))
+
+
+if __name__ == "__main__":
+    main()
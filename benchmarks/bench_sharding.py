@@ -0,0 +1,153 @@
+"""Order sharding on local SQLite files: resharding and scatter-gather reads.
+
+Seeds ORDERS orders in the main database as if sharding were off, times the
+admin and customer order views there, then turns on 4 shards, moves the
+orders over with ``reshard`` and times the same views again. Finally a
+fifth shard is appended and resharded to show how few orders jump
+consistent hashing moves. Totals are checked after every move.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import make_app, cpu_per_call, report
+
+ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+USERS = 2000
+PRODUCTS = 500
+
+
+def seed(db):
+    from models import User, Product, Order, OrderItem
+
+    rng = random.Random(5)
+    db.session.bulk_insert_mappings(User, [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"}
+        for i in range(1, USERS + 1)
+    ])
+    db.session.bulk_insert_mappings(Product, [
+        {"id": i, "name": f"Product {i}", "category": "misc", "price": 10.0, "stock": 1_000_000}
+        for i in range(1, PRODUCTS + 1)
+    ])
+    start = datetime(2025, 1, 1)
+    orders, items = [], []
+    for order_id in range(1, ORDERS + 1):
+        orders.append({"id": order_id, "user_id": rng.randint(1, USERS), "status": "Pending",
+                       "created_at": start + timedelta(minutes=rng.randint(0, 500_000))})
+        items.extend({"order_id": order_id, "product_id": rng.randint(1, PRODUCTS), "quantity": 1, "price": 10.0}
+                     for _ in range(rng.randint(1, 4)))
+    db.session.bulk_insert_mappings(Order, orders)
+    db.session.bulk_insert_mappings(OrderItem, items)
+    db.session.commit()
+    return len(items)
+
+
+def shard_rows(app):
+    """Orders and items on each shard"""
+    from app import db
+    from models import Order, OrderItem
+    import sharding
+
+    with app.app_context():
+        return {key: (orders, items) for key, (orders, items) in sharding.gather(
+            lambda: (Order.query.count(), db.session.query(OrderItem).count())
+        )}
+
+
+def check_placement(app):
+    from models import Order
+    import sharding
+
+    with app.app_context():
+        for key in sharding.keys():
+            with sharding.use(key):
+                assert all(sharding.key_for_user(user_id) == key
+                           for user_id, in Order.query.with_entities(Order.user_id)), f"misplaced orders on {key}"
+
+
+def newest_ids(app, count):
+    """The newest order ids by a full scan of every shard"""
+    from models import Order
+    import sharding
+
+    with app.app_context():
+        rows = [row for _, shard in sharding.gather(
+            lambda: Order.query.with_entities(Order.created_at, Order.id).all()
+        ) for row in shard]
+    return [order_id for _, order_id in sorted(rows, reverse=True)[:count]]
+
+
+def time_views(app, label):
+    from flask_jwt_extended import create_access_token
+    from models import Admin
+
+    with app.app_context():
+        if Admin.query.get(1) is None:
+            from app import db
+            db.session.add(Admin(id=1, username="admin", password="x"))
+            db.session.commit()
+        admin = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+        customer = {"Authorization": f"Bearer {create_access_token(identity='42')}"}
+    client = app.test_client()
+    print(label)
+    report("  admin orders, page 1", cpu_per_call(lambda: client.get("/api/admin/orders?page=1", headers=admin), 50))
+    report("  admin orders, page 50", cpu_per_call(lambda: client.get("/api/admin/orders?page=50", headers=admin), 20))
+    report("  dashboard stats", cpu_per_call(lambda: client.get("/api/admin/dashboard/stats", headers=admin), 20))
+    report("  customer orders", cpu_per_call(lambda: client.get("/api/user/orders", headers=customer), 200))
+    report("  checkout", cpu_per_call(lambda: client.post(
+        "/api/orders", json={"items": [{"product_id": 7, "quantity": 1}]}, headers=customer
+    ), 100))
+    first = client.get("/api/admin/orders?page=1&per_page=10", headers=admin).get_json()
+    return [order["id"] for order in first["orders"]], first["total"]
+
+
+def main():
+    import sharding
+
+    folder = tempfile.mkdtemp(prefix="bench_sharding_")
+    db_path = os.path.join(folder, "main.db")
+    overrides = {"RATELIMIT_ENABLED": False, "DASHBOARD_WORKERS": 4, "ORDER_COUNT_CAP": 0}
+
+    app = make_app(db_path, **overrides)
+    from app import db
+    with app.app_context():
+        items = seed(db)
+    print(f"seeded {ORDERS:,} orders with {items:,} items in the main database")
+    _, total = time_views(app, "unsharded")
+
+    shards = [f"sqlite:///{os.path.join(folder, f'shard{i}.db')}" for i in range(5)]
+    app = make_app(db_path, ORDER_SHARDS=shards[:4], **overrides)
+    with app.app_context():
+        started = time.perf_counter()
+        moved = sharding.reshard()
+    report("reshard main -> 4 shards", time.perf_counter() - started)
+    print(f"  moved {sum(moved.values()):,} orders, per shard: {shard_rows(app)}")
+    check_placement(app)
+
+    sharded_newest, sharded_total = time_views(app, "4 shards")
+    # Each round of checkouts above adds 101 orders
+    assert sharded_total == total + 101, "order count differs after resharding"
+    assert sharded_newest == newest_ids(app, 10), "merged page is not the newest orders"
+
+    before = shard_rows(app)
+    app = make_app(db_path, ORDER_SHARDS=shards, **overrides)
+    with app.app_context():
+        started = time.perf_counter()
+        moved = sharding.reshard()
+    report("reshard 4 -> 5 shards", time.perf_counter() - started)
+    after = shard_rows(app)
+    moved_orders = sum(moved.values())
+    total_orders = sum(orders for orders, _ in after.values())
+    print(f"  moved {moved_orders:,} of {total_orders:,} orders ({moved_orders / total_orders:.0%})")
+    assert sum(orders for orders, _ in before.values()) == total_orders
+    assert sum(items for _, items in before.values()) == sum(items for _, items in after.values())
+    check_placement(app)
+    with app.app_context():
+        assert sharding.reshard() == {}, "second run should find nothing to move"
+
+
+if __name__ == "__main__":
+    main()
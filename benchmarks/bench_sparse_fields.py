@@ -0,0 +1,40 @@
+"""Response size and query time for product field presets on long descriptions"""
+import json
+import time
+
+from bench_utils import make_app, report
+
+PRODUCTS = 5000
+PER_PAGE = 48
+DESCRIPTION = "Long marketing copy for the product detail page. " * 80  # ~4 KB
+
+
+def main():
+    app = make_app()
+    from app import db
+    from models import Product
+    import catalog_reads
+
+    with app.app_context():
+        db.session.bulk_insert_mappings(Product, [{
+            "name": f"Product {i}", "category": "keyboards", "price": 10.0 + i,
+            "stock": 5, "img": f"product{i}.jpeg", "description": DESCRIPTION,
+        } for i in range(PRODUCTS)])
+        db.session.commit()
+
+        for preset in ("card", "detail", "admin"):
+            fields = catalog_reads.parse_fields(preset)
+            catalog_reads.list_products(2, PER_PAGE, fields=fields)  # warm up
+
+            start = time.perf_counter()
+            for page in range(1, 51):
+                rows, _, _ = catalog_reads.list_products(page, PER_PAGE, fields=fields)
+            elapsed = (time.perf_counter() - start) / 50
+
+            body = json.dumps({"products": [catalog_reads.product_to_dict(r, fields) for r in rows]})
+            report(f"{preset:<7} query per page", elapsed)
+            print(f"{preset:<7} response size {len(body):>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Worker startup time and first-request latency.
+
+Each scenario runs in a fresh interpreter against the same seeded SQLite
+database and times, from the script's first line:
+
+* cold: importing the app, ``create_app`` and the first requests, which is
+  what every worker paid with ``python run.py`` style startup,
+* warm-up: the same with ``prefork.warm_up`` before the first request,
+* preforked: a master imports, builds and warms the app and runs
+  ``before_fork``; the time is measured in a forked worker, from the fork
+  through ``after_fork`` to its first responses, as under gunicorn with
+  ``preload_app``.
+
+The first requests are a catalog page and a suggestion lookup that are not
+in WARMUP_PATHS verbatim, so they only benefit from shared work.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_utils import make_app
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+PRODUCTS = 2000
+
+SCENARIO = r"""
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {benchmarks!r})
+mode, db_path = sys.argv[1], sys.argv[2]
+
+from bench_utils import make_config
+from app import create_app
+import prefork
+imported = time.perf_counter()
+app = create_app(make_config(db_path, RATELIMIT_ENABLED=False))
+created = time.perf_counter()
+if mode != "cold":
+    prefork.warm_up(app)
+ready = time.perf_counter()
+
+def first_requests(app):
+    client = app.test_client()
+    times = []
+    for path in ("/api/products?page=3&per_page=24", "/api/suggest?q=wire", "/api/products?page=4&per_page=24"):
+        before = time.perf_counter()
+        assert client.get(path).status_code == 200, path
+        times.append(time.perf_counter() - before)
+    return times
+
+if mode == "preforked":
+    prefork.before_fork(app)
+    read_fd, write_fd = os.pipe()
+    forked = time.perf_counter()
+    if os.fork() == 0:
+        prefork.after_fork(app)
+        worker_ready = time.perf_counter()
+        times = first_requests(app)
+        os.write(write_fd, json.dumps({{
+            "ready": worker_ready - forked, "first": times[0], "suggest": times[1], "second": times[2],
+            "serving": worker_ready - forked + sum(times),
+        }}).encode())
+        os._exit(0)
+    os.close(write_fd)
+    result = json.loads(os.read(read_fd, 4096))
+    os.wait()
+else:
+    times = first_requests(app)
+    result = {{"ready": ready - started, "first": times[0], "suggest": times[1], "second": times[2],
+              "serving": ready - started + sum(times), "import": imported - started, "create_app": created - imported}}
+print(json.dumps(result))
+"""
+
+
+def seed(db_path):
+    from app import db
+    from models import Product
+
+    app = make_app(db_path)
+    with app.app_context():
+        db.session.bulk_insert_mappings(Product, [
+            {"id": i, "name": f"Wireless Mouse {i}", "category": f"cat{i % 20}", "price": 10.0 + i % 50, "stock": 100}
+            for i in range(1, PRODUCTS + 1)
+        ])
+        db.session.commit()
+
+
+def run(mode, db_path):
+    script = SCENARIO.format(benchmarks=os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script, mode, db_path],
+        check=True, capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "bench.db")
+    seed(db_path)
+    print(f"median of {RUNS} runs, ms")
+    print(f"{'':<12}{'import':>8}{'create':>8}{'ready':>8}{'1st req':>9}{'suggest':>9}{'2nd req':>9}{'serving':>9}")
+    for mode in ("cold", "warm-up", "preforked"):
+        runs = [run(mode, db_path) for _ in range(RUNS)]
+
+        def median(field):
+            values = [r[field] for r in runs if field in r]
+            return f"{statistics.median(values) * 1000:8.1f}" if values else f"{'-':>8}"
+
+        print(f"{mode:<12}{median('import')}{median('create_app')}{median('ready')} "
+              f"{median('first')} {median('suggest')} {median('second')} {median('serving')}")
+
+
+if __name__ == "__main__":
+    main()
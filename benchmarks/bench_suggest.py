@@ -0,0 +1,82 @@
+"""Prefix lookup latency of the suggestion index on a 1M product catalog.
+
+Every lookup is checked against a full scan ranking all matches by
+popularity, before and after a batch of renames, deletes and sales, so
+the timings are for exact results.
+"""
+import random
+import time
+
+from bench_utils import report
+from suggest import SuggestIndex, normalize, _terms
+
+PRODUCTS = 1_000_000
+WORDS = ["gaming", "wireless", "mechanical", "keyboard", "mouse", "headphone", "ssd", "nvme",
+         "cooling", "pad", "rgb", "pro", "ultra", "mini", "usb", "charger", "monitor", "cable"]
+CATEGORIES = ["keyboards", "mice", "audio", "storage", "cooling", "monitors", "accessories"]
+QUERIES = ["g", "ga", "gam", "gami", "gaming m", "wireless mou", "nvme s", "key", "mo", "zz"]
+
+
+def expected(index, query, limit=8):
+    """Top ids for ``query`` by brute force over every product"""
+    prefix = normalize(query)
+    matches = [pid for pid, (name, _) in index._products.items()
+               if any(term.startswith(prefix) for term in _terms(name))]
+    return sorted(matches, key=lambda pid: (-index._popularity[pid], pid))[:limit]
+
+
+def check(index, label):
+    for query in QUERIES:
+        found = [product["id"] for product in index.lookup(query)[0]]
+        assert found == expected(index, query), f"{label}: wrong suggestions for {query!r}"
+    print(f"{label}: {len(QUERIES)} queries match a full scan")
+
+
+def main():
+    rng = random.Random(7)
+    rows = [
+        (i, " ".join(rng.sample(WORDS, 3)) + f" {i}", rng.choice(CATEGORIES))
+        for i in range(1, PRODUCTS + 1)
+    ]
+    # Popularity unrelated to name order, so the best sellers are spread over the whole catalog
+    popularity = {i: rng.randint(0, 5000) for i in range(1, PRODUCTS + 1, 3)}
+
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.build(rows, popularity)
+    report("build 1M products", time.perf_counter() - start)
+    check(index, "built")
+
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(200):
+            index._top_cache.clear()
+            index.lookup(query)
+        report(f"first lookup {query!r}", (time.perf_counter() - start) / 200)
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            index.lookup(query)
+        report(f"repeat lookup {query!r}", (time.perf_counter() - start) / 1000)
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.upsert_product(i + 1, f"renamed gaming product {i}", "accessories")
+    report("upsert", (time.perf_counter() - start) / 1000)
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        index.add_popularity(rng.randint(1, PRODUCTS), rng.randint(1, 50))
+    report("sale", (time.perf_counter() - start) / 10000)
+
+    # Delete the current best sellers so rankings have to refill
+    best = [product["id"] for product in index.lookup("g", 20)[0]]
+    start = time.perf_counter()
+    for product_id in best:
+        index.remove_product(product_id)
+    report("delete a top product", (time.perf_counter() - start) / len(best))
+    check(index, "after writes")
+
+
+if __name__ == "__main__":
+    main()
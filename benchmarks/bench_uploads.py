@@ -0,0 +1,104 @@
+"""Product image uploads: flat file.save() against the content-addressed store.
+
+Uploads IMAGES images drawn from DISTINCT different contents, the way
+variants of a product share a picture, through a bare route doing what
+add_product used to do (Werkzeug spools the file, then file.save() copies
+it) and through /api/admin/add_product with uploads.py, which also pays
+for the rest of the route. Reports time per upload, bytes on disk and
+peak Python memory, then deletes the products and checks the store is
+empty again.
+"""
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from flask import Flask, request
+from werkzeug.utils import secure_filename
+
+from bench_utils import make_app
+
+IMAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+DISTINCT = 20
+SIZE = 2 * 1024 * 1024
+
+
+def contents():
+    rng = random.Random(8)
+    return [b"\x89PNG\r\n\x1a\n" + rng.randbytes(SIZE) for _ in range(DISTINCT)]
+
+
+def disk_usage(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(folder) for name in files)
+
+
+def timed(label, folder, post, images):
+    started = time.perf_counter()
+    for i, data in enumerate(images):
+        response = post(i, data)
+        assert response.status_code in (200, 201), response.get_data(as_text=True)
+    elapsed = time.perf_counter() - started
+    # Memory on one more upload, tracing slows the loop above too much
+    tracemalloc.start()
+    post(len(images), images[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<26} {elapsed / len(images) * 1000:7.1f} ms/upload   {disk_usage(folder) / 2**20:8.1f} MiB on disk"
+          f"   peak {peak / 2**20:6.1f} MiB")
+
+
+def main():
+    rng = random.Random(9)
+    distinct = contents()
+    images = [rng.choice(distinct) for _ in range(IMAGES)]
+    print(f"{IMAGES} uploads of {SIZE // 2**20} MiB, {DISTINCT} different images")
+
+    flat_folder = tempfile.mkdtemp(prefix="bench_uploads_flat_")
+    flat = Flask(__name__)
+
+    @flat.route("/upload", methods=["POST"])
+    def upload():
+        file = request.files["img"]
+        file.save(os.path.join(flat_folder, secure_filename(file.filename)))
+        return "", 201
+
+    client = flat.test_client()
+    timed("file.save(), flat folder", flat_folder, lambda i, data: client.post(
+        "/upload", data={"img": (io.BytesIO(data), f"variant{i}.png")}, content_type="multipart/form-data"
+    ), images)
+
+    app = make_app(RATELIMIT_ENABLED=False, UPLOAD_MAX_BYTES=SIZE + 1024)
+    app.config["UPLOAD_FOLDER"] = store_folder = tempfile.mkdtemp(prefix="bench_uploads_store_")
+    from flask_jwt_extended import create_access_token
+    from app import db
+    from models import Admin, Product, UploadBlob
+    with app.app_context():
+        db.session.add(Admin(id=1, username="admin", password="x"))
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    client = app.test_client()
+    timed("content-addressed store", store_folder, lambda i, data: client.post(
+        "/api/admin/add_product", headers=headers, content_type="multipart/form-data",
+        data={"name": f"Variant {i}", "price": "1", "stock": "1", "category": "misc",
+              "img": (io.BytesIO(data), f"variant{i}.png")},
+    ), images)
+
+    with app.app_context():
+        assert UploadBlob.query.count() == len(set(images))  # the traced upload repeats images[0]
+        product_ids = [product_id for product_id, in db.session.query(Product.id)]
+    started = time.perf_counter()
+    for product_id in product_ids:
+        assert client.delete("/api/admin/delete_product", headers=headers,
+                             json={"product_id": product_id}).status_code == 200
+    print(f"deleted {len(product_ids)} products in {time.perf_counter() - started:.2f}s, "
+          f"{disk_usage(store_folder)} bytes left on disk")
+    with app.app_context():
+        assert UploadBlob.query.count() == 0
+    assert disk_usage(store_folder) == 0
+
+
+if __name__ == "__main__":
+    main()
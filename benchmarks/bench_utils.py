@@ -0,0 +1,52 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database so they don't need the
+MySQL server from config.Config. Run them from the repository root, e.g.
+``python benchmarks/bench_catalog_reads.py``.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def make_config(db_path=None, **overrides):
+    """Build a Config subclass pointing at a SQLite file"""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench_"), "bench.db")
+    attrs = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "TESTING": True,
+        "EVENTLOG_FOLDER": os.path.join(os.path.dirname(os.path.abspath(db_path)), "eventlog"),
+    }
+    attrs.update(overrides)
+    return type("BenchConfig", (Config,), attrs)
+
+
+def make_app(db_path=None, **overrides):
+    """Create the app with a fresh SQLite schema"""
+    from app import create_app, db
+    import sharding
+
+    app = create_app(make_config(db_path, **overrides))
+    with app.app_context():
+        db.create_all()
+        sharding.create_all()
+    return app
+
+
+def cpu_per_call(fn, repeat=200):
+    """Return the average CPU seconds spent in ``fn`` over ``repeat`` calls"""
+    fn()  # warm caches and compiled statements
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def report(label, seconds):
+    print(f"{label:<40} {seconds * 1e6:10.1f} us")
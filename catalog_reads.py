@@ -0,0 +1,316 @@
+"""Read-only catalog queries for the public storefront endpoints.
+
+These helpers run SQLAlchemy Core selects against the ``product`` table and
+hand back plain row tuples, so no ``Product`` instances end up in the session
+identity map. Statements are built once per query shape and reused with bound
+parameters, which lets SQLAlchemy's compiled cache skip recompilation.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select, func, bindparam, cast, Integer
+
+from app import db
+from models import Product
+
+product_table = Product.__table__
+
+# Default column order for product rows returned from this module
+PRODUCT_COLUMNS = ("id", "name", "category", "price", "stock", "img", "description")
+
+# Columns a client may ask for with ``fields=``
+SELECTABLE_FIELDS = PRODUCT_COLUMNS + ("rating",)
+
+FIELD_PRESETS = {
+    "card": ("id", "name", "price", "img"),
+    "detail": PRODUCT_COLUMNS,
+    "admin": SELECTABLE_FIELDS,
+}
+
+SORT_COLUMNS = {
+    "price": product_table.c.price,
+    "name": product_table.c.name,
+    "rating": product_table.c.rating,  # Average kept up to date by reviews.py
+}
+
+# Query shapes kept; the key space (fields x filters x sort) is too big to keep them all
+STATEMENT_CACHE_SIZE = 512
+
+_statement_cache = OrderedDict()
+_statement_lock = threading.Lock()
+
+
+def _cached(key, build):
+    """Return the statement stored under ``key``, building it on first use"""
+    with _statement_lock:
+        stmt = _statement_cache.get(key)
+        if stmt is not None:
+            _statement_cache.move_to_end(key)
+            return stmt
+    stmt = build()
+    with _statement_lock:
+        _statement_cache[key] = stmt
+        if len(_statement_cache) > STATEMENT_CACHE_SIZE:
+            _statement_cache.popitem(last=False)
+    return stmt
+
+
+def parse_fields(value):
+    """Turn a ``fields=`` query value into a tuple of column names.
+
+    Accepts a preset name or a comma separated list of columns. ``id`` is
+    always included and the columns come back in SELECTABLE_FIELDS order,
+    so any ordering of the same names shares one cached statement. Raises
+    ValueError for unknown names.
+    """
+    if not value:
+        return PRODUCT_COLUMNS
+    if value in FIELD_PRESETS:
+        return FIELD_PRESETS[value]
+
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SELECTABLE_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(unknown)}. Must be one of: "
+            f"{', '.join(SELECTABLE_FIELDS)} or a preset ({', '.join(FIELD_PRESETS)})"
+        )
+    wanted = set(names)
+    return tuple(name for name in SELECTABLE_FIELDS if name == "id" or name in wanted)
+
+
+def _product_columns(fields):
+    return [product_table.c[name] for name in fields]
+
+
+# Filter name -> WHERE clause; values are passed as bind parameters of the same name
+FILTER_CLAUSES = {
+    "category": lambda: product_table.c.category == bindparam("category"),
+    "categories": lambda: product_table.c.category.in_(bindparam("categories", expanding=True)),
+    "search": lambda: product_table.c.name.ilike(bindparam("search")),
+    "min_price": lambda: product_table.c.price >= bindparam("min_price"),
+    "max_price": lambda: product_table.c.price <= bindparam("max_price"),
+    "min_rating": lambda: product_table.c.rating >= bindparam("min_rating"),
+    "in_stock": lambda: product_table.c.stock > 0,
+}
+
+
+def parse_filters(args):
+    """Read the catalog filter query parameters into a ``{name: value}`` dict.
+
+    Raises ValueError for values that can't be parsed.
+    """
+    filters = {}
+    if args.get("category"):
+        filters["category"] = args["category"]
+    if args.get("categories"):
+        filters["categories"] = sorted({c.strip() for c in args["categories"].split(",") if c.strip()})
+    if args.get("search"):
+        filters["search"] = args["search"]
+    for name in ("min_price", "max_price", "min_rating"):
+        if args.get(name):
+            try:
+                filters[name] = float(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+    if args.get("in_stock", "").lower() in ("1", "true", "yes"):
+        filters["in_stock"] = True
+    return filters
+
+
+def _filter_params(filters):
+    """Split filters into the cache key part and the bind parameters"""
+    names = tuple(sorted(name for name in filters if name in FILTER_CLAUSES))
+    params = {name: filters[name] for name in names if name != "in_stock"}
+    if "search" in params:
+        params["search"] = f"%{params['search']}%"
+    return names, params
+
+
+def _apply_filters(stmt, names):
+    for name in names:
+        stmt = stmt.where(FILTER_CLAUSES[name]())
+    return stmt
+
+
+def _listing_statement(fields, names, sort_by, sort_order):
+    def build():
+        column = SORT_COLUMNS.get(sort_by, product_table.c.id)
+        order = column.desc() if sort_order == "desc" else column.asc()
+        stmt = select(*_product_columns(fields))
+        stmt = _apply_filters(stmt, names)
+        return stmt.order_by(order).limit(bindparam("limit")).offset(bindparam("offset"))
+
+    # Anything that isn't a known sort column sorts by id, same as the ORM query did
+    sort_key = sort_by if sort_by in SORT_COLUMNS else "id"
+    order_key = "desc" if sort_order == "desc" else "asc"
+    return _cached(("list", fields, names, sort_key, order_key), build)
+
+
+def _count_statement(names):
+    def build():
+        stmt = select(func.count()).select_from(product_table)
+        return _apply_filters(stmt, names)
+
+    return _cached(("count", names), build)
+
+
+def product_to_dict(row, fields=PRODUCT_COLUMNS):
+    """Serialize a product row tuple selected with ``fields`` into JSON shape"""
+    return dict(zip(fields, row))
+
+
+def list_products(page, per_page, category="", search="", sort_by="id", sort_order="asc",
+                  fields=PRODUCT_COLUMNS, filters=None):
+    """Return ``(rows, total, pages)`` for one page of the public catalog.
+
+    ``filters`` is a dict from ``parse_filters``; ``category`` and ``search``
+    are shortcuts for the filters of the same name. Page arguments are
+    clamped the same way ``Query.paginate(error_out=False)`` clamps them so
+    the endpoint output does not change.
+    """
+    if page is None or page < 1:
+        page = 1
+    if per_page is None or per_page < 1:
+        per_page = 20
+
+    filters = dict(filters or {})
+    if category:
+        filters["category"] = category
+    if search:
+        filters["search"] = search
+    names, params = _filter_params(filters)
+
+    rows = db.session.execute(
+        _listing_statement(fields, names, sort_by, sort_order),
+        dict(params, limit=per_page, offset=(page - 1) * per_page)
+    ).all()
+
+    # Skip the COUNT when the first page already holds everything
+    if page == 1 and len(rows) < per_page:
+        total = len(rows)
+    else:
+        total = db.session.execute(_count_statement(names), params).scalar()
+
+    pages = math.ceil(total / per_page) if total else 0
+    return rows, total, pages
+
+
+FACETS = ("category", "price")
+
+_facet_cache = {}
+_facet_lock = threading.Lock()
+_catalog_version = 0
+
+
+def invalidate_catalog():
+    """Drop cached facet results; called after any catalog write"""
+    global _catalog_version
+    with _facet_lock:
+        _catalog_version += 1
+        _facet_cache.clear()
+
+
+def parse_facets(value):
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValueError(f"Unknown facet(s): {', '.join(unknown)}. Must be one of: {', '.join(FACETS)}")
+    return tuple(dict.fromkeys(names))
+
+
+def _facet_statement(names):
+    def build():
+        bucket = cast(func.floor(product_table.c.price / bindparam("bucket_width")), Integer).label("bucket")
+        stmt = select(product_table.c.category, bucket, func.count())
+        stmt = _apply_filters(stmt, names)
+        return stmt.group_by(product_table.c.category, bucket)
+
+    return _cached(("facets", names), build)
+
+
+def facet_counts(filters, facets, bucket_width=50, ttl=60, max_entries=1000):
+    """Per-category counts and a price histogram for the filtered catalog.
+
+    Both come from one GROUP BY (category, price bucket) query. Results are
+    cached for ``ttl`` seconds or until ``invalidate_catalog`` is called.
+    """
+    names, params = _filter_params(filters)
+    key = (names, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())),
+           bucket_width)
+    now = time.monotonic()
+    with _facet_lock:
+        cached = _facet_cache.get(key)
+        version = _catalog_version
+    if cached is not None and cached[0] > now:
+        result = cached[1]
+    else:
+        by_category = {}
+        by_bucket = {}
+        for category, bucket, count in db.session.execute(
+            _facet_statement(names), dict(params, bucket_width=bucket_width)
+        ):
+            by_category[category] = by_category.get(category, 0) + count
+            by_bucket[bucket] = by_bucket.get(bucket, 0) + count
+
+        result = {
+            "category": [
+                {"value": category, "count": count}
+                for category, count in sorted(by_category.items(), key=lambda item: (-item[1], item[0]))
+            ],
+            "price": [
+                {"min": bucket * bucket_width, "max": (bucket + 1) * bucket_width, "count": by_bucket[bucket]}
+                for bucket in sorted(by_bucket)
+            ],
+        }
+        with _facet_lock:
+            # A write during the query makes this result stale, don't keep it
+            if version == _catalog_version:
+                if len(_facet_cache) >= max_entries:
+                    _facet_cache.pop(next(iter(_facet_cache)))
+                _facet_cache[key] = (now + ttl, result)
+
+    return {name: result[name] for name in facets}
+
+
+def get_product(product_id, fields=PRODUCT_COLUMNS):
+    """Return the row tuple for a single product, or None"""
+    stmt = _cached(
+        ("get", fields),
+        lambda: select(*_product_columns(fields)).where(product_table.c.id == bindparam("product_id"))
+    )
+    return db.session.execute(stmt, {"product_id": product_id}).first()
+
+
+def get_products_by_ids(product_ids, fields=PRODUCT_COLUMNS):
+    """Fetch several products with one ``IN`` query.
+
+    Returns ``(rows, missing)`` where rows follow the order of ``product_ids``
+    and ``missing`` lists the ids that don't exist.
+    """
+    if not product_ids:
+        return [], []
+    # id has to be selected to put rows back in request order
+    select_fields = fields if "id" in fields else ("id",) + tuple(fields)
+    stmt = _cached(
+        ("batch", select_fields),
+        lambda: select(*_product_columns(select_fields)).where(
+            product_table.c.id.in_(bindparam("product_ids", expanding=True))
+        )
+    )
+    id_index = select_fields.index("id")
+    found = {
+        row[id_index]: row
+        for row in db.session.execute(stmt, {"product_ids": list(product_ids)})
+    }
+    rows = [found[product_id] for product_id in product_ids if product_id in found]
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    return rows, missing
+
+
+def list_categories():
+    """Return the distinct product categories"""
+    stmt = _cached(("categories",), lambda: select(product_table.c.category).distinct())
+    return db.session.execute(stmt).scalars().all()
@@ -0,0 +1,109 @@
+"""Catalog change feed for clients that mirror the product table.
+
+Every product write takes the next number from the single ``catalog_sequence``
+row and stamps it on ``product.change_seq`` (or on a tombstone for deletes)
+inside the writer's transaction. The counter row stays locked until that
+transaction commits, so sequence numbers become visible in order and a
+client that reads everything after its last cursor never skips a change.
+Only the latest state of each product is kept, so a sync costs in
+proportion to the number of changed products, not the catalog size.
+"""
+from sqlalchemy import select, update, insert, delete, or_, and_
+
+from app import db
+from models import Product, ProductTombstone, CatalogSequence
+import catalog_reads
+
+product_table = Product.__table__
+tombstone_table = ProductTombstone.__table__
+sequence_table = CatalogSequence.__table__
+
+
+def next_seq():
+    """Allocate the next change sequence number in the current transaction"""
+    bumped = db.session.execute(
+        update(sequence_table).where(sequence_table.c.id == 1)
+        .values(value=sequence_table.c.value + 1)
+    ).rowcount
+    if not bumped:
+        db.session.execute(insert(sequence_table).values(id=1, value=1))
+    return db.session.execute(
+        select(sequence_table.c.value).where(sequence_table.c.id == 1)
+    ).scalar()
+
+
+def mark_changed(product_ids):
+    """Stamp products created or modified in this transaction"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return None
+    seq = next_seq()
+    db.session.execute(
+        update(product_table).where(product_table.c.id.in_(product_ids)).values(change_seq=seq)
+    )
+    return seq
+
+
+def mark_deleted(product_id):
+    """Record a tombstone for a product deleted in this transaction"""
+    seq = next_seq()
+    db.session.execute(delete(tombstone_table).where(tombstone_table.c.product_id == product_id))
+    db.session.execute(insert(tombstone_table).values(product_id=product_id, change_seq=seq))
+    return seq
+
+
+def parse_cursor(value):
+    """Parse ``since``: empty for a full snapshot, ``<seq>`` or ``<seq>:<product id>``"""
+    if not value:
+        return None
+    seq, _, product_id = value.partition(":")
+    return int(seq), int(product_id) if product_id else None
+
+
+def _after(seq_column, id_column, cursor):
+    if cursor is None:
+        return seq_column >= 0
+    seq, product_id = cursor
+    if product_id is None:
+        return seq_column > seq
+    return or_(seq_column > seq, and_(seq_column == seq, id_column > product_id))
+
+
+def changes_since(cursor, limit):
+    """Return ``(changes, next_cursor, has_more)`` for changes after ``cursor``.
+
+    Changes are ordered by (sequence, product id). Products changed in the
+    same transaction share a sequence number, so cursors carry the product
+    id as well and a page can end in the middle of a transaction safely.
+    """
+    upserts = db.session.execute(
+        select(product_table.c.change_seq, *[product_table.c[name] for name in catalog_reads.PRODUCT_COLUMNS])
+        .where(_after(product_table.c.change_seq, product_table.c.id, cursor))
+        .order_by(product_table.c.change_seq, product_table.c.id)
+        .limit(limit + 1)
+    ).all()
+    deletes = db.session.execute(
+        select(tombstone_table.c.change_seq, tombstone_table.c.product_id)
+        .where(_after(tombstone_table.c.change_seq, tombstone_table.c.product_id, cursor))
+        .order_by(tombstone_table.c.change_seq, tombstone_table.c.product_id)
+        .limit(limit + 1)
+    ).all()
+
+    merged = sorted(
+        [((row[0], row[1]), {"seq": row[0], "op": "upsert", "product": catalog_reads.product_to_dict(row[1:])})
+         for row in upserts]
+        + [((seq, product_id), {"seq": seq, "op": "delete", "id": product_id})
+           for seq, product_id in deletes],
+        key=lambda item: item[0]
+    )
+    has_more = len(merged) > limit
+    page = merged[:limit]
+
+    if page:
+        seq, product_id = page[-1][0]
+        next_cursor = f"{seq}:{product_id}"
+    elif cursor is not None:
+        next_cursor = f"{cursor[0]}:{cursor[1]}" if cursor[1] is not None else str(cursor[0])
+    else:
+        next_cursor = "0"
+    return [change for _, change in page], next_cursor, has_more
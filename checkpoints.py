@@ -0,0 +1,31 @@
+"""Named positions for incremental batch processes, stored in ``checkpoint``.
+
+Callers save inside the same transaction as the work the position covers,
+so after a crash a process resumes exactly where its last commit ended.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update, insert
+
+from app import db
+from models import Checkpoint
+
+checkpoint_table = Checkpoint.__table__
+
+
+def load(name, default=0):
+    position = db.session.execute(
+        select(checkpoint_table.c.position).where(checkpoint_table.c.name == name)
+    ).scalar()
+    return default if position is None else position
+
+
+def save(name, position):
+    saved = db.session.execute(
+        update(checkpoint_table).where(checkpoint_table.c.name == name)
+        .values(position=position, updated_at=datetime.utcnow())
+    ).rowcount
+    if not saved:
+        db.session.execute(insert(checkpoint_table).values(
+            name=name, position=position, updated_at=datetime.utcnow()
+        ))
@@ -0,0 +1,146 @@
+"""Response compression and precompressed static assets.
+
+API responses are gzip or brotli encoded in an ``after_request`` hook based on
+the client's ``Accept-Encoding``. Small bodies, streamed responses and file
+responses are left alone. Static files are compressed ahead of time into
+``.br``/``.gz`` siblings by ``precompress_assets`` and picked by
+``send_precompressed``.
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+
+ASSET_EXTENSIONS = (".js", ".css", ".html", ".svg", ".json")
+
+# Encodings in order of preference, with the sibling suffix used on disk
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def available_encodings():
+    return [name for name, _ in ENCODINGS if name != "br" or brotli is not None]
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported encoding from a werkzeug Accept header"""
+    best, best_quality = None, 0
+    for name in available_encodings():
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level)
+
+
+def _is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def init_compression(app):
+    """Register the compression hook and asset CLI command on ``app``"""
+    app.config.setdefault("COMPRESS_MIN_SIZE", 500)
+    app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BROTLI_LEVEL", 4)
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get("COMPRESS_ENABLED", True):
+            return response
+        # Streamed and file responses must not be buffered here
+        if response.is_streamed or response.direct_passthrough:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if "Content-Encoding" in response.headers or not _is_compressible(response.mimetype):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if response.content_length is not None and response.content_length < app.config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        level = app.config["COMPRESS_BROTLI_LEVEL" if encoding == "br" else "COMPRESS_GZIP_LEVEL"]
+        response.set_data(compress(response.get_data(), encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @app.cli.command("precompress-assets")
+    def precompress_assets_command():
+        """Write .br/.gz siblings for the admin dashboard assets"""
+        written = precompress_assets(app.config["ASSETS_FOLDER"])
+        print(f"Precompressed {len(written)} file(s)")
+
+    if app.config.get("COMPRESS_ASSETS_ON_STARTUP"):
+        precompress_assets(app.config["ASSETS_FOLDER"])
+
+
+def precompress_assets(directory, gzip_level=9, brotli_level=11):
+    """Compress every asset under ``directory`` whose sibling is missing or stale.
+
+    Returns the list of sibling paths that were (re)written.
+    """
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            mtime = os.path.getmtime(source)
+            data = None
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                target = source + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                if data is None:
+                    with open(source, "rb") as f:
+                        data = f.read()
+                level = brotli_level if encoding == "br" else gzip_level
+                tmp = target + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compress(data, encoding, level))
+                os.replace(tmp, target)
+                written.append(target)
+    return written
+
+
+def send_precompressed(directory, filename):
+    """Serve ``filename`` from ``directory``, preferring a precompressed sibling"""
+    encoding = choose_encoding(request.accept_encodings)
+    suffix = dict(ENCODINGS).get(encoding)
+    if suffix:
+        sibling = os.path.join(directory, filename + suffix)
+        source = os.path.join(directory, filename)
+        if (os.path.isfile(sibling) and os.path.isfile(source)
+                and os.path.getmtime(sibling) >= os.path.getmtime(source)):
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+            return response
+
+    response = send_from_directory(directory, filename)
+    response.vary.add("Accept-Encoding")
+    return response
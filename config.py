@@ -6,5 +6,139 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = "your_jwt_secret_key_here"  # ✅ Fixed missing quote
     UPLOAD_FOLDER = "uploads"
+    PRODUCT_BATCH_MAX = 100  # max ids per /api/products/batch request
+    ORDER_BULK_MAX = 500  # max orders per /api/admin/order/bulk_update request
+    ORDER_COUNT_CAP = 10000  # /api/admin/orders stops counting matches here per shard, 0 = exact
+    ORDER_PAGE_MAX_DEPTH = 10000  # /api/admin/orders page numbers stop here, deeper pages use ?after=
 
+    # Product image uploads (see uploads.py), stored once per content under UPLOAD_FOLDER/blobs
+    UPLOAD_MAX_BYTES = 5 * 1024 * 1024  # per file, larger uploads get 413 before they're read
+    UPLOAD_TYPES = ["png", "jpeg", "gif", "webp"]  # checked against the file's first bytes
+    UPLOAD_GC_GRACE = 3600  # seconds before flask gc-uploads removes unreferenced files
 
+    # Response compression (see compression.py)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500  # bytes, smaller bodies are sent as-is
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_LEVEL = 4
+    COMPRESS_ASSETS_ON_STARTUP = True
+    ASSETS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "admin")
+
+    # Background jobs (see jobs.py). Dedicated workers: flask run-worker
+    JOBS_INPROCESS_THREADS = 0  # >0 runs worker threads inside the web process
+    JOBS_POLL_INTERVAL = 1.0  # seconds between polls when the queue is empty
+    JOBS_STALE_TIMEOUT = 600  # seconds without a heartbeat before a running job is requeued
+
+    # Idempotency-Key handling for POST /api/orders (see idempotency.py)
+    IDEMPOTENCY_TTL = 86400  # seconds a stored response is replayed
+    IDEMPOTENCY_MAX_KEYS = 1000  # per user, the oldest answered keys are dropped first
+    IDEMPOTENCY_PURGE_BATCH = 100  # expired keys deleted before each new key (see idempotency.py)
+    IDEMPOTENCY_WAIT_TIMEOUT = 30  # seconds a duplicate waits for the in-flight request
+
+    # Rate limiting (see ratelimit.py)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_URL = None  # e.g. "redis://localhost:6379/0" to share buckets across workers
+    RATELIMIT_MAX_KEYS = 100000  # in-process backend only
+    RATELIMIT_MAX_INFLIGHT = 0  # >0 sheds requests beyond this many in flight per process
+    # endpoints left out of RATELIMIT_MAX_INFLIGHT, the event streams stay open for minutes
+    RATELIMIT_INFLIGHT_EXEMPT = ("admin.admin_order_stream", "public.user_order_stream")
+    # group: (burst size, tokens refilled per second, key: "ip" or "user")
+    RATELIMIT_RULES = {
+        "public": (120, 20, "ip"),
+        "user": (60, 10, "user"),
+        "admin": (120, 20, "user"),
+        "login": (5, 5 / 60, "ip"),
+        "search": (20, 2, "ip"),
+        "checkout": (10, 10 / 60, "user"),
+    }
+    # blueprint name -> group applied to all of its routes
+    RATELIMIT_BLUEPRINTS = {"public": "public", "user": "user", "admin": "admin"}
+    # endpoint -> extra group on top of the blueprint one
+    RATELIMIT_ENDPOINTS = {
+        "admin.admin_login": "login",
+        "user.user_login": "login",
+        "user.user_register": "login",
+        "public.create_order": "checkout",
+    }
+    # endpoints that count against "search" when called with ?search=
+    RATELIMIT_SEARCH_ENDPOINTS = ("public.public_products", "admin.get_products")
+
+    # Search suggestions (see suggest.py)
+    SUGGEST_REFRESH_SECONDS = 300  # background rebuild interval, 0 = only after SUGGEST_MAX_CHANGES
+    SUGGEST_MAX_CHANGES = 50000  # product writes before a background rebuild, 0 = no limit
+    SUGGEST_TOP_PREFIX_LENGTH = 3  # prefixes up to this long are ranked when the index is built
+    SUGGEST_CACHE_SIZE = 50000  # longer prefixes whose rankings are kept
+
+    # Catalog facets (see catalog_reads.facet_counts)
+    FACET_PRICE_BUCKET = 50  # width of a price histogram bucket
+    FACET_CACHE_TTL = 60  # seconds; admin product writes invalidate immediately
+
+    # Order event streams (see events.py)
+    EVENTS_REDIS_URL = None  # e.g. "redis://localhost:6379/1" when running several workers
+    EVENTS_QUEUE_SIZE = 100  # buffered events per connection before dropping
+    EVENTS_KEEPALIVE = 15  # seconds between keepalive comments on idle streams
+    # open streams per process, 0 = no cap. Each holds a gthread worker thread, so keep
+    # this below gunicorn's threads; a gevent process (gunicorn.streams.conf.py) can take far more
+    EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS", 4))
+
+    # Admin dashboard bootstrap (see dashboard.py)
+    DASHBOARD_WORKERS = 4  # panels loaded in parallel, each on its own connection
+    DASHBOARD_PANEL_TIMEOUT = 5  # seconds before a slow panel is left out of the response
+
+    # Ad-hoc order analytics (see analytics.py)
+    ANALYTICS_REFRESH_SECONDS = 30  # new order lines are appended at most this often
+    ANALYTICS_REBUILD_SECONDS = 3600  # full reload, 0 = never
+    ANALYTICS_SETTLE_SECONDS = 60  # orders newer than this wait for a later refresh, so all of them have committed
+
+    # "Frequently bought together" (see recommendations.py), update with: flask build-recommendations
+    RECOMMENDATIONS_CHUNK_SIZE = 2000  # orders folded in per transaction
+    RECOMMENDATIONS_TOP_K = 20  # neighbours kept per product
+    RECOMMENDATIONS_MAX_BASKET = 50  # larger orders are skipped
+    RECOMMENDATIONS_SETTLE_SECONDS = 300  # orders newer than this wait for the next run, so all of them have committed
+    RECOMMENDATIONS_CACHE_TTL = 300  # seconds a product's list is served from memory
+    RECOMMENDATIONS_CACHE_SIZE = 100000  # products kept in the per-process cache
+
+    # Order archive (see archive.py), run with: flask archive-orders
+    ARCHIVE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+    ARCHIVE_AFTER_DAYS = 730  # closed orders older than this are moved out
+    ARCHIVE_CHUNK_SIZE = 1000  # orders per file batch and transaction
+
+    # Order sharding by user (see sharding.py). Empty keeps orders in the main database;
+    # after changing it run: flask init-order-shards && flask reshard-orders
+    ORDER_SHARDS = []  # database URIs, only ever append: a shard's position is its identity
+    ORDER_SHARD_WORKERS = 8  # threads for admin queries that scan every shard
+    ORDER_SHARD_ID_SPAN = 100_000_000  # order ids per shard, shard n uses (n + 1) * span upwards
+    ORDER_SHARD_ID_BLOCK = 100  # ids reserved per process at a time
+
+    # Chunked data backfills (see backfill.py): flask backfill NAME
+    BACKFILL_CHUNK_SIZE = 1000  # rows updated per transaction
+    BACKFILL_PAUSE = 0.0  # seconds to sleep after every chunk
+    BACKFILL_THROTTLE = 0.5  # also sleep this many times as long as the chunk took
+    BACKFILL_MAX_REPLICA_LAG = 5  # wait while a read replica is further behind, None = don't check
+
+    # Startup warm-up (see prefork.py), run by wsgi.py before workers take traffic
+    WARMUP_ENABLED = True
+    WARMUP_IMPORTS = ["analytics"]  # modules the routes import lazily, loaded once in the master
+    WARMUP_PATHS = ["/api/products", "/api/categories", "/api/suggest?q=a"]  # GET requests replayed at startup
+    WARMUP_POOL_CONNECTIONS = 1  # connections opened per database in every worker
+
+    # Read replicas of the main database for GET/HEAD requests (see replicas.py)
+    REPLICA_URIS = []  # database URIs; empty sends everything to the primary
+    REPLICA_HEALTH_INTERVAL = 5  # seconds between pings of every replica
+    REPLICA_MAX_LAG = 10  # seconds behind the primary before a MySQL replica is skipped, None = no check
+    REPLICA_STICKY_SECONDS = 5  # a client's reads stay on the primary this long after it writes
+    REPLICA_STICKY_STORAGE_URL = None  # e.g. "redis://localhost:6379/2" when running several workers
+
+    # Durable order event log (see eventlog.py)
+    EVENTLOG_ENABLED = True
+    EVENTLOG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eventlog")
+    EVENTLOG_SEGMENT_BYTES = 64 * 1024 * 1024  # a new segment file starts past this size
+    EVENTLOG_FSYNC_INTERVAL = 0.05  # seconds; the most a power loss can drop
+    EVENTLOG_FSYNC_BATCH = 1000  # appends that trigger an fsync before the interval is up
+
+    # Marketplace product feeds (see feeds.py), regenerate with: flask generate-feeds
+    FEED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feeds")
+    FEED_CHUNK_SIZE = 10000  # product ids per cached chunk
+    FEED_BASE_URL = "http://localhost:5500"
+    FEED_CURRENCY = "USD"
+    FEED_TITLE = "E-Commerce product feed"
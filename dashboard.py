@@ -0,0 +1,73 @@
+"""Parallel loading of the admin dashboard panels.
+
+The bootstrap endpoint needs several independent aggregates. Each panel runs
+on a small shared thread pool inside its own app context, so it gets its own
+database session and connection and the slowest panel sets the response
+time instead of the sum of all of them. Each panel context gets the
+request's ``g.replica`` (see replicas.py), so panels read from the replica
+the request picked. Panels that miss the deadline are
+reported in ``errors`` and left to finish in the background; the UI loads
+those through their regular endpoints.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool(workers):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard")
+    return _executor
+
+
+def _after_fork():
+    # The executor's threads stayed in the parent process
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _run_panel(app, loader, replica):
+    started = time.perf_counter()
+    # A fresh app context means a separate scoped session, removed on exit
+    with app.app_context():
+        if replica is not None:
+            g.replica = replica
+        return loader(), time.perf_counter() - started
+
+
+def load_panels(app, panels, timeout, workers=4):
+    """Run ``{name: loader}`` concurrently; returns ``(data, errors, timings)``"""
+    pool = _pool(workers)
+    replica = g.get("replica")
+    futures = {pool.submit(_run_panel, app, loader, replica): name for name, loader in panels.items()}
+    done, _ = wait(futures, timeout=timeout)
+
+    data, errors, timings = {}, {}, {}
+    for future, name in futures.items():
+        if future not in done:
+            errors[name] = "timeout"
+            continue
+        try:
+            data[name], elapsed = future.result()
+            timings[name] = round(elapsed * 1000, 1)
+        except Exception as e:
+            logger.exception("Dashboard panel %s failed", name)
+            errors[name] = str(e)
+    return data, errors, timings
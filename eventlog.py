@@ -0,0 +1,333 @@
+"""Append-only order event log on local disk.
+
+Events are compact JSON payloads framed as ``[length u32][crc32 u32][payload]``
+records in segment files named after the global offset of their first byte
+(``00000000000000000000.log``), so an offset identifies one record across
+all segments. The writer rotates to a new segment once the current one
+reaches EVENTLOG_SEGMENT_BYTES; older segments are never written again.
+
+Appends go to the OS with one ``write`` each and a background thread
+fsyncs every EVENTLOG_FSYNC_INTERVAL seconds (or sooner after
+EVENTLOG_FSYNC_BATCH records), so a crash of the process loses nothing and
+a power loss at most one interval. Several worker processes can share a
+folder: appends and rotation are serialized with ``flock`` on a lock file
+that also holds the current segment's base offset. A failed or short
+write is cut off again before the lock is released, and a writer cuts a
+record torn by a crash off the end of the current segment when it opens,
+so new appends don't land behind bytes that readers can't get past.
+
+Readers memory-map segments and hand out ``memoryview`` slices of the
+mapping, so scanning the log copies nothing until a consumer decodes an
+event. ``consume`` resumes a named consumer from its checkpoint.
+"""
+import atexit
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, one process per folder there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".log"
+LOCK_FILE = "writer.lock"
+
+
+def segment_name(base):
+    return f"{base:020d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(folder):
+    """Sorted base offsets of the segments in ``folder``"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(folder)
+        if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+    )
+
+
+def encode(event):
+    payload = json.dumps(event, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class EventLog:
+    """Writer side of the log; safe to share between threads"""
+
+    def __init__(self, folder, segment_bytes=64 << 20, fsync_interval=0.05, fsync_batch=1000):
+        self.folder = folder
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(folder, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        self._fd = None
+        self._base = None
+        self._pending = 0
+        self._dirty = set()  # fds written since the last fsync
+        self._sealed = []  # rotated-out fds, closed after their final fsync
+        self._wake = threading.Event()
+        self._closed = False
+        self.appended = 0
+        self.fsyncs = 0
+        self._recover()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="eventlog-fsync", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _read_base(self):
+        raw = os.pread(self._lock_fd, 20, 0)
+        if raw.strip():
+            return int(raw)
+        segments = list_segments(self.folder)
+        return segments[-1] if segments else 0
+
+    def _recover(self):
+        """Truncate the current segment after its last valid record"""
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            # Appends hold the lock for their whole write, so only a crash leaves a torn tail
+            base = self._read_base()
+            path = os.path.join(self.folder, segment_name(base))
+            if not os.path.exists(path):
+                return
+            segment = Segment(path, base)
+            try:
+                size = len(segment.view)
+                end = max((offset - base + HEADER.size + len(payload) for offset, payload in segment.records()),
+                          default=0)
+            finally:
+                segment.close()
+            if end < size:
+                logger.warning("Event log segment %s ends in a torn record, truncating %d bytes",
+                               segment_name(base), size - end)
+                os.truncate(path, end)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open_segment(self, base):
+        if self._fd is not None:
+            self._sealed.append(self._fd)
+        self._fd = os.open(os.path.join(self.folder, segment_name(base)),
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._base = base
+
+    def append(self, event, sync=False):
+        """Append one event dict; returns its offset.
+
+        With ``sync`` the call returns only once the event is on disk,
+        otherwise it is fsynced by the next background flush.
+        """
+        record = encode(event)
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                base = self._read_base()
+                if base != self._base:
+                    # Another process rotated, or this is the first append
+                    self._open_segment(base)
+                position = os.fstat(self._fd).st_size
+                if position and position + len(record) > self.segment_bytes:
+                    base += position
+                    self._open_segment(base)
+                    os.pwrite(self._lock_fd, f"{base:020d}".encode(), 0)
+                    position = 0
+                try:
+                    written = os.write(self._fd, record)
+                    if written != len(record):
+                        raise OSError(f"Short write to the event log: {written} of {len(record)} bytes")
+                except BaseException:
+                    # A partial record would stop readers and every later append behind it
+                    os.ftruncate(self._fd, position)
+                    raise
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            self._dirty.add(self._fd)
+            self._pending += 1
+            self.appended += 1
+            if self._pending >= self.fsync_batch:
+                self._wake.set()
+        if sync:
+            self.flush()
+        return base + position
+
+    def flush(self):
+        """fsync everything appended so far"""
+        with self._flush_lock:
+            with self._lock:
+                fds = self._dirty
+                sealed = self._sealed
+                self._dirty = set()
+                self._sealed = []
+                self._pending = 0
+            for fd in fds.union(sealed):
+                try:
+                    os.fsync(fd)
+                except OSError:
+                    logger.exception("Event log fsync failed")
+            for fd in sealed:
+                os.close(fd)
+            if fds:
+                self.fsyncs += 1
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            os.close(self._lock_fd)
+
+
+class Segment:
+    """A memory-mapped segment file"""
+
+    def __init__(self, path, base):
+        self.base = base
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.view = memoryview(self._map) if self._map is not None else memoryview(b"")
+
+    def records(self, position=0, verify=True):
+        """Yield ``(offset, payload memoryview)`` from ``position`` on.
+
+        Stops at the end of the file or at a record that is still being
+        written (or was torn by a crash), which the next read picks up.
+        """
+        view = self.view
+        end = len(view)
+        header = HEADER.size
+        while position + header <= end:
+            length, crc = HEADER.unpack_from(view, position)
+            start = position + header
+            if start + length > end:
+                return
+            payload = view[start:start + length]
+            if verify and zlib.crc32(payload) != crc:
+                return
+            yield self.base + position, payload
+            position = start + length
+
+    def close(self):
+        self.view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A caller still holds a payload view; the GC unmaps it later
+                pass
+        self._file.close()
+
+
+def read(folder, offset=0, verify=True):
+    """Yield ``(offset, payload memoryview)`` for every record at or after ``offset``.
+
+    ``offset`` must be 0, a record offset or a ``next_offset`` returned
+    earlier. Payload views are only valid until the generator moves to the
+    next segment; decode or copy them before that.
+    """
+    segments = list_segments(folder)
+    if not segments:
+        return
+    index = max(bisect_right(segments, offset) - 1, 0)
+    for base in segments[index:]:
+        segment = Segment(os.path.join(folder, segment_name(base)), base)
+        try:
+            yield from segment.records(max(offset - base, 0), verify)
+        finally:
+            segment.close()
+
+
+def events(folder, offset=0):
+    """Yield ``(offset, next_offset, event dict)`` from ``offset`` on"""
+    for record_offset, payload in read(folder, offset):
+        yield record_offset, record_offset + HEADER.size + len(payload), json.loads(payload.tobytes())
+
+
+def consume(folder, name, handler, batch_size=1000, max_events=None):
+    """Feed new events to ``handler(offset, event)`` for consumer ``name``.
+
+    The position is saved in the checkpoint table after every batch, in the
+    same transaction as whatever the handler wrote, so delivery is
+    at-least-once from the last commit. Returns the number of events seen.
+    """
+    from app import db
+    import checkpoints
+
+    checkpoint = f"eventlog:{name}"
+    offset = checkpoints.load(checkpoint)
+    seen = 0
+    in_batch = 0
+    for record_offset, next_offset, event in events(folder, offset):
+        handler(record_offset, event)
+        offset = next_offset
+        seen += 1
+        in_batch += 1
+        if in_batch >= batch_size:
+            checkpoints.save(checkpoint, offset)
+            db.session.commit()
+            in_batch = 0
+        if max_events is not None and seen >= max_events:
+            break
+    if in_batch:
+        checkpoints.save(checkpoint, offset)
+        db.session.commit()
+    return seen
+
+
+def init_event_log(app):
+    if not app.config.get("EVENTLOG_ENABLED", True):
+        return
+    app.extensions["eventlog"] = EventLog(
+        app.config["EVENTLOG_FOLDER"],
+        segment_bytes=app.config.get("EVENTLOG_SEGMENT_BYTES", 64 << 20),
+        fsync_interval=app.config.get("EVENTLOG_FSYNC_INTERVAL", 0.05),
+        fsync_batch=app.config.get("EVENTLOG_FSYNC_BATCH", 1000),
+    )
+
+
+def record_order_event(event_type, order_id, user_id, status, **fields):
+    """Append an order event after its change has committed"""
+    log = current_app.extensions.get("eventlog")
+    if log is None:
+        return None
+    event = {"type": event_type, "order_id": order_id, "user_id": user_id, "status": status,
+             "ts": round(time.time(), 3), **fields}
+    try:
+        return log.append(event)
+    except Exception:
+        # The order change is already committed, a lost event must not fail the request
+        logger.exception("Could not log %s for order %s", event_type, order_id)
+        return None
@@ -0,0 +1,204 @@
+"""Order event broker behind the Server-Sent Events streams.
+
+Routes call ``publish`` after committing an order change. Each open SSE
+connection holds a Subscription with a small bounded queue and blocks on it,
+so an idle connection costs one waiting thread and no database connection.
+EVENTS_MAX_STREAMS caps the streams a process holds open at once, so they
+can't take every thread of a gthread worker; past it ``open_stream``
+refuses the connection and the client retries.
+With EVENTS_REDIS_URL set, events go through Redis pub/sub and one listener
+thread per process fans them out locally, so every worker sees every event.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+
+try:
+    import redis
+except ImportError:  # only needed for the shared broker
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+ADMIN_CHANNEL = "orders:admin"
+
+
+def user_channel(user_id):
+    return f"orders:user:{user_id}"
+
+
+class Subscription:
+    __slots__ = ("channels", "queue", "dropped")
+
+    def __init__(self, channels, queue_size):
+        self.channels = channels
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def get(self, timeout):
+        """Next event dict, or None after ``timeout`` seconds without one"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class MemoryBroker:
+    """Fan-out to subscribers in this process"""
+
+    def __init__(self, queue_size=100, latency_samples=1000):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._latency_samples = latency_samples
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, channels):
+        subscription = Subscription(tuple(channels), self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def dispatch(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # A slow client loses events rather than holding up the publisher
+                subscription.dropped += 1
+
+    def publish(self, channel, event):
+        self.published += 1
+        self.dispatch(channel, event)
+
+    def record_delivery(self, event):
+        latency = time.time() - event["published_at"]
+        with self._lock:
+            self.delivered += 1
+            self._latencies.append(latency)
+            if len(self._latencies) > self._latency_samples:
+                del self._latencies[:len(self._latencies) - self._latency_samples]
+
+    def stats(self):
+        with self._lock:
+            connections = len({s for subs in self._subscribers.values() for s in subs})
+            latencies = sorted(self._latencies)
+            channels = len(self._subscribers)
+        return {
+            "connections": connections,
+            "channels": channels,
+            "published": self.published,
+            "delivered": self.delivered,
+            "fanout_latency_ms": {
+                "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+                "p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+            },
+        }
+
+
+class RedisBroker(MemoryBroker):
+    """Publishes through Redis and fans incoming messages out locally"""
+
+    PATTERN = "orders:*"
+
+    def __init__(self, url, **kwargs):
+        if redis is None:
+            raise RuntimeError("EVENTS_REDIS_URL needs the 'redis' package installed")
+        super().__init__(**kwargs)
+        self._client = redis.Redis.from_url(url)
+        self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+        self._listener.start()
+
+    def publish(self, channel, event):
+        self.published += 1
+        self._client.publish(channel, json.dumps(event))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.PATTERN)
+                for message in pubsub.listen():
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self.dispatch(channel, json.loads(message["data"]))
+            except Exception:
+                logger.exception("Lost Redis event subscription, reconnecting")
+                time.sleep(1)
+
+
+def init_events(app):
+    url = app.config.get("EVENTS_REDIS_URL")
+    queue_size = app.config.get("EVENTS_QUEUE_SIZE", 100)
+    app.extensions["events"] = RedisBroker(url, queue_size=queue_size) if url else MemoryBroker(queue_size)
+    max_streams = app.config.get("EVENTS_MAX_STREAMS", 0)
+    app.extensions["event_streams"] = threading.BoundedSemaphore(max_streams) if max_streams else None
+
+
+def get_broker():
+    return current_app.extensions["events"]
+
+
+def publish_order_event(event_type, order_id, user_id, status):
+    """Send an order event to its owner's channel and to the admin channel"""
+    event = {
+        "type": event_type,
+        "order_id": order_id,
+        "user_id": user_id,
+        "status": status,
+        "published_at": time.time(),
+    }
+    broker = get_broker()
+    try:
+        broker.publish(user_channel(user_id), event)
+        broker.publish(ADMIN_CHANNEL, event)
+    except Exception:
+        # The order change is already committed, a lost event must not fail the request
+        logger.exception("Could not publish %s for order %s", event_type, order_id)
+
+
+def open_stream():
+    """Take a stream slot of this process; returns its release function, or None when all are taken"""
+    slots = current_app.extensions.get("event_streams")
+    if slots is None:
+        return lambda: None
+    if not slots.acquire(blocking=False):
+        return None
+    return slots.release
+
+
+def stream(subscription, keepalive=15):
+    """Yield SSE frames for ``subscription`` until the client disconnects"""
+    broker = get_broker()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = subscription.get(keepalive)
+            if event is None:
+                # Comment frame keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            broker.record_delivery(event)
+            payload = {k: v for k, v in event.items() if k != "published_at"}
+            yield f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
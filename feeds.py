@@ -0,0 +1,223 @@
+"""Marketplace product feeds (XML and CSV) generated in chunks.
+
+The catalog is split into fixed product id ranges. One grouped query
+fingerprints every range by row count and highest change sequence
+(including tombstones), and only ranges whose fingerprint moved since the
+last run are streamed from the database and rendered again. Rendered chunks
+are cached on disk next to the feed, and the final file is assembled into a
+temporary file and swapped in with ``os.replace``, so readers never see a
+partial feed.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select, func, cast, Integer
+
+from app import db
+from models import Product, ProductTombstone
+
+product_table = Product.__table__
+tombstone_table = ProductTombstone.__table__
+
+FORMATS = ("xml", "csv")
+CSV_COLUMNS = ["id", "title", "description", "link", "image_link", "price", "availability", "product_type"]
+
+# Characters that aren't allowed anywhere in an XML 1.0 document
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _chunk_of(column, chunk_size):
+    return cast(func.floor(column / chunk_size), Integer)
+
+
+def chunk_fingerprints(chunk_size):
+    """Return ``{chunk: [row count, max change seq]}`` for every id range"""
+    fingerprints = {}
+    chunk = _chunk_of(product_table.c.id, chunk_size).label("chunk")
+    for number, count, max_seq in db.session.execute(
+        select(chunk, func.count(), func.max(product_table.c.change_seq)).group_by(chunk)
+    ):
+        fingerprints[number] = [count, max_seq or 0]
+
+    # A delete doesn't leave a product row behind, so tombstones count too
+    chunk = _chunk_of(tombstone_table.c.product_id, chunk_size).label("chunk")
+    for number, max_seq in db.session.execute(
+        select(chunk, func.max(tombstone_table.c.change_seq)).group_by(chunk)
+    ):
+        entry = fingerprints.setdefault(number, [0, 0])
+        entry[1] = max(entry[1], max_seq or 0)
+    return fingerprints
+
+
+def _rows(chunk, chunk_size, batch_size=1000):
+    stmt = (
+        select(product_table.c.id, product_table.c.name, product_table.c.description,
+               product_table.c.img, product_table.c.price, product_table.c.stock,
+               product_table.c.category)
+        .where(product_table.c.id >= chunk * chunk_size, product_table.c.id < (chunk + 1) * chunk_size)
+        .order_by(product_table.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+    # yield_per streams rows from the server cursor instead of loading the range
+    return db.session.execute(stmt)
+
+
+def _entry(row, options):
+    product_id, name, description, img, price, stock, category = row
+    return {
+        "id": str(product_id),
+        "title": name,
+        "description": description or "",
+        "link": f"{options['base_url']}/products/{product_id}",
+        "image_link": f"{options['base_url']}/api/admin/uploads/{img}" if img else "",
+        "price": f"{price:.2f} {options['currency']}",
+        "availability": "in stock" if stock > 0 else "out of stock",
+        "product_type": category,
+    }
+
+
+def _xml_text(value):
+    return escape(_XML_INVALID.sub("", value))
+
+
+def render_chunk(fmt, rows, options):
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator="\n")
+        for row in rows:
+            writer.writerow(_entry(row, options))
+    else:
+        for row in rows:
+            entry = _entry(row, options)
+            buffer.write(
+                "<item>"
+                f"<g:id>{entry['id']}</g:id>"
+                f"<title>{_xml_text(entry['title'])}</title>"
+                f"<description>{_xml_text(entry['description'])}</description>"
+                f"<link>{_xml_text(entry['link'])}</link>"
+                f"<g:image_link>{_xml_text(entry['image_link'])}</g:image_link>"
+                f"<g:price>{entry['price']}</g:price>"
+                f"<g:availability>{entry['availability']}</g:availability>"
+                f"<g:product_type>{_xml_text(entry['product_type'])}</g:product_type>"
+                "</item>\n"
+            )
+    return buffer.getvalue()
+
+
+def _header(fmt, options):
+    if fmt == "csv":
+        return ",".join(CSV_COLUMNS) + "\n"
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>\n'
+        f"<title>{_xml_text(options['title'])}</title><link>{_xml_text(options['base_url'])}</link>\n"
+    )
+
+
+def _footer(fmt):
+    return "" if fmt == "csv" else "</channel></rss>\n"
+
+
+def feed_filename(fmt):
+    return f"products.{fmt}"
+
+
+def generate_feed(fmt, folder, options, chunk_size=10000, full=False):
+    """Regenerate one feed; returns a dict of run statistics"""
+    started = time.perf_counter()
+    chunk_dir = os.path.join(folder, f"chunks-{fmt}")
+    os.makedirs(chunk_dir, exist_ok=True)
+    manifest_path = os.path.join(chunk_dir, "manifest.json")
+
+    manifest = {}
+    if not full and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        # Different chunking or feed options means nothing can be reused
+        if manifest.get("chunk_size") != chunk_size or manifest.get("options") != options:
+            manifest = {}
+    previous = manifest.get("chunks", {})
+
+    fingerprints = chunk_fingerprints(chunk_size)
+    rendered = 0
+    for number, fingerprint in fingerprints.items():
+        part_path = os.path.join(chunk_dir, f"{number}.part")
+        if previous.get(str(number)) == fingerprint and os.path.exists(part_path):
+            continue
+        with open(part_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(render_chunk(fmt, _rows(number, chunk_size), options))
+        os.replace(part_path + ".tmp", part_path)
+        rendered += 1
+
+    # Ranges that no longer hold any product
+    for number in set(previous) - {str(n) for n in fingerprints}:
+        part_path = os.path.join(chunk_dir, f"{number}.part")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    target = os.path.join(folder, feed_filename(fmt))
+    tmp = target + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write(_header(fmt, options))
+        for number in sorted(fingerprints):
+            with open(os.path.join(chunk_dir, f"{number}.part"), encoding="utf-8") as part:
+                while True:
+                    block = part.read(1 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+        out.write(_footer(fmt))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, target)
+
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({
+            "chunk_size": chunk_size,
+            "options": options,
+            "chunks": {str(n): fp for n, fp in fingerprints.items()},
+        }, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    return {
+        "format": fmt,
+        "chunks": len(fingerprints),
+        "rendered": rendered,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def feed_options(config):
+    return {
+        "base_url": config.get("FEED_BASE_URL", "").rstrip("/"),
+        "currency": config.get("FEED_CURRENCY", "USD"),
+        "title": config.get("FEED_TITLE", "Product feed"),
+    }
+
+
+def generate_all(app, formats=FORMATS, full=False):
+    folder = app.config["FEED_FOLDER"]
+    os.makedirs(folder, exist_ok=True)
+    return [
+        generate_feed(fmt, folder, feed_options(app.config),
+                      chunk_size=app.config.get("FEED_CHUNK_SIZE", 10000), full=full)
+        for fmt in formats
+    ]
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("generate-feeds")
+    @click.option("--format", "formats", default=",".join(FORMATS), show_default=True)
+    @click.option("--full", is_flag=True, help="Ignore cached chunks and render everything")
+    def generate_feeds_command(formats, full):
+        """Write the marketplace product feeds"""
+        for stats in generate_all(app, [f for f in formats.split(",") if f], full=full):
+            print(f"{stats['format']}: {stats['rendered']}/{stats['chunks']} chunk(s) "
+                  f"rendered in {stats['seconds']:.2f}s")
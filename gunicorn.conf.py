@@ -0,0 +1,28 @@
+"""gunicorn settings for wsgi.py: ``gunicorn -c gunicorn.conf.py wsgi:app``"""
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Threads, because every open SSE stream (/orders/stream) holds one for its lifetime.
+# EVENTS_MAX_STREAMS (4 by default) caps them per worker so the other threads keep
+# serving requests; raise both together, or proxy the streams to gunicorn.streams.conf.py
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 8))
+timeout = 30
+
+# Build and warm the app once in the master, workers fork from it
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app was preloaded, before the first fork
+    from wsgi import app
+    import prefork
+    prefork.before_fork(app)
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    import prefork
+    prefork.after_fork(app)
@@ -0,0 +1,21 @@
+"""gunicorn settings for a process that only serves the order event streams.
+
+    EVENTS_MAX_STREAMS=900 gunicorn -c gunicorn.streams.conf.py wsgi:app
+
+Put it behind the same proxy as gunicorn.conf.py and send
+/api/orders/stream and /api/admin/orders/stream here. gevent workers keep
+each open stream in a greenlet instead of a thread, so a worker holds
+hundreds of them. Needs ``pip install gevent``, and EVENTS_REDIS_URL so the
+events published by the other process reach this one.
+"""
+import os
+
+bind = os.environ.get("STREAMS_BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("STREAMS_CONCURRENCY", 2))
+worker_class = "gevent"
+# Keep EVENTS_MAX_STREAMS below this, the rest is for reconnects and the login check
+worker_connections = int(os.environ.get("STREAMS_CONNECTIONS", 1000))
+timeout = 30
+
+# gevent patches threading and sockets when a worker starts, the app must be imported after that
+preload_app = False
@@ -0,0 +1,155 @@
+"""Idempotency-Key support for POST endpoints.
+
+Keys live in the ``idempotency_key`` table, unique per user, so every
+worker process sees them. The decorator adds the key's row to the view's
+session before the view runs, so the row commits in the same transaction
+as the view's writes to the main database (stock, for orders) or not at
+all. A duplicate that arrives while the first request is still running
+blocks on the unique key when it flushes, fails, and then waits for the
+first request's response instead of creating a second order.
+
+After the view returns, the response of a request whose row committed is
+recorded on the row, whatever its status. Repeats within IDEMPOTENCY_TTL
+seconds get that response without running the view again. A request
+that committed nothing (validation errors, rollbacks) leaves no row, so
+the client can simply retry it.
+
+The table cleans itself: before each new key is stored, up to
+IDEMPOTENCY_PURGE_BATCH expired rows are deleted, along with the user's
+oldest answered keys beyond IDEMPOTENCY_MAX_KEYS. Each insert removes
+more rows than it adds, so the table holds at most the keys of the last
+IDEMPOTENCY_TTL seconds, and no user holds more than the cap.
+``flask purge-idempotency-keys`` empties the backlog in one go.
+"""
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import request, jsonify, current_app, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select, update, delete
+
+from app import db
+from models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1  # seconds between looks at a key whose request is still running
+
+key_table = IdempotencyKey.__table__
+
+
+def _load(user_id, key):
+    """The committed row of ``key``, read in a fresh transaction"""
+    db.session.rollback()
+    row = db.session.execute(
+        select(key_table).where(key_table.c.user_id == user_id, key_table.c.key == key)
+    ).first()
+    db.session.rollback()
+    return row
+
+
+def _replay(row):
+    response = Response(row.body, status=row.status, mimetype=row.mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _answer(row, user_id, key, fingerprint):
+    """Response for a request whose key was committed by another request"""
+    if row.fingerprint != fingerprint:
+        return jsonify({"error": f"{HEADER} was already used with a different request body"}), 422
+    deadline = time.monotonic() + current_app.config.get("IDEMPOTENCY_WAIT_TIMEOUT", 30)
+    while row is not None and row.status is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        row = _load(user_id, key)
+    if row is None or row.status is None:
+        # Still running, or its process died before recording the response
+        return jsonify({"error": "A request with this Idempotency-Key is still in progress"}), 409
+    return _replay(row)
+
+
+def _make_room(user_id, now):
+    """Delete a batch of expired keys and the user's keys beyond the cap"""
+    config = current_app.config
+    batch = config.get("IDEMPOTENCY_PURGE_BATCH", 100)
+    max_keys = config.get("IDEMPOTENCY_MAX_KEYS", 1000)
+    # Ids first and then DELETE ... IN, MySQL does not take LIMIT in a DELETE subquery
+    ids = db.session.execute(
+        select(key_table.c.id).where(key_table.c.expires_at <= now).limit(batch)
+    ).scalars().all()
+    ids += db.session.execute(
+        select(key_table.c.id)
+        .where(key_table.c.user_id == user_id, key_table.c.status.is_not(None))
+        .order_by(key_table.c.created_at.desc(), key_table.c.id.desc())
+        .offset(max(max_keys - 1, 0)).limit(batch)
+    ).scalars().all()
+    if ids:
+        db.session.execute(delete(key_table).where(key_table.c.id.in_(set(ids))))
+    db.session.commit()
+
+
+def idempotent(f):
+    """Honor the Idempotency-Key header on a JWT protected view"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        user_id = str(get_jwt_identity())
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        now = datetime.utcnow()
+        row = _load(user_id, key)
+        if row is not None and row.expires_at <= now:
+            db.session.execute(delete(key_table).where(key_table.c.id == row.id))
+            db.session.commit()
+            row = None
+        if row is not None:
+            return _answer(row, user_id, key, fingerprint)
+        _make_room(user_id, now)
+
+        owner = uuid.uuid4().hex
+        pending = IdempotencyKey(
+            user_id=user_id, key=key, fingerprint=fingerprint, owner=owner, created_at=now,
+            expires_at=now + timedelta(seconds=current_app.config.get("IDEMPOTENCY_TTL", 86400)),
+        )
+        db.session.add(pending)
+        response = current_app.make_response(f(*args, **kwargs))
+        if pending in db.session.new:
+            # The view returned without committing anything
+            db.session.expunge(pending)
+
+        row = _load(user_id, key)
+        if row is None:
+            return response
+        if row.owner != owner:
+            # A concurrent request with this key committed first, this one was rolled back
+            return _answer(row, user_id, key, fingerprint)
+        db.session.execute(update(key_table).where(key_table.c.id == row.id).values(
+            status=response.status_code, body=response.get_data(), mimetype=response.mimetype
+        ))
+        db.session.commit()
+        return response
+
+    return decorated_function
+
+
+def purge(now=None):
+    """Delete expired keys; returns how many"""
+    deleted = db.session.execute(
+        delete(key_table).where(key_table.c.expires_at <= (now or datetime.utcnow()))
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def register_commands(app):
+    @app.cli.command("purge-idempotency-keys")
+    def purge_command():
+        """Delete Idempotency-Keys older than IDEMPOTENCY_TTL"""
+        print(f"Deleted {purge()} expired idempotency key(s)")
@@ -0,0 +1,60 @@
+"""Handlers for the background jobs enqueued by the routes"""
+import os
+
+from flask import current_app
+
+from jobs import job_handler
+
+THUMBNAIL_SIZE = (320, 320)
+
+
+@job_handler("process_product_image", concurrency=2, max_attempts=3)
+def process_product_image(payload):
+    """Check an uploaded product image and write a thumbnail next to it.
+
+    Needs Pillow; without it the upload is kept as-is.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+
+    import uploads
+
+    source = uploads.path(payload["filename"])
+    target = uploads.thumbnail_path(payload["filename"])
+    # Content uploaded before only needs its thumbnail once
+    if not os.path.exists(source) or os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    with Image.open(source) as image:
+        image.verify()
+    with Image.open(source) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        tmp = target + ".tmp"
+        image.save(tmp, format=image.format)
+    os.replace(tmp, target)
+
+
+@job_handler("generate_product_feeds", concurrency=1, max_attempts=3, backoff=30)
+def generate_product_feeds(payload):
+    """Refresh the XML/CSV marketplace feeds, only re-rendering changed chunks"""
+    import feeds
+
+    feeds.generate_all(current_app, payload.get("formats", feeds.FORMATS), full=payload.get("full", False))
+
+
+@job_handler("build_recommendations", concurrency=1, max_attempts=3, backoff=30)
+def build_recommendations(payload):
+    """Fold new orders into the "frequently bought together" lists"""
+    import recommendations
+
+    config = current_app.config
+    recommendations.build(
+        chunk_size=config.get("RECOMMENDATIONS_CHUNK_SIZE", 2000),
+        top_k=config.get("RECOMMENDATIONS_TOP_K", 20),
+        max_basket=config.get("RECOMMENDATIONS_MAX_BASKET", 50),
+        full=payload.get("full", False),
+        settle_seconds=config.get("RECOMMENDATIONS_SETTLE_SECONDS", 300),
+    )
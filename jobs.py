@@ -0,0 +1,297 @@
+"""Background jobs stored in the ``job`` table.
+
+Request handlers call ``enqueue`` inside their own transaction, so a job only
+becomes visible once the request commits. Workers (threads started by
+``Worker``, either inside the web process or through ``flask run-worker``)
+claim queued rows with a conditional UPDATE, run the registered handler and
+either mark the row done or reschedule it with exponential backoff. Rows
+survive restarts. While a job runs, its worker's heartbeat thread refreshes
+``heartbeat_at`` every quarter of ``stale_timeout``. A ``running`` job whose
+heartbeat is older than ``stale_timeout`` belongs to a dead worker and is
+requeued, however long a live worker has been running it.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select, update, func
+
+from app import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+job_table = Job.__table__
+
+_handlers = {}
+
+
+class JobHandler:
+    __slots__ = ("name", "func", "concurrency", "max_attempts", "backoff")
+
+    def __init__(self, name, func, concurrency, max_attempts, backoff):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+
+def job_handler(name, concurrency=1, max_attempts=5, backoff=2.0):
+    """Register ``func(payload)`` as the handler for jobs of type ``name``.
+
+    ``concurrency`` caps how many jobs of this type one worker process runs
+    at once. Failed attempts are retried after ``backoff ** attempts``
+    seconds until ``max_attempts`` is reached.
+    """
+    def decorator(func):
+        _handlers[name] = JobHandler(name, func, concurrency, max_attempts, backoff)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0):
+    """Add a job to the current session; it is queued when the caller commits"""
+    handler = _handlers.get(name)
+    if handler is None:
+        raise ValueError(f"No job handler registered for '{name}'")
+    job = Job(
+        type=name,
+        payload=json.dumps(payload or {}),
+        status="queued",
+        attempts=0,
+        max_attempts=handler.max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        created_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    return job
+
+
+def requeue_stale(timeout):
+    """Put ``running`` jobs without a heartbeat for ``timeout`` seconds back in the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+    result = db.session.execute(
+        update(job_table)
+        .where(job_table.c.status == "running",
+               func.coalesce(job_table.c.heartbeat_at, job_table.c.started_at) < cutoff)
+        .values(status="queued", locked_by=None, run_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def queue_stats(sample=500):
+    """Queue depth per type/status and latency over the most recent finished jobs"""
+    depth = {}
+    for job_type, status, count in db.session.execute(
+        select(job_table.c.type, job_table.c.status, func.count())
+        .group_by(job_table.c.type, job_table.c.status)
+    ):
+        depth.setdefault(job_type, {})[status] = count
+
+    oldest = db.session.execute(
+        select(func.min(job_table.c.created_at)).where(job_table.c.status == "queued")
+    ).scalar()
+
+    recent = db.session.execute(
+        select(job_table.c.created_at, job_table.c.started_at, job_table.c.finished_at)
+        .where(job_table.c.status == "done")
+        .order_by(job_table.c.finished_at.desc())
+        .limit(sample)
+    ).all()
+    waits = [(r.started_at - r.created_at).total_seconds() for r in recent if r.started_at]
+    runs = [(r.finished_at - r.started_at).total_seconds() for r in recent if r.started_at and r.finished_at]
+
+    return {
+        "depth": depth,
+        "oldest_queued_seconds": (datetime.utcnow() - oldest).total_seconds() if oldest else 0,
+        "avg_wait_seconds": sum(waits) / len(waits) if waits else 0,
+        "avg_run_seconds": sum(runs) / len(runs) if runs else 0,
+        "sampled_jobs": len(recent),
+    }
+
+
+class Worker:
+    """Pool of threads that claim and run queued jobs"""
+
+    def __init__(self, app, threads=2, types=None, poll_interval=1.0, stale_timeout=600):
+        self.app = app
+        self.threads = threads
+        self.types = set(types) if types else None
+        self.poll_interval = poll_interval
+        self.stale_timeout = stale_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}
+        self._threads = []
+        self.processed = 0
+        self.failed = 0
+
+    def _types(self):
+        names = self.types or set(_handlers)
+        return [name for name in names if name in _handlers]
+
+    def start(self):
+        with self.app.app_context():
+            requeued = requeue_stale(self.stale_timeout)
+            if requeued:
+                logger.warning("Requeued %d stale job(s)", requeued)
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _reserve(self, job_type):
+        with self._lock:
+            if self._running.get(job_type, 0) >= _handlers[job_type].concurrency:
+                return False
+            self._running[job_type] = self._running.get(job_type, 0) + 1
+            return True
+
+    def _release(self, job_type):
+        with self._lock:
+            self._running[job_type] -= 1
+
+    def _claim(self):
+        with self._lock:
+            eligible = [
+                name for name in self._types()
+                if self._running.get(name, 0) < _handlers[name].concurrency
+            ]
+        if not eligible:
+            return None
+
+        candidates = db.session.execute(
+            select(job_table.c.id, job_table.c.type)
+            .where(job_table.c.status == "queued",
+                   job_table.c.run_at <= datetime.utcnow(),
+                   job_table.c.type.in_(eligible))
+            .order_by(job_table.c.run_at, job_table.c.id)
+            .limit(self.threads)
+        ).all()
+        db.session.commit()
+
+        for job_id, job_type in candidates:
+            if not self._reserve(job_type):
+                continue
+            # Only one worker wins the queued -> running transition
+            claimed = db.session.execute(
+                update(job_table)
+                .where(job_table.c.id == job_id, job_table.c.status == "queued")
+                .values(status="running", locked_by=self.worker_id, started_at=datetime.utcnow(),
+                        heartbeat_at=datetime.utcnow(), attempts=job_table.c.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+            self._release(job_type)
+        return None
+
+    def _run(self, job):
+        handler = _handlers[job.type]
+        try:
+            handler.func(json.loads(job.payload or "{}"))
+            db.session.commit()
+            job.status = "done"
+            job.finished_at = datetime.utcnow()
+            job.last_error = None
+            self.processed += 1
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Job %s (%s) failed", job.id, job.type)
+            job = db.session.get(Job, job.id)
+            job.last_error = str(e)
+            job.locked_by = None
+            if job.attempts >= job.max_attempts:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = "queued"
+                job.run_at = datetime.utcnow() + timedelta(seconds=handler.backoff ** job.attempts)
+            self.failed += 1
+        finally:
+            db.session.commit()
+            self._release(handler.name)
+
+    def _loop(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    job = self._claim()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Could not claim a job")
+                    job = None
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                    continue
+                self._run(job)
+                db.session.remove()
+
+
+    def beat(self):
+        """Mark this worker's running jobs alive, then requeue those of dead workers"""
+        db.session.execute(
+            update(job_table)
+            .where(job_table.c.locked_by == self.worker_id, job_table.c.status == "running")
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        db.session.commit()
+        requeued = requeue_stale(self.stale_timeout)
+        if requeued:
+            logger.warning("Requeued %d stale job(s)", requeued)
+
+    def _heartbeat_loop(self):
+        with self.app.app_context():
+            while not self._stop.wait(self.stale_timeout / 4):
+                try:
+                    self.beat()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Job heartbeat failed")
+                db.session.remove()
+
+
+def init_jobs(app):
+    """Register the worker CLI and start in-process workers if configured"""
+    import job_handlers  # noqa: F401  registers the handlers
+
+    @app.cli.command("run-worker")
+    @click.option("--threads", default=2, show_default=True, help="Worker threads")
+    @click.option("--types", default="", help="Comma separated job types, default all")
+    def run_worker_command(threads, types):
+        """Run a dedicated background job worker"""
+        worker = Worker(app, threads=threads, types=[t for t in types.split(",") if t],
+                        poll_interval=app.config.get("JOBS_POLL_INTERVAL", 1.0),
+                        stale_timeout=app.config.get("JOBS_STALE_TIMEOUT", 600))
+        worker.start()
+        print(f"Worker {worker.worker_id} running {threads} thread(s), Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            worker.stop(timeout=30)
+
+    threads = app.config.get("JOBS_INPROCESS_THREADS", 0)
+    if threads:
+        app.extensions["job_worker"] = worker = Worker(
+            app, threads=threads, poll_interval=app.config.get("JOBS_POLL_INTERVAL", 1.0),
+            stale_timeout=app.config.get("JOBS_STALE_TIMEOUT", 600)
+        )
+        worker.start()
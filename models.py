@@ -15,36 +15,206 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     img = db.Column(db.String(255), nullable=True)
     stock = db.Column(db.Integer, nullable=False)
-    rating = db.Column(db.Float, nullable=True)
+    rating = db.Column(db.Float, nullable=True, index=True)  # Average, maintained by reviews.py
     description = db.Column(db.Text, nullable=True)
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0)  # Set by changefeed.py
+    
+    __table_args__ = (
+        # Catalog filters: category (+ price range) and price range alone
+        db.Index('ix_product_category_price', 'category', 'price'),
+        db.Index('ix_product_price', 'price'),
+        # Change feed reads in (change_seq, id) order
+        db.Index('ix_product_change_seq_id', 'change_seq', 'id'),
+    )
+
+class ProductTombstone(db.Model):
+    # Deleted products, kept so the change feed can report deletions
+    product_id = db.Column(db.Integer, primary_key=True)
+    change_seq = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_product_tombstone_change_seq', 'change_seq', 'product_id'),
+    )
+
+class UploadBlob(db.Model):
+    # Stored upload content by SHA-256 and how many products use it (see uploads.py)
+    digest = db.Column(db.String(64), primary_key=True)
+    ext = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CatalogSequence(db.Model):
+    # Single row counter handing out catalog change sequence numbers
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
 
 
 
 
 class Order(db.Model):
-    id = db.Column()
+    id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    total = db.Column()  # Renamed from total_price
+    total = db.Column(db.Float, nullable=True)  # Renamed from total_price
     status = db.Column(db.String(20), default="Pending")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Add relationship to User
     user = db.relationship('User', backref='orders')
+    
+    __table_args__ = (
+        # Admin order list filters and sorts (see order_reads.py)
+        db.Index('ix_order_created_at_id', 'created_at', 'id'),
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_order_total_id', 'total', 'id'),
+    )
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  # Price at time of purchase
     
     # Relationships for easy access
-    product = db.relationship('Product', backref='order_items')
+    # Order tables may sit on shard databases (see sharding.py): never load
+    # them through a product, deleting a product leaves its order items alone
+    product = db.relationship('Product', backref=db.backref('order_items', lazy='noload', passive_deletes=True))
     order = db.relationship('Order', backref='items')
+    
+    __table_args__ = (
+        # Orders containing a product, for the admin order list filter
+        db.Index('ix_order_item_product_id_order_id', 'product_id', 'order_id'),
+    )
+
+class Review(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
+    text = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        # Keyset pagination walks (product_id, id) newest first
+        db.Index('ix_review_product_id_id', 'product_id', 'id'),
+        db.UniqueConstraint('product_id', 'user_id', name='uq_review_product_user'),
+    )
+
+class ProductRating(db.Model):
+    # Running rating aggregates, kept in step with Review by reviews.py
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)  # Sum of star ratings
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+class IdempotencyKey(db.Model):
+    # Idempotency-Key of a committed POST and its response (see idempotency.py)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of the request body
+    owner = db.Column(db.String(32), nullable=False)  # random token of the request that inserted it
+    status = db.Column(db.Integer, nullable=True)  # NULL until the response is recorded
+    body = db.Column(db.LargeBinary, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+        db.Index('ix_idempotency_key_expires_at', 'expires_at'),
+    )
+
+class Job(db.Model):
+    # Background job queue rows, see jobs.py
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # JSON encoded
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(64), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # refreshed by the running worker
+    last_error = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+class Checkpoint(db.Model):
+    # Position of an incremental batch process (last id handled), by name
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ProductPair(db.Model):
+    # Co-purchase counts, stored in both directions; (p, p) holds the number
+    # of orders containing p. Maintained by recommendations.py
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductRecommendation(db.Model):
+    # Top co-purchased products, "id:score,id:score" best first
+    product_id = db.Column(db.Integer, primary_key=True)
+    neighbors = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class RecommendedOrder(db.Model):
+    # Orders already counted in product_pair whose created_at is past the
+    # recommendations watermark, so a rerun or a moved order isn't counted twice
+    order_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ArchivePart(db.Model):
+    # Manifest of order archive files written by archive.py
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(255), nullable=False, unique=True)  # Relative to ARCHIVE_FOLDER
+    period = db.Column(db.String(7), nullable=False, index=True)  # YYYY-MM of created_at
+    first_order_id = db.Column(db.Integer, nullable=False)
+    last_order_id = db.Column(db.Integer, nullable=False)
+    orders = db.Column(db.Integer, nullable=False)
+    items = db.Column(db.Integer, nullable=False)
+    bytes = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ArchivedOrder(db.Model):
+    # Where an archived order went, for single order lookups
+    order_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    part_id = db.Column(db.Integer, db.ForeignKey('archive_part.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+
+class ArchivedDailySales(db.Model):
+    # Per-day totals of archived orders, for analytics over archived periods
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class ArchivedProductSales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
 
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-   
+    username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)  # Hashed Password
 
 # Function to create default admin (run once)
@@ -0,0 +1,194 @@
+"""Filtered and sorted pages of orders for the admin orders list.
+
+Filters become WHERE clauses that the indexes on ``order`` and
+``order_item`` (see models.py) serve: status and date range use
+``(status, created_at)`` or ``(created_at, id)``, a customer uses
+``(user_id, created_at)``, a product ``(product_id, order_id)`` and
+totals ``(total, id)``. Every shard returns its first ``page * per_page``
+matches in the requested order, merged by ``sharding.merge``.
+
+Counting all matches of a broad filter on a big table costs as much as
+reading them, so ``shard_page`` stops counting at ``count_cap`` rows and the
+caller reports the total as capped.
+
+Page numbers only reach ORDER_PAGE_MAX_DEPTH rows deep: past that, and
+for walking far through a sharded list, pages continue from a cursor
+(``encode_cursor``/``seek``) holding the previous page's last sort key,
+which every shard seeks to through the same indexes.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import select, func, and_, or_, false
+
+from app import db
+from models import Order, OrderItem, User
+from order_status import VALID_ORDER_STATUSES
+
+order_table = Order.__table__
+item_table = OrderItem.__table__
+user_table = User.__table__
+
+SORTS = ("created_at", "total", "status")
+
+# An email prefix matching more customers than this is too vague to filter by
+MAX_MATCHING_USERS = 1000
+
+PAGE_COLUMNS = (order_table.c.id, order_table.c.user_id, order_table.c.status, order_table.c.total,
+                order_table.c.created_at)
+
+
+def parse_filters(args):
+    """Read the order list query parameters into a ``{name: value}`` dict.
+
+    ``status`` takes a comma separated list, ``created_from`` and
+    ``created_to`` (exclusive) are ``YYYY-MM-DD`` like the bulk update
+    filter, ``email`` matches email address prefixes. Raises ValueError for
+    values that can't be parsed.
+    """
+    filters = {}
+    if args.get("status"):
+        statuses = sorted({s.strip() for s in args["status"].split(",") if s.strip()})
+        if not set(statuses) <= set(VALID_ORDER_STATUSES):
+            raise ValueError(f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
+        filters["status"] = statuses
+    for name in ("created_from", "created_to"):
+        if args.get(name):
+            try:
+                filters[name] = datetime.strptime(args[name], "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+    for name in ("user_id", "product_id"):
+        if args.get(name):
+            try:
+                filters[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+    for name in ("min_total", "max_total"):
+        if args.get(name):
+            try:
+                filters[name] = float(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+    if args.get("email", "").strip():
+        filters["email"] = args["email"].strip()
+    return filters
+
+
+def matching_user_ids(filters):
+    """Ids of the customers the filters allow, or None when any customer goes"""
+    if "email" not in filters:
+        return None if "user_id" not in filters else [filters["user_id"]]
+    stmt = select(user_table.c.id).where(user_table.c.email.startswith(filters["email"], autoescape=True))
+    if "user_id" in filters:
+        stmt = stmt.where(user_table.c.id == filters["user_id"])
+    user_ids = db.session.execute(stmt.limit(MAX_MATCHING_USERS + 1)).scalars().all()
+    if len(user_ids) > MAX_MATCHING_USERS:
+        raise ValueError(f"More than {MAX_MATCHING_USERS} customers match that email, be more specific")
+    return user_ids
+
+
+def conditions(filters, user_ids):
+    """WHERE clauses on ``order`` for parsed ``filters`` and ``matching_user_ids``"""
+    c = order_table.c
+    clauses = []
+    if "status" in filters:
+        clauses.append(c.status.in_(filters["status"]))
+    if "created_from" in filters:
+        clauses.append(c.created_at >= filters["created_from"])
+    if "created_to" in filters:
+        clauses.append(c.created_at < filters["created_to"])
+    if user_ids is not None:
+        clauses.append(c.user_id.in_(user_ids))
+    if "product_id" in filters:
+        clauses.append(c.id.in_(select(item_table.c.order_id).where(item_table.c.product_id == filters["product_id"])))
+    # order.total is set at checkout, older orders get it from the order-totals backfill
+    if "min_total" in filters:
+        clauses.append(c.total >= filters["min_total"])
+    if "max_total" in filters:
+        clauses.append(c.total <= filters["max_total"])
+    return clauses
+
+
+def _sort_columns(sort_by):
+    c = order_table.c
+    if sort_by == "total":
+        return (c.total, c.id)
+    if sort_by == "status":
+        return (c.status, c.created_at, c.id)
+    return (c.created_at, c.id)
+
+
+def _after_value(column, value, descending):
+    """Rows past ``value`` in one sort column; NULLs sort lowest, as in MySQL and SQLite"""
+    if value is None:
+        return false() if descending else column.isnot(None)
+    if descending:
+        return or_(column < value, column.is_(None))
+    return column > value
+
+
+def seek(sort_by, descending, cursor):
+    """WHERE clause for the rows after ``cursor`` (from ``decode_cursor``) in ``order_by`` order"""
+    columns = _sort_columns(sort_by)
+    clauses = []
+    for index, column in enumerate(columns):
+        ties = [columns[i].is_(None) if cursor[i] is None else columns[i] == cursor[i] for i in range(index)]
+        clauses.append(and_(*ties, _after_value(column, cursor[index], descending)))
+    return or_(*clauses)
+
+
+def encode_cursor(sort_by, row):
+    """Opaque ``after`` value for the rows following ``row``"""
+    values = [getattr(row, column.name) for column in _sort_columns(sort_by)]
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(sort_by, text):
+    """Sort key values from ``encode_cursor``; raises ValueError for a cursor that isn't one"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(text + "=" * (-len(text) % 4)))
+        columns = _sort_columns(sort_by)
+        if not isinstance(values, list) or len(values) != len(columns) or values[-1] is None:
+            raise ValueError
+        parsers = {"created_at": datetime.fromisoformat, "total": float, "status": str, "id": int}
+        return [None if value is None else parsers[column.name](value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid after cursor for this sort") from None
+
+
+def order_by(sort_by, descending):
+    return [column.desc() if descending else column.asc() for column in _sort_columns(sort_by)]
+
+
+def sort_key(sort_by):
+    """Python key for merging shard pages in ``order_by`` order; NULLs sort first, as in MySQL"""
+    if sort_by == "total":
+        return lambda row: (float("-inf") if row.total is None else row.total, row.id)
+    if sort_by == "status":
+        return lambda row: (row.status or "", row.created_at or datetime.min, row.id)
+    return lambda row: (row.created_at or datetime.min, row.id)
+
+
+def shard_page(clauses, ordering, limit, count_cap, offset=0, after=None):
+    """``(count, rows)``: the ``limit`` orders after ``offset`` (and the ``after``
+    clause) on the current shard matching ``clauses``.
+
+    The count covers every match of ``clauses``, regardless of the page, and
+    stops at ``count_cap + 1`` (no cap when falsy).
+    """
+    page_clauses = list(clauses) if after is None else [*clauses, after]
+    rows = db.session.execute(
+        select(*PAGE_COLUMNS).where(*page_clauses).order_by(*ordering).offset(offset).limit(limit)
+    ).all()
+    # A short page by page number already tells how many match
+    if after is None and len(rows) < limit and (rows or not offset):
+        return offset + len(rows), rows
+    if count_cap:
+        matches = select(order_table.c.id).where(*clauses).limit(count_cap + 1).subquery()
+        count = db.session.execute(select(func.count()).select_from(matches)).scalar()
+    else:
+        count = db.session.execute(select(func.count()).select_from(order_table).where(*clauses)).scalar()
+    return count, rows
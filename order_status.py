@@ -0,0 +1,117 @@
+"""Order status rules and set-based bulk status changes.
+
+Bulk transitions lock the affected orders, check each one against
+ORDER_STATUS_TRANSITIONS and then apply a single UPDATE for everything that
+is allowed. Single order updates go through the same path (``transition``).
+Cancelling releases stock for all cancelled orders in one batched
+statement. The caller owns the transaction and commits or rolls back.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update, func, bindparam
+
+from app import db
+from models import Order, OrderItem, Product
+import changefeed
+
+VALID_ORDER_STATUSES = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled"]
+
+# Next statuses allowed from each status, matching the admin UI buttons
+ORDER_STATUS_TRANSITIONS = {
+    "Pending": ("Processing", "Shipped", "Cancelled"),
+    "Processing": ("Shipped", "Cancelled"),
+    "Shipped": ("Delivered",),
+    "Delivered": (),
+    "Cancelled": (),
+}
+
+order_table = Order.__table__
+order_item_table = OrderItem.__table__
+product_table = Product.__table__
+
+
+def find_order_ids(filters, limit):
+    """Resolve a bulk filter dict to order ids, oldest first.
+
+    Supported keys: ``status``, ``user_id``, ``created_from`` and
+    ``created_to`` (``YYYY-MM-DD``). Raises ValueError on bad input.
+    """
+    stmt = select(order_table.c.id)
+    if filters.get("status"):
+        if filters["status"] not in VALID_ORDER_STATUSES:
+            raise ValueError(f"Invalid filter status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
+        stmt = stmt.where(order_table.c.status == filters["status"])
+    if filters.get("user_id"):
+        stmt = stmt.where(order_table.c.user_id == int(filters["user_id"]))
+    if filters.get("created_from"):
+        stmt = stmt.where(order_table.c.created_at >= datetime.strptime(filters["created_from"], "%Y-%m-%d"))
+    if filters.get("created_to"):
+        stmt = stmt.where(order_table.c.created_at < datetime.strptime(filters["created_to"], "%Y-%m-%d"))
+    return db.session.execute(stmt.order_by(order_table.c.id).limit(limit)).scalars().all()
+
+
+def release_stock(order_ids):
+    """Add the quantities of the given orders back to product stock in one batched UPDATE"""
+    # Summed where the items are (the order shard), applied where products are
+    quantities = db.session.execute(
+        select(order_item_table.c.product_id, func.sum(order_item_table.c.quantity))
+        .where(order_item_table.c.order_id.in_(order_ids))
+        .group_by(order_item_table.c.product_id)
+    ).all()
+    if not quantities:
+        return
+    db.session.execute(
+        update(product_table)
+        .where(product_table.c.id == bindparam("product_id"))
+        .values(stock=product_table.c.stock + bindparam("quantity")),
+        [{"product_id": product_id, "quantity": quantity} for product_id, quantity in quantities],
+    )
+    changefeed.mark_changed([product_id for product_id, _ in quantities])
+
+
+def bulk_transition(order_ids, status):
+    """Move ``order_ids`` to ``status`` where the transition is allowed.
+
+    Returns one result dict per requested id, in request order. ``result`` is
+    ``updated``, ``unchanged``, ``not_found`` or ``invalid_transition``.
+    """
+    rows = db.session.execute(
+        select(order_table.c.id, order_table.c.status, order_table.c.user_id)
+        .where(order_table.c.id.in_(order_ids))
+        .with_for_update()
+    ).all()
+    current = {row.id: row.status for row in rows}
+    owners = {row.id: row.user_id for row in rows}
+
+    results = []
+    to_update = []
+    for order_id in order_ids:
+        if order_id not in current:
+            results.append({"order_id": order_id, "result": "not_found"})
+            continue
+
+        previous = current[order_id] or "Pending"
+        if previous == status:
+            result = "unchanged"
+        elif status in ORDER_STATUS_TRANSITIONS.get(previous, ()):
+            result = "updated"
+            to_update.append(order_id)
+        else:
+            result = "invalid_transition"
+        results.append({"order_id": order_id, "user_id": owners[order_id], "result": result,
+                        "from": previous, "to": status})
+
+    if to_update:
+        db.session.execute(
+            update(order_table).where(order_table.c.id.in_(to_update)).values(status=status)
+        )
+        if status == "Cancelled":
+            release_stock(to_update)
+
+    return results
+
+
+def transition(order_id, status):
+    """``bulk_transition`` for one order on the current shard; returns its result dict"""
+    (result,) = bulk_transition([order_id], status)
+    return result
@@ -0,0 +1,113 @@
+"""Warm-up and fork hooks for running under a pre-fork server (see wsgi.py).
+
+The first requests a fresh process serves pay for one-off work: importing
+modules the routes load lazily, configuring the ORM mappers, compiling
+every statement shape to SQL, building the catalog statement cache and
+the search suggestion index and opening database connections. ``warm_up``
+does that up front by importing WARMUP_IMPORTS and sending the
+WARMUP_PATHS GET requests through the app, so exactly the code paths real
+requests take are warmed, and ``open_connections`` fills every engine's
+pool.
+
+When the server loads the app in its master and forks workers from it,
+everything ``warm_up`` built is inherited, but connections, threads and
+open files must not cross the fork: ``before_fork`` releases them in the
+master and ``after_fork`` sets them up again in each worker.
+"""
+import gc
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up(app, paths=None):
+    """Import WARMUP_IMPORTS and GET each path once; returns ``{path: (status, seconds)}``"""
+    for name in app.config.get("WARMUP_IMPORTS", ()):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Warm-up could not import %s", name, exc_info=True)
+
+    if paths is None:
+        paths = app.config.get("WARMUP_PATHS", ())
+    client = app.test_client()
+    results = {}
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            status = client.get(path).status_code
+        except Exception:
+            logger.exception("Warm-up request to %s failed", path)
+            status = None
+        results[path] = (status, time.perf_counter() - started)
+        if status != 200:
+            logger.warning("Warm-up request to %s returned %s", path, status)
+    logger.info("Warmed up %d path(s) in %.3fs", len(results), sum(seconds for _, seconds in results.values()))
+    return results
+
+
+def open_connections(app, count=None):
+    """Open ``count`` pooled connections (WARMUP_POOL_CONNECTIONS) on every database"""
+    from app import db
+
+    if count is None:
+        count = app.config.get("WARMUP_POOL_CONNECTIONS", 1)
+    opened = 0
+    with app.app_context():
+        for key, engine in db.engines.items():
+            connections = []
+            try:
+                for _ in range(count):
+                    connections.append(engine.connect())
+            except Exception as e:
+                logger.warning("Could not open connections to %s: %s", key or "the main database", e)
+            finally:
+                # Closing returns them to the pool, still connected
+                for connection in connections:
+                    connection.close()
+            opened += len(connections)
+    return opened
+
+
+def before_fork(app):
+    """Release what workers can't share; call in the master once the app is loaded"""
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    log = app.extensions.pop("eventlog", None)
+    if log is not None:
+        log.close()
+    worker = app.extensions.pop("job_worker", None)
+    if worker is not None:
+        worker.stop(timeout=30)
+    # Keep the collector from touching, and so copying, every inherited page
+    gc.freeze()
+
+
+def after_fork(app):
+    """Per-process setup in a worker forked from a master that ran ``before_fork``"""
+    from app import db
+    from events import init_events
+    from eventlog import init_event_log
+    from jobs import Worker
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # Drop any inherited connections without closing the master's sockets
+            engine.dispose(close=False)
+    # A Redis broker's listener thread stayed behind in the master
+    init_events(app)
+    init_event_log(app)
+    threads = app.config.get("JOBS_INPROCESS_THREADS", 0)
+    if threads:
+        app.extensions["job_worker"] = worker = Worker(
+            app, threads=threads, poll_interval=app.config.get("JOBS_POLL_INTERVAL", 1.0),
+            stale_timeout=app.config.get("JOBS_STALE_TIMEOUT", 600)
+        )
+        worker.start()
+    if app.config.get("WARMUP_ENABLED", True):
+        open_connections(app)
@@ -0,0 +1,181 @@
+"""Token bucket rate limiting and in-flight load shedding.
+
+Limits are checked in ``before_request`` hooks, so an over-limit request is
+rejected with 429 and ``Retry-After`` before the view runs any query or
+password hash. Each request is counted against the bucket of its blueprint
+group and, where configured, of a route group (login, search, checkout).
+
+Buckets live in process memory by default. Setting RATELIMIT_STORAGE_URL to
+a ``redis://`` URL shares them across workers (needs the redis package).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, jsonify, current_app, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+try:
+    import redis
+except ImportError:  # only needed for the shared backend
+    redis = None
+
+
+class MemoryBackend:
+    """Buckets for a single process, capped at ``max_keys`` least recently used keys"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        """Take one token; return ``(allowed, retry_after_seconds)``"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1:
+                allowed, retry_after = True, 0
+                tokens -= 1
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class RedisBackend:
+    """Buckets shared by every worker through one Redis hash per key"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't'))
+    local last = tonumber(redis.call('HGET', KEYS[1], 'ts'))
+    if tokens == nil then
+        tokens = capacity
+        last = now
+    end
+    tokens = math.min(capacity, tokens + (now - last) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url, prefix="ratelimit:"):
+        if redis is None:
+            raise RuntimeError("RATELIMIT_STORAGE_URL needs the 'redis' package installed")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, rate):
+        allowed, retry_after = self._script(keys=[self.prefix + key], args=[capacity, rate])
+        return bool(allowed), float(retry_after)
+
+
+def _client_key(kind):
+    if kind == "user":
+        # Only a verified token names a user, made-up tokens would each get a fresh bucket
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None
+        if identity is not None:
+            return f"user:{identity}"
+    # Anonymous or invalid tokens and the "ip" kind fall back to the remote address
+    return f"ip:{request.remote_addr}"
+
+
+def _groups_for_request(config):
+    groups = []
+    blueprint_group = config["RATELIMIT_BLUEPRINTS"].get(request.blueprint)
+    if blueprint_group:
+        groups.append(blueprint_group)
+    endpoint_group = config["RATELIMIT_ENDPOINTS"].get(request.endpoint)
+    if endpoint_group:
+        groups.append(endpoint_group)
+    if request.endpoint in config["RATELIMIT_SEARCH_ENDPOINTS"] and request.args.get("search"):
+        groups.append("search")
+    return groups
+
+
+def _too_many(retry_after, message):
+    response = jsonify({"error": message})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def check_rate_limits():
+    """before_request hook: reject the request if any of its buckets is empty"""
+    if request.method == "OPTIONS" or not current_app.config.get("RATELIMIT_ENABLED", True):
+        return None
+
+    config = current_app.config
+    backend = current_app.extensions["ratelimit"]
+    for group in _groups_for_request(config):
+        rule = config["RATELIMIT_RULES"].get(group)
+        if rule is None:
+            continue
+        capacity, rate, key_kind = rule
+        allowed, retry_after = backend.consume(f"{group}:{_client_key(key_kind)}", capacity, rate)
+        if not allowed:
+            return _too_many(retry_after, f"Too many requests ({group}), try again later")
+    return None
+
+
+def init_rate_limiting(app):
+    """Attach the configured backend and hook every registered blueprint.
+
+    Call after the blueprints are registered.
+    """
+    url = app.config.get("RATELIMIT_STORAGE_URL")
+    app.extensions["ratelimit"] = RedisBackend(url) if url else MemoryBackend(
+        app.config.get("RATELIMIT_MAX_KEYS", 100000)
+    )
+
+    for name in app.config.get("RATELIMIT_BLUEPRINTS", {}):
+        if name in app.blueprints:
+            app.before_request_funcs.setdefault(name, []).append(check_rate_limits)
+
+    max_inflight = app.config.get("RATELIMIT_MAX_INFLIGHT", 0)
+    if max_inflight:
+        inflight = threading.BoundedSemaphore(max_inflight)
+        exempt = set(app.config.get("RATELIMIT_INFLIGHT_EXEMPT", ()))
+
+        @app.before_request
+        def shed_load():
+            if request.endpoint in exempt:
+                return None
+            # Refuse outright instead of queueing when the process is saturated
+            if not inflight.acquire(blocking=False):
+                return _too_many_inflight()
+            g.ratelimit_inflight = True
+            return None
+
+        @app.teardown_request
+        def release_inflight(exc=None):
+            if g.pop("ratelimit_inflight", False):
+                inflight.release()
+
+
+def _too_many_inflight():
+    response = jsonify({"error": "Server is busy, try again shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
@@ -0,0 +1,332 @@
+"""Precomputed "frequently bought together" recommendations.
+
+``build`` folds in the orders placed since the last run and turns each
+basket into pair counts in ``product_pair`` (both directions, plus the
+diagonal holding how many orders contain the product). Orders are only ever
+added, so counts only grow and a product's new top-K can only come from its
+old top-K plus the partners touched in this chunk. The list is merged in
+Python and written to ``product_recommendation`` in the same transaction as
+the counts, so an interrupted run resumes cleanly. ``--full`` starts over,
+which also drops deleted products and cancelled history.
+
+Order ids don't say what has committed: shards hand them out in
+per-process blocks, so a lower id often commits later. Runs therefore
+walk ``created_at`` up to RECOMMENDATIONS_SETTLE_SECONDS ago, by which
+time every checkout that stamped it has committed, on every shard, from
+one watermark kept in ``checkpoint``. Orders counted above the watermark
+are listed in ``recommended_order`` with the counts, so rerunning an
+interrupted window, or meeting an order that ``reshard`` moved to a shard
+walked later, doesn't count it twice; the list is cut back to the new
+watermark at the end of each run.
+
+Lookups read one row per product by primary key and keep it in a small
+per-process cache, so a product page or a cart costs a dictionary lookup
+most of the time.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, insert, delete, bindparam, or_, and_
+
+from app import db
+from models import Order, OrderItem, ProductPair, ProductRecommendation, RecommendedOrder
+import checkpoints
+import sharding
+
+# Watermark as microseconds since the epoch; the id based "recommendations" checkpoints are retired
+CHECKPOINT = "recommendations:created_at"
+MAX_LIMIT = 50
+
+order_table = Order.__table__
+item_table = OrderItem.__table__
+pair_table = ProductPair.__table__
+recommendation_table = ProductRecommendation.__table__
+recommended_table = RecommendedOrder.__table__
+
+_EPOCH = datetime(1970, 1, 1)
+
+_update_pair = (
+    update(pair_table)
+    .where(pair_table.c.product_id == bindparam("a"), pair_table.c.other_id == bindparam("b"))
+    .values(count=bindparam("n"))
+)
+
+
+def encode_neighbors(neighbors):
+    return ",".join(f"{other}:{count}" for other, count in neighbors)
+
+
+def decode_neighbors(value):
+    return [tuple(int(part) for part in item.split(":")) for item in value.split(",") if item]
+
+
+def basket_pairs(baskets, max_basket):
+    """Count ``(a, b)`` co-purchases, both ways, and ``(a, a)`` per basket"""
+    counts = Counter()
+    for basket in baskets:
+        # Bulk orders would add size**2 pairs that say little about taste
+        if len(basket) > max_basket:
+            continue
+        items = sorted(basket)
+        for i, a in enumerate(items):
+            counts[a, a] += 1
+            for b in items[i + 1:]:
+                counts[a, b] += 1
+                counts[b, a] += 1
+    return counts
+
+
+def _apply_counts(deltas, batch_size=100):
+    """Add ``deltas`` to product_pair; returns the new count of every pair"""
+    partners = defaultdict(set)
+    for a, b in deltas:
+        partners[a].add(b)
+    products = sorted(partners)
+
+    current = {}
+    for start in range(0, len(products), batch_size):
+        batch = products[start:start + batch_size]
+        others = set().union(*(partners[a] for a in batch))
+        # Two IN lists become primary key seeks; row-value IN is much
+        # slower on SQLite. The result is a superset, filtered below.
+        for a, b, count in db.session.execute(
+            select(pair_table.c.product_id, pair_table.c.other_id, pair_table.c.count)
+            .where(pair_table.c.product_id.in_(batch), pair_table.c.other_id.in_(others))
+        ):
+            if (a, b) in deltas:
+                current[a, b] = count
+
+    totals = {pair: current.get(pair, 0) + delta for pair, delta in deltas.items()}
+    existing = [{"a": a, "b": b, "n": totals[a, b]} for a, b in current]
+    new = [{"product_id": a, "other_id": b, "count": n} for (a, b), n in totals.items() if (a, b) not in current]
+    if existing:
+        db.session.execute(_update_pair, existing)
+    if new:
+        db.session.execute(insert(pair_table), new)
+    return totals
+
+
+def _merge_top_k(totals, top_k):
+    """Rewrite the recommendation rows of every product with a changed pair"""
+    partners = defaultdict(dict)
+    for (a, b), count in totals.items():
+        if a != b:
+            partners[a][b] = count
+    if not partners:
+        return
+
+    product_ids = list(partners)
+    for product_id, neighbors in db.session.execute(
+        select(recommendation_table.c.product_id, recommendation_table.c.neighbors)
+        .where(recommendation_table.c.product_id.in_(product_ids))
+    ):
+        merged = partners[product_id]
+        for other, count in decode_neighbors(neighbors):
+            # Counts touched in this chunk are newer than the stored ones
+            merged.setdefault(other, count)
+
+    now = datetime.utcnow()
+    db.session.execute(delete(recommendation_table).where(recommendation_table.c.product_id.in_(product_ids)))
+    db.session.execute(insert(recommendation_table), [
+        {
+            "product_id": product_id,
+            "neighbors": encode_neighbors(
+                sorted(partners[product_id].items(), key=lambda item: (-item[1], item[0]))[:top_k]
+            ),
+            "updated_at": now,
+        }
+        for product_id in product_ids
+    ])
+
+
+def _to_position(value):
+    """Checkpoint position (microseconds since the epoch) of a created_at watermark"""
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_position(position):
+    return _EPOCH + timedelta(microseconds=position)
+
+
+def _build_shard(since, until, chunk_size, top_k, max_basket):
+    """Count this shard's orders created in ``(since, until]`` that aren't counted yet"""
+    processed = 0
+    cursor = None
+    while True:
+        stmt = (
+            select(order_table.c.id, order_table.c.created_at)
+            .where(order_table.c.created_at > since, order_table.c.created_at <= until)
+            .order_by(order_table.c.created_at, order_table.c.id).limit(chunk_size)
+        )
+        if cursor is not None:
+            stmt = stmt.where(or_(
+                order_table.c.created_at > cursor[0],
+                and_(order_table.c.created_at == cursor[0], order_table.c.id > cursor[1]),
+            ))
+        orders = db.session.execute(stmt).all()
+        if not orders:
+            break
+        cursor = (orders[-1].created_at, orders[-1].id)
+
+        counted = set(db.session.execute(
+            select(recommended_table.c.order_id)
+            .where(recommended_table.c.order_id.in_([order_id for order_id, _ in orders]))
+        ).scalars())
+        new = [(order_id, created_at) for order_id, created_at in orders if order_id not in counted]
+        if not new:
+            continue
+
+        baskets = defaultdict(set)
+        for order_id, product_id in db.session.execute(
+            select(item_table.c.order_id, item_table.c.product_id)
+            .where(item_table.c.order_id.in_([order_id for order_id, _ in new]))
+        ):
+            baskets[order_id].add(product_id)
+
+        deltas = basket_pairs(baskets.values(), max_basket)
+        if deltas:
+            _merge_top_k(_apply_counts(deltas), top_k)
+        db.session.execute(insert(recommended_table), [
+            {"order_id": order_id, "created_at": created_at} for order_id, created_at in new
+        ])
+        db.session.commit()
+        processed += len(new)
+    return processed
+
+
+def build(chunk_size=2000, top_k=20, max_basket=50, full=False, settle_seconds=300):
+    """Fold orders placed since the last run into the recommendations.
+
+    Walks every order shard for orders created between the watermark and
+    ``settle_seconds`` ago and commits after every chunk. Returns
+    ``(orders, watermark)``: the number of orders processed and the
+    created_at time everything up to which is now included.
+    """
+    # Counts from id based runs can't be continued, the first run starts over
+    if full or checkpoints.load(CHECKPOINT, default=None) is None:
+        db.session.execute(delete(pair_table))
+        db.session.execute(delete(recommendation_table))
+        db.session.execute(delete(recommended_table))
+        checkpoints.save(CHECKPOINT, 0)
+        db.session.commit()
+
+    since = _from_position(checkpoints.load(CHECKPOINT))
+    # Whole microseconds, so the watermark survives the round trip through the checkpoint
+    until = _from_position(_to_position(datetime.utcnow() - timedelta(seconds=settle_seconds)))
+    if until <= since:
+        return 0, since
+
+    processed = 0
+    for key in sharding.keys():
+        with sharding.use(key):
+            processed += _build_shard(since, until, chunk_size, top_k, max_basket)
+
+    # Orders created up to the new watermark are never walked again
+    checkpoints.save(CHECKPOINT, _to_position(until))
+    db.session.execute(delete(recommended_table).where(recommended_table.c.created_at <= until))
+    db.session.commit()
+    clear_cache()
+    return processed, until
+
+
+class _Cache:
+    """Bounded ``product_id -> (expires, neighbors)`` map"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_many(self, product_ids, ttl, max_entries):
+        now = time.monotonic()
+        found = {}
+        missing = []
+        for product_id in product_ids:
+            entry = self.entries.get(product_id)
+            if entry is not None and entry[0] > now:
+                found[product_id] = entry[1]
+            else:
+                missing.append(product_id)
+        if not missing:
+            return found
+
+        loaded = dict.fromkeys(missing, ())
+        pair_counts = dict.fromkeys(missing, 0)
+        for product_id, neighbors in db.session.execute(
+            select(recommendation_table.c.product_id, recommendation_table.c.neighbors)
+            .where(recommendation_table.c.product_id.in_(missing))
+        ):
+            loaded[product_id] = decode_neighbors(neighbors)
+        # Orders containing each product, to turn counts into confidence
+        for product_id, count in db.session.execute(
+            select(pair_table.c.product_id, pair_table.c.count)
+            .where(pair_table.c.product_id.in_(missing), pair_table.c.other_id == pair_table.c.product_id)
+        ):
+            pair_counts[product_id] = count
+
+        expires = now + ttl
+        with self.lock:
+            for product_id in missing:
+                orders = pair_counts[product_id]
+                neighbors = tuple(
+                    (other, round(count / orders, 4) if orders else 0.0)
+                    for other, count in loaded[product_id]
+                )
+                if len(self.entries) >= max_entries:
+                    # Dicts keep insertion order, so this drops the oldest entry
+                    self.entries.pop(next(iter(self.entries)), None)
+                self.entries[product_id] = (expires, neighbors)
+                found[product_id] = neighbors
+        return found
+
+
+_cache = _Cache()
+
+
+def clear_cache():
+    with _cache.lock:
+        _cache.entries.clear()
+
+
+def neighbors_for(app, product_ids):
+    """``{product_id: ((other_id, confidence), ...)}`` best first"""
+    return _cache.get_many(
+        product_ids,
+        app.config.get("RECOMMENDATIONS_CACHE_TTL", 300),
+        app.config.get("RECOMMENDATIONS_CACHE_SIZE", 100000),
+    )
+
+
+def for_products(app, product_ids, limit=10):
+    """Products bought together with any of ``product_ids`` (a product page or a cart).
+
+    Confidence scores from several cart items add up, and items already in
+    the cart are left out. Returns ``[(product_id, score)]`` best first.
+    """
+    exclude = set(product_ids)
+    scores = defaultdict(float)
+    for neighbors in neighbors_for(app, product_ids).values():
+        for other, confidence in neighbors:
+            if other not in exclude:
+                scores[other] += confidence
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("build-recommendations")
+    @click.option("--full", is_flag=True, help="Drop all counts and rebuild from the first order")
+    def build_recommendations_command(full):
+        """Update "frequently bought together" from orders placed since the last run"""
+        started = time.perf_counter()
+        processed, watermark = build(
+            chunk_size=app.config.get("RECOMMENDATIONS_CHUNK_SIZE", 2000),
+            top_k=app.config.get("RECOMMENDATIONS_TOP_K", 20),
+            max_basket=app.config.get("RECOMMENDATIONS_MAX_BASKET", 50),
+            full=full,
+            settle_seconds=app.config.get("RECOMMENDATIONS_SETTLE_SECONDS", 300),
+        )
+        print(f"Processed {processed} order(s) placed up to {watermark:%Y-%m-%d %H:%M:%S} "
+              f"in {time.perf_counter() - started:.1f}s")
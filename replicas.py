@@ -0,0 +1,262 @@
+"""Read-replica routing for read-only requests.
+
+REPLICA_URIS lists databases replicating the main one; each becomes a
+``replica_<n>`` bind. A GET or HEAD request picks one healthy replica
+round-robin in ``before_request`` and ``db.session`` sends its reads of the
+main database there. Everything else stays on the primary:
+
+* requests with any other method,
+* statements that write, lock (``FOR UPDATE``) or are raw SQL,
+* every statement after the session's first write or flush, so a request
+  reads its own writes,
+* requests from a client (JWT identity, else remote address) that wrote
+  within the last REPLICA_STICKY_SECONDS, so e.g. the order list right
+  after checkout is not served by a replica that hasn't caught up yet.
+
+A background thread pings every replica each REPLICA_HEALTH_INTERVAL
+seconds (on MySQL it also drops replicas more than REPLICA_MAX_LAG seconds
+behind) and only healthy ones are picked; with none left, reads go to the
+primary. Sharded order tables (see sharding.py) are routed to their shard
+as before, replicas only serve the main database.
+
+Write timestamps live in process memory by default. With several workers
+set REPLICA_STICKY_STORAGE_URL to a ``redis://`` URL so a write on one
+worker keeps the client's reads on the primary on all of them.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+
+import sqlalchemy as sa
+from flask import request, g, has_app_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+from sharding import ShardSession
+
+try:
+    import redis
+except ImportError:  # only needed for the shared stickiness store
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+BIND_PREFIX = "replica_"
+READ_METHODS = ("GET", "HEAD")
+
+
+def bind_key(index):
+    return f"{BIND_PREFIX}{index}"
+
+
+def configure(app):
+    """Register one bind per replica; must run before ``db.init_app``"""
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for index, uri in enumerate(app.config.get("REPLICA_URIS") or []):
+        binds[bind_key(index)] = uri
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def _writes(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, sa.sql.dml.UpdateBase):
+        return True
+    if isinstance(clause, sa.sql.Select):
+        return clause._for_update_arg is not None
+    # Raw SQL may write or lock; don't guess
+    return isinstance(clause, sa.sql.elements.TextClause)
+
+
+class ReplicaSession(ShardSession):
+    """``db.session`` class that serves a read-only request's reads from its replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not has_app_context():
+            return engine
+        replica = g.get("replica")
+        if replica is None or self.info.get("primary"):
+            return engine
+        if self._flushing or not self._is_clean() or _writes(clause):
+            # From here on this request reads its own writes
+            self.info["primary"] = True
+            return engine
+        engines = self._db.engines
+        if engine is not engines[None]:
+            return engine
+        return engines[replica]
+
+
+class ReplicaPool:
+    """Round-robin over the replicas that passed the last health check"""
+
+    def __init__(self, engines, interval=5, max_lag=None):
+        self.engines = engines  # bind key -> engine
+        self.interval = interval
+        self.max_lag = max_lag
+        self.healthy = list(engines)  # optimistic until the first check
+        self._counter = count()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def pick(self):
+        if self._pid != os.getpid():
+            self._start()
+        healthy = self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def _start(self):
+        # Per process: a thread started before a fork doesn't survive in the child
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._loop, name="replica-health", daemon=True).start()
+
+    def _lag(self, conn):
+        if conn.dialect.name != "mysql":
+            return 0
+        try:
+            row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+            lag = row and row.get("Seconds_Behind_Source")
+        except sa.exc.DBAPIError:
+            # MySQL before 8.0.22
+            row = conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+            lag = row and row.get("Seconds_Behind_Master")
+        if row is None:
+            return 0
+        # NULL means replication is stopped
+        return float("inf") if lag is None else lag
+
+    def check(self):
+        healthy = []
+        for key, engine in self.engines.items():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(sa.text("SELECT 1"))
+                    lag = self._lag(conn) if self.max_lag is not None else 0
+                if lag and lag > self.max_lag:
+                    logger.warning("Replica %s is %s seconds behind, not using it", key, lag)
+                    continue
+                healthy.append(key)
+            except Exception as e:
+                logger.warning("Replica %s failed its health check: %s", key, e)
+        if healthy != self.healthy:
+            logger.info("Healthy replicas: %s", ", ".join(healthy) or "none")
+        self.healthy = healthy
+        return healthy
+
+    def current_lag(self):
+        """Seconds the furthest behind reachable replica lags (0 when not measurable)"""
+        lags = []
+        for key, engine in self.engines.items():
+            try:
+                with engine.connect() as conn:
+                    lags.append(self._lag(conn))
+            except Exception as e:
+                logger.warning("Could not read the lag of replica %s: %s", key, e)
+        return max(lags, default=0)
+
+    def _loop(self):
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+
+class MemoryStickiness:
+    """Last write time per client for this process, capped at ``max_keys`` clients"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, client, seconds):
+        with self._lock:
+            self._until.pop(client, None)
+            self._until[client] = time.monotonic() + seconds
+            if len(self._until) > self.max_keys:
+                self._until.popitem(last=False)
+
+    def is_sticky(self, client):
+        until = self._until.get(client)
+        return until is not None and until > time.monotonic()
+
+
+class RedisStickiness:
+    """Write markers shared by every worker, expiring on their own"""
+
+    def __init__(self, url, prefix="replica:sticky:"):
+        if redis is None:
+            raise RuntimeError("REPLICA_STICKY_STORAGE_URL needs the 'redis' package installed")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def mark(self, client, seconds):
+        self._client.set(self.prefix + client, 1, px=max(1, int(seconds * 1000)))
+
+    def is_sticky(self, client):
+        return bool(self._client.exists(self.prefix + client))
+
+
+def _client_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    token = request.headers.get("Authorization", "")
+    if token:
+        # Views that decode the token themselves (admin order detail)
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
+    return f"ip:{request.remote_addr}"
+
+
+def init_replicas(app):
+    """Start routing reads to REPLICA_URIS; call after ``db.init_app``"""
+    from app import db
+
+    uris = app.config.get("REPLICA_URIS") or []
+    if not uris:
+        return
+    with app.app_context():
+        engines = {bind_key(index): db.engines[bind_key(index)] for index in range(len(uris))}
+    pool = ReplicaPool(
+        engines,
+        interval=app.config.get("REPLICA_HEALTH_INTERVAL", 5),
+        max_lag=app.config.get("REPLICA_MAX_LAG"),
+    )
+    url = app.config.get("REPLICA_STICKY_STORAGE_URL")
+    stickiness = RedisStickiness(url) if url else MemoryStickiness()
+    sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 5)
+    app.extensions["replicas"] = pool
+
+    @app.before_request
+    def choose_replica():
+        if request.method not in READ_METHODS:
+            return None
+        client = _client_key()
+        g.replica_client = client
+        if not stickiness.is_sticky(client):
+            g.replica = pool.pick()
+        return None
+
+    @app.after_request
+    def remember_writes(response):
+        wrote = request.method not in READ_METHODS and request.method != "OPTIONS"
+        if (wrote and response.status_code < 400) or db.session.info.get("primary"):
+            client = g.get("replica_client") or _client_key()
+            try:
+                stickiness.mark(client, sticky_seconds)
+            except Exception:
+                # Worst case this client may briefly read stale data
+                logger.exception("Could not record write for %s", client)
+        return response
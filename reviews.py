@@ -0,0 +1,191 @@
+"""Product reviews and the rating aggregates derived from them.
+
+Every add, edit or delete of a Review applies a delta to the product's
+ProductRating row (count, star total and per-star distribution) and refreshes
+the denormalized ``Product.rating`` average in the same transaction, so
+listings can show and sort by rating without touching the review table.
+``reconcile_ratings`` rebuilds the aggregates from scratch.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func, case
+
+from app import db
+from models import Review, ProductRating, Product
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+review_table = Review.__table__
+product_table = Product.__table__
+
+
+def parse_rating(value):
+    """Validate a star rating, raising ValueError when out of range"""
+    rating = int(value)
+    if not MIN_RATING <= rating <= MAX_RATING:
+        raise ValueError(f"Rating must be between {MIN_RATING} and {MAX_RATING}")
+    return rating
+
+
+def _lock_product(product_id):
+    """Lock the product row, serializing rating changes per product.
+
+    Call before writing any review row: on InnoDB inserting a review takes a
+    shared lock on the product for its foreign key, and upgrading that to
+    this lock deadlocks against a concurrent reviewer holding the same one.
+    """
+    db.session.execute(select(product_table.c.id).where(product_table.c.id == product_id).with_for_update())
+
+
+def _apply_delta(product_id, removed=None, added=None):
+    """Move one review's stars out of and/or into the product aggregates.
+
+    The caller holds ``_lock_product``, so two first reviews can't both
+    insert the row below.
+    """
+    stats = db.session.get(ProductRating, product_id, with_for_update=True)
+    if stats is None:
+        stats = ProductRating(product_id=product_id, count=0, total=0,
+                              stars_1=0, stars_2=0, stars_3=0, stars_4=0, stars_5=0)
+        db.session.add(stats)
+
+    if removed is not None:
+        stats.count -= 1
+        stats.total -= removed
+        setattr(stats, f"stars_{removed}", getattr(stats, f"stars_{removed}") - 1)
+    if added is not None:
+        stats.count += 1
+        stats.total += added
+        setattr(stats, f"stars_{added}", getattr(stats, f"stars_{added}") + 1)
+
+    average = stats.total / stats.count if stats.count else None
+    db.session.execute(
+        update(product_table).where(product_table.c.id == product_id).values(rating=average)
+    )
+
+
+def add_review(product_id, user_id, rating, text=None):
+    _lock_product(product_id)
+    review = Review(product_id=product_id, user_id=user_id, rating=rating, text=text)
+    db.session.add(review)
+    db.session.flush()
+    _apply_delta(product_id, added=rating)
+    return review
+
+
+def edit_review(review, rating=None, text=None):
+    if rating is not None and rating != review.rating:
+        _lock_product(review.product_id)
+        _apply_delta(review.product_id, removed=review.rating, added=rating)
+        review.rating = rating
+    if text is not None:
+        review.text = text
+    review.updated_at = datetime.utcnow()
+    return review
+
+
+def delete_review(review):
+    _lock_product(review.product_id)
+    _apply_delta(review.product_id, removed=review.rating)
+    db.session.delete(review)
+
+
+def product_deleted(product_id):
+    """Delete a product's reviews and rating aggregates, before the product itself"""
+    db.session.execute(delete(review_table).where(review_table.c.product_id == product_id))
+    db.session.execute(delete(ProductRating.__table__).where(ProductRating.__table__.c.product_id == product_id))
+
+
+def list_reviews(product_id, limit, after=None):
+    """Return ``(reviews, next_after)`` for one page, newest first.
+
+    Pages are keyed on the last review id seen rather than an OFFSET, so deep
+    pages cost the same as the first one.
+    """
+    stmt = (
+        select(review_table.c.id, review_table.c.user_id, review_table.c.rating,
+               review_table.c.text, review_table.c.created_at)
+        .where(review_table.c.product_id == product_id)
+        .order_by(review_table.c.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(review_table.c.id < after)
+
+    rows = db.session.execute(stmt).all()
+    next_after = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+def rating_summary(product_id):
+    stats = db.session.get(ProductRating, product_id)
+    if stats is None or not stats.count:
+        return {"average": None, "count": 0,
+                "distribution": {str(stars): 0 for stars in range(MIN_RATING, MAX_RATING + 1)}}
+    return {
+        "average": stats.total / stats.count,
+        "count": stats.count,
+        "distribution": {
+            str(stars): getattr(stats, f"stars_{stars}")
+            for stars in range(MIN_RATING, MAX_RATING + 1)
+        },
+    }
+
+
+def reconcile_ratings(chunk_size=1000):
+    """Rebuild ProductRating and Product.rating from the review table.
+
+    Runs in product id chunks and commits after each one. Returns the number
+    of products written.
+    """
+    written = 0
+    last_id = 0
+    while True:
+        product_ids = db.session.execute(
+            select(product_table.c.id)
+            .where(product_table.c.id > last_id)
+            .order_by(product_table.c.id)
+            .limit(chunk_size)
+        ).scalars().all()
+        if not product_ids:
+            return written
+        last_id = product_ids[-1]
+
+        aggregates = db.session.execute(
+            select(
+                review_table.c.product_id,
+                func.count(),
+                func.sum(review_table.c.rating),
+                *[func.sum(case((review_table.c.rating == stars, 1), else_=0))
+                  for stars in range(MIN_RATING, MAX_RATING + 1)]
+            )
+            .where(review_table.c.product_id.in_(product_ids))
+            .group_by(review_table.c.product_id)
+        ).all()
+
+        db.session.execute(delete(ProductRating.__table__).where(
+            ProductRating.__table__.c.product_id.in_(product_ids)
+        ))
+        db.session.execute(
+            update(product_table).where(product_table.c.id.in_(product_ids)).values(rating=None)
+        )
+        for product_id, count, total, *stars in aggregates:
+            db.session.add(ProductRating(
+                product_id=product_id, count=count, total=total,
+                **{f"stars_{i}": int(n) for i, n in enumerate(stars, start=MIN_RATING)}
+            ))
+            db.session.execute(
+                update(product_table).where(product_table.c.id == product_id)
+                .values(rating=total / count)
+            )
+        db.session.commit()
+        written += len(aggregates)
+
+
+def register_commands(app):
+    @app.cli.command("reconcile-ratings")
+    def reconcile_ratings_command():
+        """Rebuild product rating aggregates from the review table"""
+        written = reconcile_ratings()
+        print(f"Reconciled ratings for {written} product(s)")
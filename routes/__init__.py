@@ -0,0 +1,11 @@
+"""HTTP routes, one module per blueprint.
+
+Helpers shared between blueprints (admin check, SSE responses) live in
+``routes.common``.
+"""
+from routes.admin import admin_bp
+from routes.user import user_bp
+from routes.public import public_bp
+from routes.assets import assets_bp
+
+__all__ = ["admin_bp", "user_bp", "public_bp", "assets_bp"]
@@ -0,0 +1,1036 @@
+from flask import request, jsonify, Blueprint, current_app, send_from_directory
+from app import db
+from models import User, Product, Order, Admin, OrderItem
+from werkzeug.security import check_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
+from werkzeug.exceptions import HTTPException
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+import catalog_reads
+import order_status
+import order_reads
+import jobs
+import uploads
+import reviews
+import suggest
+import events
+import changefeed
+import dashboard
+import archive
+import eventlog
+import sharding
+from routes.common import admin_required, get_order_items, stream_identity, event_stream_response
+
+admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
+
+# 🟢 Admin Login
+@admin_bp.route("/login", methods=["POST", "OPTIONS"])
+def admin_login():
+    # Handle OPTIONS request for CORS preflight
+    if request.method == "OPTIONS":
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'POST,OPTIONS')
+        response.headers.add('Access-Control-Allow-Origin', 'http://127.0.0.1:5501')
+        return response, 200
+    
+    # Handle normal POST request
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+            
+        username = data.get("username")
+        password = data.get("password")
+        
+        if not username or not password:
+            return jsonify({"error": "Username and password are required"}), 400
+
+        admin = Admin.query.filter_by(username=username).first()
+        if not admin or not check_password_hash(admin.password, password):
+            return jsonify({"error": "Invalid credentials"}), 401
+
+        access_token = create_access_token(identity=str(admin.id))
+        return jsonify({
+            "message": "Login successful", 
+            "access_token": access_token, 
+            "data": {"id": admin.id, "username": admin.username}
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get All Products
+@admin_bp.route("/products", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_products():
+    try:
+        # Pagination parameters
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        
+        # Search parameters
+        search = request.args.get('search', '')
+        category = request.args.get('category', '')
+        
+        try:
+            fields = catalog_reads.parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        rows, total, pages = catalog_reads.list_products(
+            page, per_page, category=category, search=search, fields=fields
+        )
+        
+        products = [catalog_reads.product_to_dict(row, fields) for row in rows]
+        
+        return jsonify({
+            "products": products,
+            "total": total,
+            "page": page,
+            "pages": pages
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    # 🟢 Daily Sales Analytics
+@admin_bp.route("/sales/daily", methods=["GET", "OPTIONS"])
+def daily_sales():
+    if request.method == "OPTIONS":
+        return "", 200
+        
+    try:
+        # Get date parameter or use today
+        date_param = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        
+        # Simple mock data for now
+        return jsonify({
+            "total_orders": 15,
+            "total_revenue": 825.50,
+            "top_product": {
+                "name": "Sample Product",
+                "sales": 350.00
+            },
+            "hourly_sales": [
+                {"hour": "0", "sales": 0},
+                {"hour": "8", "sales": 120.50},
+                {"hour": "9", "sales": 250.00},
+                {"hour": "14", "sales": 180.00},
+                {"hour": "18", "sales": 275.00}
+            ]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Monthly Sales Analytics
+@admin_bp.route("/sales/monthly", methods=["GET", "OPTIONS"])
+def monthly_sales():
+    if request.method == "OPTIONS":
+        return "", 200
+        
+    try:
+        # Get month parameter or use current month
+        month_param = request.args.get('month', datetime.now().strftime('%Y-%m'))
+        
+        # Simple mock data for now
+        return jsonify({
+            "total_orders": 120,
+            "total_revenue": 6500.75,
+            "top_product": {
+                "name": "Sample Product",
+                "sales": 1200.00
+            },
+            "daily_sales": [
+                {"date": "2025-03-01", "sales": 250.00},
+                {"date": "2025-03-02", "sales": 310.25},
+                {"date": "2025-03-03", "sales": 0},
+                {"date": "2025-03-04", "sales": 425.50}
+                # Add more days as needed
+            ]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Yearly Sales Analytics
+@admin_bp.route("/sales/yearly", methods=["GET", "OPTIONS"])
+def yearly_sales():
+    if request.method == "OPTIONS":
+        return "", 200
+        
+    try:
+        # Get year parameter or use current year
+        year_param = request.args.get('year', datetime.now().strftime('%Y'))
+        
+        # Simple mock data for now
+        return jsonify({
+            "total_orders": 1450,
+            "total_revenue": 78500.25,
+            "top_product": {
+                "name": "Sample Product",
+                "sales": 15000.00
+            },
+            "monthly_sales": [
+                {"month": "1", "sales": 4500.00, "orders": 85},
+                {"month": "2", "sales": 5200.25, "orders": 95},
+                {"month": "3", "sales": 6100.00, "orders": 110}
+                # Add more months as needed
+            ]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Add Product
+@admin_bp.route("/add_product", methods=["POST"])
+@jwt_required()
+@admin_required
+def add_product():
+    try:
+        uploads.limit_request()
+        print("🔹 Step 1: Captured Inputs:", request.form)
+        
+        # Validate required fields
+        required_fields = ["name", "price", "stock", "category"]
+        for field in required_fields:
+            if not request.form.get(field):
+                return jsonify({"error": f"Field '{field}' is required"}), 400
+        
+        if "img" not in request.files:
+            return jsonify({"error": "Image file is required"}), 400
+
+        # Process image
+        file = request.files["img"]
+        if file.filename == '':
+            return jsonify({"error": "No image file selected"}), 400
+            
+        # Stored under its content hash, identical images are kept once
+        filename = uploads.store(file)
+
+        # Create product with form data
+        data = request.form
+        product = Product(
+            name=data.get("name", ""),
+            category=data.get("category", ""),
+            price=float(data.get("price", 0)),
+            stock=int(data.get("stock", 0)),
+            img=filename,
+            description=data.get("description", "")
+        )
+
+        # Add to database with transaction
+        db.session.add(product)
+        db.session.flush()  # Get product ID for the change feed
+        changefeed.mark_changed([product.id])
+        jobs.enqueue("process_product_image", {"filename": filename})
+        db.session.commit()
+        suggest.product_changed(product.id, product.name, product.category)
+        catalog_reads.invalidate_catalog()
+        return jsonify({"message": "Product added successfully", "id": product.id}), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Invalid value: {str(e)}"}), 400
+    except HTTPException as e:  # upload too large or not an image (see uploads.py)
+        db.session.rollback()
+        return jsonify({"error": e.description}), e.code
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Delete Product
+@admin_bp.route("/delete_product", methods=["DELETE"])
+@jwt_required()
+@admin_required
+def delete_product():
+    try:
+        product_id = request.json.get("product_id")
+        if not product_id:
+            return jsonify({"error": "Product ID is required"}), 400
+            
+        product = Product.query.get(product_id)
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+
+        released = uploads.release(product.img)
+        reviews.product_deleted(product.id)
+        db.session.delete(product)
+        changefeed.mark_deleted(product.id)
+        db.session.commit()
+        uploads.collect([released])
+        suggest.product_deleted(product.id)
+        catalog_reads.invalidate_catalog()
+        return jsonify({"message": "Product deleted successfully"}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Route to Serve Images
+@admin_bp.route('/uploads/<filename>')
+def uploaded_file(filename):
+    try:
+        # Stored names are content hashes, so browsers may keep them for good
+        max_age = uploads.CACHE_MAX_AGE if uploads.is_stored(filename) else None
+        return send_from_directory(uploads.directory(filename), filename, max_age=max_age)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get Single Product
+@admin_bp.route("/product/<int:product_id>", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_product(product_id):
+    try:
+        try:
+            fields = catalog_reads.parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        product = catalog_reads.get_product(product_id, fields)
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+            
+        return jsonify(catalog_reads.product_to_dict(product, fields)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Update Product
+@admin_bp.route("/update_product", methods=["PUT"])
+@jwt_required()
+@admin_required
+def update_product():
+    try:
+        uploads.limit_request()
+        if not request.form:
+            return jsonify({"error": "No form data provided"}), 400
+            
+        product_id = request.form.get("id")
+        if not product_id:
+            return jsonify({"error": "Product ID is required"}), 400
+            
+        product = Product.query.get(product_id)
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+        
+        # Update product fields with validation
+        if "name" in request.form:
+            product.name = request.form.get("name")
+        if "category" in request.form:
+            product.category = request.form.get("category")
+        if "description" in request.form:
+            product.description = request.form.get("description")
+        if "price" in request.form:
+            try:
+                product.price = float(request.form.get("price"))
+            except ValueError:
+                return jsonify({"error": "Price must be a number"}), 400
+        if "stock" in request.form:
+            try:
+                product.stock = int(request.form.get("stock"))
+            except ValueError:
+                return jsonify({"error": "Stock must be an integer"}), 400
+        
+        # Handle image upload if provided, the replaced image is deleted once unused
+        released = None
+        if "img" in request.files:
+            file = request.files["img"]
+            if file and file.filename:
+                filename = uploads.store(file)
+                released = uploads.release(product.img)
+                product.img = filename
+                jobs.enqueue("process_product_image", {"filename": filename})
+        
+        changefeed.mark_changed([product.id])
+        db.session.commit()
+        uploads.collect([released])
+        suggest.product_changed(product.id, product.name, product.category)
+        catalog_reads.invalidate_catalog()
+        return jsonify({"message": "Product updated successfully"}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Invalid value: {str(e)}"}), 400
+    except HTTPException as e:  # upload too large or not an image (see uploads.py)
+        db.session.rollback()
+        return jsonify({"error": e.description}), e.code
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# Largest per_page of /api/admin/orders
+MAX_ORDERS_PER_PAGE = 100
+
+def _items_of_orders(order_ids):
+    """Items of whichever of ``order_ids`` are on the current shard"""
+    return db.session.query(
+        OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price
+    ).filter(OrderItem.order_id.in_(order_ids)).order_by(OrderItem.id).all()
+
+def _created_desc(row):
+    return (row.created_at or datetime.min, row.id)
+
+def orders_page_data(page, per_page, filters=None, sort_by="created_at", sort_order="desc", after=None):
+    """One page of orders with items for the admin orders table.
+
+    ``filters`` comes from ``order_reads.parse_filters``, ``after`` from
+    ``order_reads.decode_cursor`` and replaces the page number. Raises
+    ValueError for an email prefix matching too many customers or a page
+    number past ORDER_PAGE_MAX_DEPTH.
+    """
+    page = max(page, 1)
+    per_page = min(per_page if per_page > 0 else 20, MAX_ORDERS_PER_PAGE)
+    filters = filters or {}
+    descending = sort_order != "asc"
+    count_cap = current_app.config.get("ORDER_COUNT_CAP", 10000)
+    max_depth = current_app.config.get("ORDER_PAGE_MAX_DEPTH", 10000)
+    if after is None and page * per_page > max_depth:
+        raise ValueError(f"Pages only go {max_depth} orders deep, continue from next_after instead")
+    
+    user_ids = order_reads.matching_user_ids(filters)
+    clauses = order_reads.conditions(filters, user_ids)
+    ordering = order_reads.order_by(sort_by, descending)
+    seek = order_reads.seek(sort_by, descending, after) if after is not None else None
+    # Rows to skip in Python: shards can't apply the page's OFFSET themselves
+    skip = 0
+    if user_ids == []:
+        shard_results = []
+    elif sharding.keys() == [None]:
+        # One database: the page straight from OFFSET/LIMIT (or the cursor)
+        offset = 0 if after is not None else (page - 1) * per_page
+        shard_results = [order_reads.shard_page(clauses, ordering, per_page, count_cap, offset, seek)]
+    else:
+        # Every shard sends its first page * per_page matches (per_page after
+        # the cursor), merged in the same order
+        skip = 0 if after is not None else (page - 1) * per_page
+        shard_results = [result for _, result in sharding.gather(
+            order_reads.shard_page, clauses, ordering, skip + per_page, count_cap, 0, seek
+        )]
+    total_capped = bool(count_cap) and any(count > count_cap for count, _ in shard_results)
+    total_orders = sum(min(count, count_cap) if count_cap else count for count, _ in shard_results)
+    orders = sharding.merge(
+        [rows for _, rows in shard_results], key=order_reads.sort_key(sort_by), reverse=descending,
+        limit=skip + per_page
+    )[skip:]
+    next_after = order_reads.encode_cursor(sort_by, orders[-1]) if len(orders) == per_page else None
+    
+    # Items, users and products for the whole page in one query each
+    order_ids = [order.id for order in orders]
+    items_by_order = {}
+    if order_ids:
+        for _, items in sharding.gather(_items_of_orders, order_ids):
+            for item in items:
+                items_by_order.setdefault(item.order_id, []).append(item)
+    all_items = [item for items in items_by_order.values() for item in items]
+    users = {
+        user.id: user for user in User.query.filter(User.id.in_({order.user_id for order in orders}))
+    } if orders else {}
+    product_names = dict(
+        db.session.query(Product.id, Product.name).filter(Product.id.in_({item.product_id for item in all_items}))
+    ) if all_items else {}
+    
+    result = []
+    
+    for order in orders:
+        user = users.get(order.user_id)
+        
+        order_items = []
+        total = 0
+        
+        for item in items_by_order.get(order.id, []):
+            item_total = item.price * item.quantity
+            total += item_total
+            
+            order_items.append({
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": product_names.get(item.product_id, "Unknown Product"),
+                "quantity": item.quantity,
+                "price": item.price,
+                "total": item_total
+            })
+        
+        result.append({
+            "id": order.id,
+            "user_id": order.user_id,
+            "user_name": user.username if user else "Unknown",
+            "email": user.email if user else "Unknown",
+            "status": order.status,
+            "items": order_items,
+            "total": total,
+            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M")
+        })
+    
+    return {
+        "orders": result,
+        "total": total_orders,
+        "total_capped": total_capped,  # at least "total" orders match
+        "page": page,
+        "pages": (total_orders + per_page - 1) // per_page,
+        "next_after": next_after  # pass as ?after= for the following page
+    }
+
+# 🟢 Get Orders
+@admin_bp.route("/orders", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_orders():
+    try:
+        # Pagination
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        
+        # Filters (status, created_from/created_to, user_id, email, product_id,
+        # min_total/max_total) and sorting
+        sort_by = request.args.get('sort_by', 'created_at')
+        sort_order = request.args.get('sort_order', 'desc')
+        if sort_by not in order_reads.SORTS:
+            return jsonify({"error": f"Invalid sort_by. Must be one of: {', '.join(order_reads.SORTS)}"}), 400
+        if sort_order not in ('asc', 'desc'):
+            return jsonify({"error": "Invalid sort_order. Must be asc or desc"}), 400
+        filters = order_reads.parse_filters(request.args)
+        after = request.args.get('after')
+        if after:
+            after = order_reads.decode_cursor(sort_by, after)
+        
+        return jsonify(orders_page_data(page, per_page, filters, sort_by, sort_order, after or None)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Update Order Status
+@admin_bp.route("/order/update", methods=["PUT"])
+@jwt_required()
+@admin_required
+def update_order_status():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+            
+        order_id = data.get("order_id")
+        status = data.get("status")
+        
+        if not order_id or not status:
+            return jsonify({"error": "Order ID and status are required"}), 400
+            
+        # Validate status value
+        valid_statuses = order_status.VALID_ORDER_STATUSES
+        if status not in valid_statuses:
+            return jsonify({"error": f"Invalid status. Must be one of: {', '.join(valid_statuses)}"}), 400
+        
+        try:
+            order_id = int(order_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Order ID must be an integer"}), 400
+        
+        # Same transition rules and stock release as the bulk update
+        with sharding.for_order(order_id):
+            result = order_status.transition(order_id, status)
+            if result["result"] == "not_found":
+                db.session.rollback()
+                return jsonify({"error": "Order not found"}), 404
+            if result["result"] == "invalid_transition":
+                db.session.rollback()
+                return jsonify({"error": f"Order can't go from {result['from']} to {status}"}), 409
+            db.session.commit()
+            if result["result"] == "updated":
+                events.publish_order_event("order_status", order_id, result["user_id"], status)
+                eventlog.record_order_event("order_status", order_id, result["user_id"], status,
+                                            **{"from": result["from"]})
+        
+        return jsonify({"message": "Order status updated successfully"}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Bulk Update Order Status
+@admin_bp.route("/order/bulk_update", methods=["PUT"])
+@jwt_required()
+@admin_required
+def bulk_update_order_status():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+            
+        status = data.get("status")
+        order_ids = data.get("order_ids")
+        filters = data.get("filter")
+        
+        if not status or (not order_ids and not filters):
+            return jsonify({"error": "Status and either order_ids or filter are required"}), 400
+        
+        valid_statuses = order_status.VALID_ORDER_STATUSES
+        if status not in valid_statuses:
+            return jsonify({"error": f"Invalid status. Must be one of: {', '.join(valid_statuses)}"}), 400
+        
+        max_orders = current_app.config.get("ORDER_BULK_MAX", 500)
+        try:
+            if order_ids:
+                if not isinstance(order_ids, list):
+                    return jsonify({"error": "order_ids must be a list"}), 400
+                order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+            else:
+                # Oldest first across all shards, like a single database would return them
+                order_ids = sharding.merge(
+                    [ids for _, ids in sharding.gather(order_status.find_order_ids, filters, max_orders + 1)],
+                    key=lambda order_id: order_id, limit=max_orders + 1
+                )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid value: {str(e)}"}), 400
+        
+        if len(order_ids) > max_orders:
+            return jsonify({"error": f"At most {max_orders} orders can be updated at once"}), 400
+        
+        # One transaction for the whole batch; each shard handles the orders it has
+        results = {}
+        for key in sharding.keys():
+            with sharding.use(key):
+                for result in order_status.bulk_transition(order_ids, status):
+                    if result["result"] != "not_found" or result["order_id"] not in results:
+                        results[result["order_id"]] = result
+        results = list(results.values())
+        db.session.commit()
+        for result in results:
+            if result["result"] == "updated":
+                events.publish_order_event("order_status", result["order_id"], result["user_id"], status)
+                eventlog.record_order_event("order_status", result["order_id"], result["user_id"], status,
+                                            **{"from": result["from"]})
+        
+        return jsonify({
+            "message": "Bulk status update finished",
+            "updated": sum(1 for r in results if r["result"] == "updated"),
+            "results": results
+        }), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Background Job Metrics
+@admin_bp.route("/jobs/stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_job_stats():
+    try:
+        return jsonify(jobs.queue_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Admin Order Event Stream (SSE)
+@admin_bp.route("/orders/stream", methods=["GET"])
+def admin_order_stream():
+    admin_id = stream_identity()
+    if admin_id is None:
+        return jsonify({"error": "Missing or invalid token"}), 401
+    if not Admin.query.get(admin_id):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    return event_stream_response([events.ADMIN_CHANNEL])
+
+# 🟢 Event Stream Metrics
+@admin_bp.route("/events/stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_event_stats():
+    try:
+        return jsonify(events.get_broker().stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _orders_since(start_date):
+    """Orders created since ``start_date`` on the current shard and their item amounts"""
+    orders = db.session.query(Order.id, Order.created_at).filter(Order.created_at >= start_date).all()
+    items = db.session.query(
+        OrderItem.order_id, OrderItem.product_id, OrderItem.price * OrderItem.quantity
+    ).join(Order, Order.id == OrderItem.order_id).filter(Order.created_at >= start_date).all()
+    return orders, items
+
+def sales_analytics_data(period):
+    """Sales totals, per-date series and top products since the start of ``period``"""
+    # Get current date
+    current_date = datetime.now()
+    
+    # Set start date based on period
+    if period == 'day':
+        start_date = current_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        group_by = 'hour'
+        date_format = '%H:00'
+    elif period == 'week':
+        start_date = current_date - timedelta(days=7)
+        group_by = 'day'
+        date_format = '%a'
+    elif period == 'month':
+        start_date = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        group_by = 'day'
+        date_format = '%d'
+    elif period == 'year':
+        start_date = current_date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        group_by = 'month'
+        date_format = '%b'
+    
+    # Orders within the period and all their items, one query each per shard
+    orders = []
+    item_rows = []
+    for _, (shard_orders, shard_items) in sharding.gather(_orders_since, start_date):
+        orders.extend(shard_orders)
+        item_rows.extend(shard_items)
+    
+    # Product names come from the main database
+    product_names = dict(
+        db.session.query(Product.id, Product.name).filter(Product.id.in_({row.product_id for row in item_rows}))
+    ) if item_rows else {}
+    items_by_order = {}
+    for order_id, product_id, amount in item_rows:
+        items_by_order.setdefault(order_id, []).append((amount, product_names.get(product_id)))
+    
+    # Calculate total sales and orders
+    total_orders = len(orders)
+    total_sales = 0
+    
+    # Group sales by date
+    sales_by_date = {}
+    
+    # Product sales tracking
+    product_sales = {}
+    
+    for order in orders:
+        # Get order items
+        items = items_by_order.get(order.id, [])
+        
+        # Calculate order total
+        order_total = sum(amount for amount, _ in items)
+        total_sales += order_total
+        
+        # Group by date
+        if period == 'day':
+            date_key = order.created_at.strftime(date_format)
+        elif period == 'week' or period == 'month':
+            date_key = order.created_at.strftime(date_format)
+        else:  # year
+            date_key = order.created_at.strftime(date_format)
+            
+        if date_key not in sales_by_date:
+            sales_by_date[date_key] = {"sales": 0, "orders": 0}
+        
+        sales_by_date[date_key]["sales"] += order_total
+        sales_by_date[date_key]["orders"] += 1
+        
+        # Track product sales
+        for amount, product_name in items:
+            if product_name is None:
+                continue
+                
+            if product_name not in product_sales:
+                product_sales[product_name] = 0
+            product_sales[product_name] += amount
+    
+    # Days that were archived come from the daily summaries
+    archived_daily, archived_products = archive.sales_between(start_date)
+    for day, (day_orders, day_revenue) in archived_daily.items():
+        total_orders += day_orders
+        total_sales += day_revenue
+        date_key = day.strftime(date_format)
+        if date_key not in sales_by_date:
+            sales_by_date[date_key] = {"sales": 0, "orders": 0}
+        sales_by_date[date_key]["sales"] += day_revenue
+        sales_by_date[date_key]["orders"] += day_orders
+    if archived_products:
+        for product_id, name in db.session.query(Product.id, Product.name).filter(
+            Product.id.in_(list(archived_products))
+        ):
+            product_sales[name] = product_sales.get(name, 0) + archived_products[product_id]
+    
+    # Calculate average order value
+    average_order_value = total_sales / total_orders if total_orders > 0 else 0
+    
+    # Format sales by date for chart
+    formatted_sales = [
+        {"date": date, "sales": data["sales"], "orders": data["orders"]}
+        for date, data in sales_by_date.items()
+    ]
+    
+    # Sort by date
+    if period == 'day':
+        formatted_sales.sort(key=lambda x: int(x["date"].split(':')[0]))
+    elif period == 'month':
+        formatted_sales.sort(key=lambda x: int(x["date"]))
+    
+    # Sort products by sales
+    top_products = [
+        {"name": name, "sales": sales}
+        for name, sales in product_sales.items()
+    ]
+    top_products.sort(key=lambda x: x["sales"], reverse=True)
+    top_products = top_products[:5]  # Top 5 products
+    
+    return {
+        "totalSales": total_sales,
+        "totalOrders": total_orders,
+        "averageOrderValue": average_order_value,
+        "salesByDate": formatted_sales,
+        "topProducts": top_products
+    }
+
+# 🟢 Ad-hoc Analytics Query over the in-memory order line cube
+@admin_bp.route("/analytics/query", methods=["POST"])
+@jwt_required()
+@admin_required
+def analytics_query():
+    try:
+        spec = request.get_json()
+        if not spec:
+            return jsonify({"error": "No query provided"}), 400
+        import analytics  # loads NumPy, so only on first use
+        return jsonify(analytics.run_query(current_app, db.session, spec)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get Sales Analytics
+@admin_bp.route("/sales", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_sales_analytics():
+    try:
+        period = request.args.get('period', 'month')
+        
+        # Validate period
+        valid_periods = ['day', 'week', 'month', 'year']
+        if period not in valid_periods:
+            return jsonify({"error": f"Invalid period. Must be one of: {', '.join(valid_periods)}"}), 400
+        
+        return jsonify(sales_analytics_data(period)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _order_totals(recent):
+    """Order count, revenue and the ``recent`` newest orders with their totals on the current shard"""
+    count = Order.query.count()
+    # Summed in the database instead of per order
+    revenue = db.session.query(
+        db.func.coalesce(db.func.sum(OrderItem.price * OrderItem.quantity), 0)
+    ).scalar()
+    orders = db.session.query(Order.id, Order.user_id, Order.status, Order.created_at).order_by(
+        Order.created_at.desc(), Order.id.desc()
+    ).limit(recent).all()
+    totals = dict(db.session.query(
+        OrderItem.order_id, db.func.sum(OrderItem.price * OrderItem.quantity)
+    ).filter(OrderItem.order_id.in_([order.id for order in orders])).group_by(OrderItem.order_id)) if orders else {}
+    return count, revenue, [(order, totals.get(order.id, 0)) for order in orders]
+
+def dashboard_stats_data():
+    """Counters and recent activity for the dashboard overview"""
+    # Total products
+    total_products = Product.query.count()
+    
+    # Low stock items (less than 10 items)
+    low_stock = Product.query.filter(Product.stock < 10).count()
+    
+    # Total orders and revenue, archived orders included from their summaries
+    archived_orders, archived_revenue = archive.totals()
+    shard_results = [result for _, result in sharding.gather(_order_totals, 5)]
+    total_orders = sum(count for count, _, _ in shard_results) + archived_orders
+    total_revenue = sum(revenue for _, revenue, _ in shard_results) + archived_revenue
+    
+    # Recent activity (last 5 orders)
+    recent_orders = sharding.merge(
+        [recent for _, _, recent in shard_results], key=lambda entry: _created_desc(entry[0]),
+        reverse=True, limit=5
+    )
+    recent_activity = []
+    
+    for order, order_total in recent_orders:
+        user = User.query.get(order.user_id)
+        
+        recent_activity.append({
+            "type": "order",
+            "id": order.id,
+            "user": user.username if user else "Unknown",
+            "date": order.created_at.strftime("%Y-%m-%d %H:%M"),
+            "status": order.status,
+            "amount": order_total
+        })
+    
+    return {
+        "total_products": total_products,
+        "low_stock": low_stock,
+        "total_orders": total_orders,
+        "total_revenue": total_revenue,
+        "recent_activity": recent_activity
+    }
+
+# 🟢 Get Dashboard Stats
+@admin_bp.route("/dashboard/stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_dashboard_stats():
+    try:
+        return jsonify(dashboard_stats_data()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get Categories
+@admin_bp.route("/categories", methods=["GET"])
+@jwt_required()
+def get_categories():
+    try:
+        # Get distinct categories from products
+        category_list = catalog_reads.list_categories()
+        
+        return jsonify({"categories": category_list}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def admin_profile_data(admin_id):
+    admin = Admin.query.get(admin_id)
+    if not admin:
+        return None
+    return {
+        "id": admin.id,
+        "username": admin.username
+    }
+
+# 🟢 Admin Profile
+@admin_bp.route("/profile", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_admin_profile():
+    try:
+        profile = admin_profile_data(get_jwt_identity())
+        if not profile:
+            return jsonify({"error": "Admin not found"}), 404
+            
+        return jsonify(profile), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Dashboard Stats - Alias for dashboard/stats
+@admin_bp.route("/stats", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_stats():
+    # This is just an alias for dashboard/stats to fix the frontend route
+    return get_dashboard_stats()
+
+# 🟢 Dashboard Bootstrap - every dashboard panel in one call
+@admin_bp.route("/dashboard/bootstrap", methods=["GET"])
+@jwt_required()
+@admin_required
+def get_dashboard_bootstrap():
+    try:
+        period = request.args.get('period', 'month')
+        if period not in ('day', 'week', 'month', 'year'):
+            return jsonify({"error": "Invalid period. Must be one of: day, week, month, year"}), 400
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        admin_id = get_jwt_identity()
+
+        started = datetime.now()
+        data, errors, timings = dashboard.load_panels(
+            current_app._get_current_object(),
+            {
+                "stats": dashboard_stats_data,
+                "orders": lambda: orders_page_data(page, per_page),
+                "sales": lambda: sales_analytics_data(period),
+                "categories": catalog_reads.list_categories,
+                "profile": lambda: admin_profile_data(admin_id),
+            },
+            timeout=current_app.config.get("DASHBOARD_PANEL_TIMEOUT", 5),
+            workers=current_app.config.get("DASHBOARD_WORKERS", 4),
+        )
+        data["period"] = period
+        data["errors"] = errors
+        data["timings"] = timings
+        data["elapsed_ms"] = round((datetime.now() - started).total_seconds() * 1000, 1)
+        return jsonify(data), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get Single Order
+@admin_bp.route("/orders/<int:order_id>", methods=["GET", "OPTIONS"])
+def get_order(order_id):
+    # Handle OPTIONS request without authentication
+    if request.method == "OPTIONS":
+        return "", 200
+    
+    # For non-OPTIONS requests, manually check authentication
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if not token:
+        return jsonify({"error": "Missing authorization token"}), 401
+    
+    try:
+        # Verify JWT token manually
+        from flask_jwt_extended import decode_token
+        try:
+            decoded = decode_token(token)
+            current_admin_id = decoded['sub']
+        except Exception as e:
+            return jsonify({"error": f"Invalid token: {str(e)}"}), 401
+        
+        # Check if admin
+        admin = Admin.query.get(current_admin_id)
+        if not admin:
+            return jsonify({"error": "Admin access required"}), 403
+        
+        # Get order details
+        with sharding.for_order(order_id):
+            order = Order.query.get(order_id)
+            items = get_order_items(order_id) if order else []
+        if not order:
+            # Old closed orders live in the archive files
+            archived = archive.order_detail(current_app.config["ARCHIVE_FOLDER"], order_id)
+            if not archived:
+                return jsonify({"error": "Order not found"}), 404
+            user = User.query.get(archived["user_id"])
+            archived["user_name"] = user.username if user else "Unknown"
+            archived["email"] = user.email if user else "Unknown"
+            archived["created_at"] = archived["created_at"][:16]
+            return jsonify(archived), 200
+            
+        user = User.query.get(order.user_id)
+        
+        # Get order items
+        order_items = []
+        total = 0
+        
+        for item in items:
+            product = Product.query.get(item.product_id)
+            item_total = item.price * item.quantity
+            total += item_total
+            
+            order_items.append({
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": product.name if product else "Unknown Product",
+                "quantity": item.quantity,
+                "price": item.price,
+                "total": item_total
+            })
+        
+        return jsonify({
+            "id": order.id,
+            "user_id": order.user_id,
+            "user_name": user.username if user else "Unknown",
+            "email": user.email if user else "Unknown",
+            "status": order.status,
+            "items": order_items,
+            "total": total,
+            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M")
+        }), 200
+            
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
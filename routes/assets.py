@@ -0,0 +1,11 @@
+from flask import Blueprint, current_app
+from compression import send_precompressed
+
+assets_bp = Blueprint("assets", __name__, url_prefix="/admin")
+
+# 🟢 Serve Admin Dashboard Assets
+@assets_bp.route("/", defaults={"filename": "index.html"})
+@assets_bp.route("/<path:filename>")
+def admin_asset(filename):
+    # Uses the .br/.gz siblings written by precompress_assets when present
+    return send_precompressed(current_app.config["ASSETS_FOLDER"], filename)
@@ -0,0 +1,56 @@
+"""Helpers shared by the route modules"""
+from flask import request, jsonify, current_app, Response, stream_with_context
+from app import db
+from models import Admin, OrderItem
+from flask_jwt_extended import get_jwt_identity, decode_token
+import events
+
+def is_admin():
+    try:
+        current_admin_id = get_jwt_identity()
+        admin = Admin.query.get(current_admin_id)
+        return admin is not None
+    except Exception:
+        return False
+
+def admin_required(f):
+    def decorated_function(*args, **kwargs):
+        if not is_admin():
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def get_order_items(order_id):
+    """Standardized function to get order items"""
+    return OrderItem.query.filter_by(order_id=order_id).all()
+
+def stream_identity():
+    """JWT identity for SSE requests; EventSource can't set headers, so ?token= is accepted too"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '') or request.args.get('token', '')
+    if not token:
+        return None
+    try:
+        return decode_token(token)['sub']
+    except Exception:
+        return None
+
+def event_stream_response(channels):
+    release = events.open_stream()
+    if release is None:
+        response = jsonify({"error": "Too many open event streams, try again shortly"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    subscription = events.get_broker().subscribe(channels)
+    # Don't hold a pooled DB connection for the lifetime of the stream
+    db.session.remove()
+    response = Response(
+        stream_with_context(events.stream(subscription, current_app.config.get("EVENTS_KEEPALIVE", 15))),
+        mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,545 @@
+from flask import request, jsonify, Blueprint, current_app, send_from_directory
+from app import db
+from models import Product, Order, Admin, OrderItem, Review
+from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
+import os
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+import catalog_reads
+import reviews
+from idempotency import idempotent
+import suggest
+import events
+import changefeed
+import feeds
+import recommendations
+import archive
+import eventlog
+import sharding
+from routes.common import is_admin, stream_identity, event_stream_response
+
+public_bp = Blueprint("public", __name__, url_prefix="/api")
+
+# 🟢 Public Products API
+@public_bp.route("/products", methods=["GET"])  # Changed from /api/products
+def public_products():
+    try:
+        # Pagination parameters
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 12, type=int)
+        
+        # Sorting parameters
+        sort_by = request.args.get('sort_by', 'id')
+        sort_order = request.args.get('sort_order', 'asc')
+        
+        # Filters (category, categories, search, price/rating range, in_stock),
+        # sparse fieldset and requested facets
+        try:
+            filters = catalog_reads.parse_filters(request.args)
+            fields = catalog_reads.parse_fields(request.args.get('fields', ''))
+            facets = catalog_reads.parse_facets(request.args.get('facets', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Core select through catalog_reads, no ORM objects are built
+        rows, total, pages = catalog_reads.list_products(
+            page, per_page, sort_by=sort_by, sort_order=sort_order,
+            fields=fields, filters=filters
+        )
+        
+        products = [catalog_reads.product_to_dict(row, fields) for row in rows]
+        
+        response = {
+            "products": products,
+            "total": total,
+            "page": page,
+            "pages": pages
+        }
+        if facets:
+            response["facets"] = catalog_reads.facet_counts(
+                filters, facets,
+                bucket_width=current_app.config.get("FACET_PRICE_BUCKET", 50),
+                ttl=current_app.config.get("FACET_CACHE_TTL", 60)
+            )
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Public Categories API
+@public_bp.route("/categories", methods=["GET"])  # Changed from /api/categories
+def public_categories():
+    try:
+        # Get distinct categories from products
+        category_list = catalog_reads.list_categories()
+        
+        return jsonify({"categories": category_list}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get Single Product (Public)
+@public_bp.route("/products/<int:product_id>", methods=["GET"])  # Changed from /api/products/<int:product_id>
+def get_public_product(product_id):
+    try:
+        try:
+            fields = catalog_reads.parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        product = catalog_reads.get_product(product_id, fields)
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+            
+        return jsonify(catalog_reads.product_to_dict(product, fields)), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Catalog Change Feed (Public)
+@public_bp.route("/products/changes", methods=["GET"])
+def product_changes():
+    try:
+        # Omit since for a full snapshot, then pass back next_since
+        try:
+            cursor = changefeed.parse_cursor(request.args.get('since', ''))
+        except ValueError:
+            return jsonify({"error": "since must be a cursor returned by this endpoint"}), 400
+        
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+        changes, next_since, has_more = changefeed.changes_since(cursor, limit)
+        
+        return jsonify({
+            "changes": changes,
+            "next_since": next_since,
+            "has_more": has_more
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Marketplace Product Feed (Public)
+@public_bp.route("/feeds/products.<fmt>", methods=["GET"])
+def product_feed(fmt):
+    if fmt not in feeds.FORMATS:
+        return jsonify({"error": f"Unknown feed format. Must be one of: {', '.join(feeds.FORMATS)}"}), 404
+    
+    folder = current_app.config["FEED_FOLDER"]
+    if not os.path.exists(os.path.join(folder, feeds.feed_filename(fmt))):
+        return jsonify({"error": "Feed has not been generated yet"}), 404
+    
+    # Static file with ETag/Last-Modified, so unchanged feeds answer 304
+    return send_from_directory(folder, feeds.feed_filename(fmt), conditional=True, max_age=300)
+
+# 🟢 Search Suggestions (Public)
+@public_bp.route("/suggest", methods=["GET"])
+def search_suggestions():
+    try:
+        query = request.args.get('q', '')
+        limit = min(max(request.args.get('limit', 8, type=int), 1), suggest.MAX_LIMIT)
+        
+        # Served from the in-memory prefix index, no database query per keystroke
+        products, categories = suggest.get_index(current_app).lookup(query, limit)
+        
+        return jsonify({"products": products, "categories": categories}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def recommendations_response(product_ids):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), recommendations.MAX_LIMIT)
+    try:
+        fields = catalog_reads.parse_fields(request.args.get('fields', 'card'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    scored = recommendations.for_products(current_app, product_ids, limit)
+    scores = dict(scored)
+    rows, _ = catalog_reads.get_products_by_ids([product_id for product_id, _ in scored], fields)
+    
+    # Deleted products drop out here until the next full rebuild
+    products = []
+    for row in rows:
+        product = catalog_reads.product_to_dict(row, fields)
+        product["score"] = scores[row.id]
+        products.append(product)
+    return jsonify({"products": products}), 200
+
+# 🟢 Frequently Bought Together (Public)
+@public_bp.route("/products/<int:product_id>/recommendations", methods=["GET"])
+def get_product_recommendations(product_id):
+    try:
+        return recommendations_response([product_id])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Cart Recommendations (Public)
+@public_bp.route("/recommendations", methods=["GET"])
+def get_cart_recommendations():
+    try:
+        # product_ids=3,1,7 - everything in the cart
+        raw_ids = request.args.get('product_ids', '')
+        try:
+            product_ids = list(dict.fromkeys(int(value) for value in raw_ids.split(',') if value.strip()))
+        except ValueError:
+            return jsonify({"error": "product_ids must be a comma separated list of integers"}), 400
+        
+        if not product_ids:
+            return jsonify({"error": "At least one product id is required"}), 400
+        max_ids = current_app.config.get("PRODUCT_BATCH_MAX", 100)
+        if len(product_ids) > max_ids:
+            return jsonify({"error": f"At most {max_ids} product ids per request"}), 400
+        
+        return recommendations_response(product_ids)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Batch Product Lookup (Public)
+@public_bp.route("/products/batch", methods=["GET"])
+def get_public_products_batch():
+    try:
+        # ids=3,1,7 - order is preserved in the response
+        raw_ids = request.args.get('ids', '')
+        try:
+            product_ids = [int(value) for value in raw_ids.split(',') if value.strip()]
+        except ValueError:
+            return jsonify({"error": "ids must be a comma separated list of integers"}), 400
+        
+        if not product_ids:
+            return jsonify({"error": "At least one product id is required"}), 400
+        
+        # Drop repeated ids but keep first-seen order
+        product_ids = list(dict.fromkeys(product_ids))
+        max_ids = current_app.config.get("PRODUCT_BATCH_MAX", 100)
+        if len(product_ids) > max_ids:
+            return jsonify({"error": f"At most {max_ids} product ids per request"}), 400
+        
+        try:
+            fields = catalog_reads.parse_fields(request.args.get('fields', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        rows, missing = catalog_reads.get_products_by_ids(product_ids, fields)
+        
+        return jsonify({
+            "products": [catalog_reads.product_to_dict(row, fields) for row in rows],
+            "missing": missing
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Add this under public_bp
+@public_bp.route("/orders", methods=["POST"])
+@jwt_required()
+@idempotent
+def create_order():
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        # Validate order items
+        items = data.get("items")
+        if not items or not isinstance(items, list) or len(items) == 0:
+            return jsonify({"error": "Order must contain at least one item"}), 400
+        
+        # The order and its items go to the user's shard, stock stays in the main database
+        with sharding.for_user(user_id):
+            # Create new order
+            order = Order(
+                user_id=user_id,
+                status="Pending",
+                created_at=datetime.now()
+            )
+            
+            db.session.add(order)
+            db.session.flush()  # Get order ID without committing
+            
+            # Add order items and update product stock
+            quantities = {}
+            logged_items = []
+            for item_data in items:
+                product_id = item_data.get("product_id")
+                quantity = item_data.get("quantity", 1)
+                
+                if not product_id:
+                    db.session.rollback()
+                    return jsonify({"error": "Product ID is required for each item"}), 400
+                
+                # Get product
+                product = Product.query.get(product_id)
+                if not product:
+                    db.session.rollback()
+                    return jsonify({"error": f"Product with ID {product_id} not found"}), 404
+                
+                # Check stock
+                if product.stock < quantity:
+                    db.session.rollback()
+                    return jsonify({"error": f"Not enough stock for {product.name}"}), 400
+                
+                # Update stock
+                product.stock -= quantity
+                
+                # Create order item
+                order_item = OrderItem(
+                    order_id=order.id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    price=product.price
+                )
+                
+                db.session.add(order_item)
+                quantities[product.id] = quantities.get(product.id, 0) + quantity
+                logged_items.append({"product_id": product.id, "quantity": quantity, "price": product.price})
+            
+            order.total = sum(entry["price"] * entry["quantity"] for entry in logged_items)
+            # Stock changed, one sequence number for the whole order
+            changefeed.mark_changed(quantities.keys())
+            db.session.commit()
+            suggest.products_sold(quantities)
+            events.publish_order_event("order_created", order.id, order.user_id, order.status)
+            eventlog.record_order_event("order_created", order.id, order.user_id, order.status, items=logged_items)
+        
+        return jsonify({
+            "message": "Order created successfully",
+            "order_id": order.id
+        }), 201
+        
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# Product Reviews API
+@public_bp.route("/products/<int:product_id>/reviews", methods=["GET"])
+def get_product_reviews(product_id):
+    try:
+        # Check if product exists
+        if not catalog_reads.get_product(product_id, ("id",)):
+            return jsonify({"error": "Product not found"}), 404
+        
+        # Keyset pagination: pass the previous response's next_after as ?after=
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        after = request.args.get('after', None, type=int)
+        
+        rows, next_after = reviews.list_reviews(product_id, limit, after)
+        
+        return jsonify({
+            "reviews": [{
+                "id": row.id,
+                "user_id": row.user_id,
+                "rating": row.rating,
+                "text": row.text,
+                "created_at": row.created_at.strftime("%Y-%m-%d %H:%M") if row.created_at else None
+            } for row in rows],
+            "summary": reviews.rating_summary(product_id),
+            "next_after": next_after
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@public_bp.route("/products/<int:product_id>/reviews", methods=["POST"])
+@jwt_required()
+def add_product_review(product_id):
+    try:
+        user_id = int(get_jwt_identity())
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        try:
+            rating = reviews.parse_rating(data.get("rating"))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid rating: {str(e)}"}), 400
+        
+        if not catalog_reads.get_product(product_id, ("id",)):
+            return jsonify({"error": "Product not found"}), 404
+        
+        if Review.query.filter_by(product_id=product_id, user_id=user_id).first():
+            return jsonify({"error": "You have already reviewed this product"}), 409
+        
+        review = reviews.add_review(product_id, user_id, rating, data.get("text"))
+        db.session.commit()
+        
+        return jsonify({"message": "Review added", "review_id": review.id}), 201
+        
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@public_bp.route("/products/<int:product_id>/reviews/<int:review_id>", methods=["PUT", "DELETE"])
+@jwt_required()
+def modify_product_review(product_id, review_id):
+    try:
+        user_id = int(get_jwt_identity())
+        
+        review = Review.query.filter_by(id=review_id, product_id=product_id).first()
+        if not review:
+            return jsonify({"error": "Review not found"}), 404
+        if review.user_id != user_id:
+            return jsonify({"error": "Not authorized to modify this review"}), 403
+        
+        if request.method == "DELETE":
+            reviews.delete_review(review)
+            db.session.commit()
+            return jsonify({"message": "Review deleted"}), 200
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        rating = None
+        if "rating" in data:
+            try:
+                rating = reviews.parse_rating(data.get("rating"))
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid rating: {str(e)}"}), 400
+        
+        reviews.edit_review(review, rating=rating, text=data.get("text"))
+        db.session.commit()
+        
+        return jsonify({"message": "Review updated"}), 200
+        
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Order Status Stream (SSE) - replaces polling GET /orders/<id>
+@public_bp.route("/orders/stream", methods=["GET"])
+def user_order_stream():
+    user_id = stream_identity()
+    if user_id is None:
+        return jsonify({"error": "Missing or invalid token"}), 401
+    
+    return event_stream_response([events.user_channel(user_id)])
+
+# 🟢 Get Single Order (Public/User)
+@public_bp.route("/orders/<int:order_id>", methods=["GET", "OPTIONS"])
+def get_single_order(order_id):
+    # Handle OPTIONS request for CORS preflight
+    if request.method == "OPTIONS":
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
+        response.headers.add('Access-Control-Allow-Origin', 'http://127.0.0.1:5500')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response, 200
+    
+    # Regular GET request processing
+    try:
+        # Get token from request
+        token = request.headers.get('Authorization', '')
+        if not token or not token.startswith('Bearer '):
+            return jsonify({"error": "Missing or invalid token"}), 401
+        
+        # CRITICAL CHANGE: Don't use JWT-Extended here since it's causing problems
+        # Instead, decode the token manually for debugging
+        token_str = token.replace('Bearer ', '')
+        
+        try:
+            # Manually decode token
+            decoded = decode_token(token_str)
+            
+            # Get user_id from decoded token
+            user_id = decoded['sub']  # 'sub' is where JWT stores the identity
+            print(f"Decoded user_id: {user_id}, type: {type(user_id)}")
+            
+            # Try to convert user_id to int if it's a string
+            if isinstance(user_id, str):
+                try:
+                    user_id = int(user_id)
+                    print(f"Converted user_id to int: {user_id}")
+                except ValueError:
+                    print(f"Could not convert user_id {user_id} to int")
+                
+        except Exception as e:
+            print(f"Manual JWT decode error: {str(e)}")
+            return jsonify({"error": f"Token validation failed: {str(e)}"}), 401
+        
+        # Get order from the user's shard; admins may look up anyone's
+        shard = sharding.key_for_user(user_id)
+        with sharding.use(shard):
+            order = Order.query.get(order_id)
+        if not order and sharding.enabled() and Admin.query.get(user_id) is not None:
+            shard = sharding.locate_order(order_id)
+            if shard is not None:
+                with sharding.use(shard):
+                    order = Order.query.get(order_id)
+        if not order:
+            # Old closed orders live in the archive files
+            archived = archive.order_detail(current_app.config["ARCHIVE_FOLDER"], order_id)
+            if not archived:
+                return jsonify({"error": "Order not found"}), 404
+            if str(archived["user_id"]) != str(user_id) and Admin.query.get(user_id) is None:
+                return jsonify({"error": "Not authorized to view this order"}), 403
+            return jsonify(archived), 200
+            
+        # Debug the comparison
+        print(f"Order user_id: {order.user_id}, type: {type(order.user_id)}")
+        print(f"Token user_id: {user_id}, type: {type(user_id)}")
+        
+        # Check if order belongs to user or if user is admin
+        # Fix type comparison issues by converting to strings
+        is_admin = Admin.query.get(user_id) is not None
+        is_owner = str(order.user_id) == str(user_id)
+        
+        print(f"Is admin: {is_admin}, Is owner: {is_owner}")
+        
+        if not is_owner and not is_admin:
+            return jsonify({"error": "Not authorized to view this order"}), 403
+        
+        # Get order items
+        order_items = []
+        total = 0
+        
+        # Get items using OrderItem model
+        with sharding.use(shard):
+            items = OrderItem.query.filter_by(order_id=order_id).all()
+        
+        for item in items:
+            # Get product details
+            product = Product.query.get(item.product_id)
+            
+            # Calculate item total
+            item_total = item.price * item.quantity
+            total += item_total
+            
+            order_items.append({
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": product.name if product else "Unknown Product",
+                "product_img": product.img if product else None,
+                "quantity": item.quantity,
+                "price": item.price,
+                "total": item_total
+            })
+        
+        # Format created_at date
+        created_at_str = order.created_at.strftime("%Y-%m-%d %H:%M:%S") if order.created_at else ""
+        
+        # Return order details
+        return jsonify({
+            "id": order.id,
+            "user_id": order.user_id,
+            "status": order.status,
+            "created_at": created_at_str,
+            "items": order_items,
+            "total": total
+        }), 200
+            
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,183 @@
+from flask import request, jsonify, Blueprint
+from app import db
+from models import User, Product, Order
+from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from sqlalchemy.exc import SQLAlchemyError
+import sharding
+from routes.common import get_order_items
+
+user_bp = Blueprint("user", __name__, url_prefix="/api/user")
+
+@user_bp.route("/user/profile")
+def user_profile():
+    return "User Profile"
+
+# 🟢 User Registration
+@user_bp.route("/register", methods=["POST", "OPTIONS"])
+def user_register():
+    if request.method == "OPTIONS":
+        return "", 200
+        
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        # Extract user data
+        username = data.get("username")
+        email = data.get("email")
+        password = data.get("password")
+        
+        # Validate required fields
+        if not username or not email or not password:
+            return jsonify({"error": "Username, email, and password are required"}), 400
+        
+        # Validate email format
+        if '@' not in email or '.' not in email:
+            return jsonify({"error": "Invalid email format"}), 400
+            
+        # Check if username or email already exists
+        if User.query.filter_by(username=username).first():
+            return jsonify({"error": "Username already exists"}), 400
+        
+        if User.query.filter_by(email=email).first():
+            return jsonify({"error": "Email already exists"}), 400
+        
+        # Create new user with hashed password
+        hashed_password = generate_password_hash(password)
+        new_user = User(
+            username=username, 
+            email=email, 
+            password=hashed_password
+        )
+        
+        db.session.add(new_user)
+        db.session.commit()
+        
+        return jsonify({
+            "message": "User registered successfully", 
+            "user_id": new_user.id
+        }), 201
+        
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 User Login
+@user_bp.route("/login", methods=["POST"])
+def user_login():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+        
+        email = data.get("email")
+        password = data.get("password")
+        
+        if not email or not password:
+            return jsonify({"error": "Email and password are required"}), 400
+        
+        # Find user by email
+        user = User.query.filter_by(email=email).first()
+        if not user or not check_password_hash(user.password, password):
+            return jsonify({"error": "Invalid credentials"}), 401
+        
+        # Generate access token
+        access_token = create_access_token(identity=str(user.id))
+        
+        return jsonify({
+            "message": "Login successful",
+            "access_token": access_token,
+            "user_id": user.id,
+            "username": user.username,
+            "email": user.email
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 User Profile
+@user_bp.route("/profile", methods=["GET"])
+@jwt_required()
+def get_user_profile():
+    try:
+        # Get user ID from JWT token
+        user_id = get_jwt_identity()
+        
+        # Query user data
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        
+        # Return user profile data
+        return jsonify({
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "created_at": user.created_at.strftime("%Y-%m-%d %H:%M:%S") if hasattr(user, "created_at") else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# 🟢 Get User Orders
+@user_bp.route("/orders", methods=["GET"])
+@jwt_required()
+def get_user_orders():
+    try:
+        user_id = get_jwt_identity()
+        
+        # Pagination
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 5, type=int)
+        
+        # All of a user's orders are on one shard
+        with sharding.for_user(user_id):
+            # Query user orders
+            paginated_orders = Order.query.filter_by(user_id=user_id).order_by(
+                Order.created_at.desc()
+            ).paginate(page=page, per_page=per_page, error_out=False)
+            
+            result = []
+            
+            for order in paginated_orders.items:
+                # Get order items
+                items = get_order_items(order.id)
+                order_items = []
+                total = 0
+                
+                for item in items:
+                    product = Product.query.get(item.product_id)
+                    item_total = item.price * item.quantity
+                    total += item_total
+                    
+                    order_items.append({
+                        "product_id": item.product_id,
+                        "product_name": product.name if product else "Unknown Product",
+                        "product_image": product.img if product else None,
+                        "quantity": item.quantity,
+                        "price": item.price,
+                        "total": item_total
+                    })
+                
+                result.append({
+                    "id": order.id,
+                    "status": order.status,
+                    "total": total,
+                    "created_at": order.created_at.strftime("%Y-%m-%d %H:%M"),
+                    "items": order_items
+                })
+            
+        return jsonify({
+            "orders": result,
+            "total": paginated_orders.total,
+            "page": page,
+            "pages": paginated_orders.pages
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,8 +1,11 @@
+"""Development server. In production run wsgi.py under gunicorn instead."""
 from app import create_app, db
+import sharding
 
 app = create_app()
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()  # Create tables if they don't exist
+        sharding.create_all()  # Order tables on ORDER_SHARDS, if any
     app.run(debug=True)
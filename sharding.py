@@ -0,0 +1,417 @@
+"""Horizontal sharding of orders by user.
+
+With ORDER_SHARDS set to a list of database URIs, the ``order`` and
+``order_item`` tables live in those databases (one SQLAlchemy bind each,
+``order_shard_<n>``) instead of the main one. Users, products and
+everything else stay in the main database. A user's orders all live on
+the shard their id hashes to, so per-user reads and checkout touch
+exactly one shard and write load spreads across all of them.
+
+``db.session`` routes any statement touching the order tables to the
+shard selected with ``for_user``, ``for_order`` or ``use``; outside of
+one it raises instead of silently reading the wrong database. Admin
+views that need every order run a function on all shards in parallel
+with ``gather`` and combine the sorted partial results with ``merge``.
+
+Order ids stay globally unique because each shard hands them out from
+its own range (``(index + 1) * ORDER_SHARD_ID_SPAN`` upwards, reserved
+in blocks through ``order_shard_sequence``); ids below the first range
+are orders from before sharding. Order item ids are local to a shard.
+
+Shards are placed with jump consistent hashing, so appending a shard to
+ORDER_SHARDS only moves about 1/n of the users. ``flask init-order-shards``
+creates the tables and ``flask reshard-orders`` moves orders to their
+home shard (including the ones still in the main database when
+sharding is first turned on). Without ORDER_SHARDS nothing changes:
+there is a single "shard", the main database.
+"""
+import hashlib
+import heapq
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+import sqlalchemy as sa
+from sqlalchemy.sql.util import find_tables
+from flask import current_app
+from flask_sqlalchemy.session import Session
+
+SHARDED_TABLES = ("order", "order_item")
+BIND_PREFIX = "order_shard_"
+SEQUENCE = "order"
+
+_current = ContextVar("order_shard", default=None)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_blocks = {}  # shard database url -> [next order id, end of reserved block]
+_blocks_lock = threading.Lock()
+
+_metadata = None
+
+
+def bind_key(index):
+    return f"{BIND_PREFIX}{index}"
+
+
+def shard_index(key):
+    return int(key[len(BIND_PREFIX):])
+
+
+def configure(app):
+    """Register one bind per configured shard; must run before ``db.init_app``"""
+    binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+    for index, uri in enumerate(app.config.get("ORDER_SHARDS") or []):
+        binds[bind_key(index)] = uri
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def shard_count(app=None):
+    return len((app or current_app).config.get("ORDER_SHARDS") or [])
+
+
+def enabled():
+    return shard_count() > 0
+
+
+def keys():
+    """Bind keys of all shards; ``[None]`` (the main database) when unsharded"""
+    count = shard_count()
+    return [bind_key(index) for index in range(count)] if count else [None]
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach) of a 64-bit key into ``buckets``"""
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id, count):
+    # Hash first: jump hash spreads well-mixed keys, raw sequential ids less so
+    digest = hashlib.blake2b(str(int(user_id)).encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, "little"), count)
+
+
+def key_for_user(user_id):
+    count = shard_count()
+    return bind_key(shard_for_user(user_id, count)) if count else None
+
+
+@contextmanager
+def use(key):
+    """Route order table statements in this block to shard ``key``"""
+    token = _current.set(key)
+    try:
+        yield key
+    finally:
+        _current.reset(token)
+
+
+def for_user(user_id):
+    """The shard holding ``user_id``'s orders"""
+    return use(key_for_user(user_id))
+
+
+def locate_order(order_id):
+    """Bind key of the shard holding ``order_id``, or None if no shard has it"""
+    from app import db
+    from models import Order
+
+    order_table = Order.__table__
+
+    def has_order():
+        return db.session.execute(
+            sa.select(order_table.c.id).where(order_table.c.id == order_id)
+        ).first() is not None
+
+    for key, found in gather(has_order):
+        if found:
+            return key
+    return None
+
+
+@contextmanager
+def for_order(order_id):
+    """The shard holding ``order_id``; unknown ids go to the first shard, which then finds nothing"""
+    key = None
+    if enabled():
+        key = locate_order(order_id) or bind_key(0)
+    with use(key):
+        yield key
+
+
+def _touches_orders(mapper, clause):
+    if mapper is not None:
+        table = getattr(sa.inspect(mapper), "local_table", None)
+        if table is not None and table.name in SHARDED_TABLES:
+            return True
+    if clause is not None:
+        return any(getattr(table, "name", None) in SHARDED_TABLES
+                   for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardSession(Session):
+    """``db.session`` class that sends order table statements to the current shard"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engines = self._db.engines
+            if bind_key(0) in engines and _touches_orders(mapper, clause):
+                key = _current.get()
+                if key is None:
+                    raise RuntimeError(
+                        "Orders are sharded; query them inside sharding.for_user(), "
+                        "sharding.for_order() or sharding.use()"
+                    )
+                return engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@sa.event.listens_for(ShardSession, "before_flush")
+def _assign_order_ids(session, flush_context, instances):
+    if bind_key(0) not in session._db.engines:
+        return
+    new_orders = [obj for obj in session.new
+                  if getattr(obj, "__tablename__", None) == "order" and obj.id is None]
+    if not new_orders:
+        return
+    key = _current.get()
+    for order in new_orders:
+        if key_for_user(order.user_id) != key:
+            raise RuntimeError(f"Orders of user {order.user_id} belong on {key_for_user(order.user_id)}, not {key}")
+    for order, order_id in zip(new_orders, next_order_ids(key, len(new_orders))):
+        order.id = order_id
+
+
+def shard_metadata():
+    """Tables created on every shard: the order tables without links to the main database"""
+    global _metadata
+    if _metadata is not None:
+        return _metadata
+    from models import Order, OrderItem
+
+    metadata = sa.MetaData()
+    for model in (Order, OrderItem):
+        table = model.__table__.to_metadata(metadata)
+        # Users and products stay in the main database
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] not in SHARDED_TABLES:
+                table.constraints.discard(constraint)
+                for fk in constraint.elements:
+                    fk.parent.foreign_keys.discard(fk)
+                    table.foreign_keys.discard(fk)
+    sa.Table(
+        "order_shard_sequence", metadata,
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("value", sa.BigInteger, nullable=False, default=0),
+    )
+    _metadata = metadata
+    return metadata
+
+
+def _reserve_block(engine, key, size, span):
+    sequence = shard_metadata().tables["order_shard_sequence"]
+    # Own short transaction, so concurrent checkouts never wait on each other's
+    with engine.begin() as conn:
+        conn.execute(
+            sa.update(sequence).where(sequence.c.name == SEQUENCE).values(value=sequence.c.value + size)
+        )
+        value = conn.execute(sa.select(sequence.c.value).where(sequence.c.name == SEQUENCE)).scalar_one()
+    if value > span:
+        raise RuntimeError(f"Order id range of {key} is exhausted")
+    base = (shard_index(key) + 1) * span
+    return [base + value - size + 1, base + value + 1]
+
+
+def next_order_ids(key, count):
+    """``count`` new order ids on shard ``key``"""
+    from app import db
+
+    engine = db.engines[key]
+    span = current_app.config.get("ORDER_SHARD_ID_SPAN", 100_000_000)
+    block_size = current_app.config.get("ORDER_SHARD_ID_BLOCK", 100)
+    ids = []
+    with _blocks_lock:
+        while len(ids) < count:
+            block = _blocks.get(str(engine.url))
+            if block is None or block[0] >= block[1]:
+                block = _blocks[str(engine.url)] = _reserve_block(
+                    engine, key, max(block_size, count - len(ids)), span
+                )
+            take = min(count - len(ids), block[1] - block[0])
+            ids.extend(range(block[0], block[0] + take))
+            block[0] += take
+    return ids
+
+
+def create_all():
+    """Create the order tables on every configured shard"""
+    from app import db
+
+    if not enabled():
+        return
+    metadata = shard_metadata()
+    sequence = metadata.tables["order_shard_sequence"]
+    for key in keys():
+        engine = db.engines[key]
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            if conn.execute(sa.select(sequence.c.name).where(sequence.c.name == SEQUENCE)).first() is None:
+                conn.execute(sa.insert(sequence).values(name=SEQUENCE, value=0))
+
+
+def _pool(workers):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard")
+    return _executor
+
+
+def _after_fork():
+    # The executor's threads stayed in the parent, and a forked child must not
+    # hand out ids from the parent's reserved blocks
+    global _executor, _executor_lock, _blocks_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _blocks.clear()
+    _blocks_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _run_on(app, key, fn, args):
+    # A fresh app context means a separate scoped session, removed on exit
+    with app.app_context():
+        with use(key):
+            return fn(*args)
+
+
+def gather(fn, *args):
+    """Run ``fn(*args)`` on every shard in parallel; returns ``[(key, result)]`` in shard order.
+
+    ``fn`` runs in its own app context and session, so it must return plain
+    values (Core rows, dicts), not ORM objects.
+    """
+    shard_keys = keys()
+    if len(shard_keys) == 1:
+        with use(shard_keys[0]):
+            return [(shard_keys[0], fn(*args))]
+    app = current_app._get_current_object()
+    pool = _pool(app.config.get("ORDER_SHARD_WORKERS", 8))
+    futures = [pool.submit(_run_on, app, key, fn, args) for key in shard_keys]
+    return [(key, future.result()) for key, future in zip(shard_keys, futures)]
+
+
+def merge(results, key, reverse=False, limit=None):
+    """k-way merge of per-shard lists that are each sorted by ``key``"""
+    merged = heapq.merge(*results, key=key, reverse=reverse)
+    return list(islice(merged, limit)) if limit is not None else list(merged)
+
+
+def _move(source, target, order_ids):
+    """Copy orders with their items to ``target``, then delete them from ``source``"""
+    metadata = shard_metadata()
+    order_table = metadata.tables["order"]
+    item_table = metadata.tables["order_item"]
+    with source.begin() as src:
+        orders = src.execute(
+            sa.select(order_table).where(order_table.c.id.in_(order_ids)).with_for_update()
+        ).mappings().all()
+        items = src.execute(
+            sa.select(item_table).where(item_table.c.order_id.in_(order_ids)).order_by(item_table.c.id)
+        ).mappings().all()
+        with target.begin() as dst:
+            # Already there if an earlier run stopped between the two commits
+            present = set(dst.execute(
+                sa.select(order_table.c.id).where(order_table.c.id.in_(order_ids))
+            ).scalars())
+            new_orders = [dict(row) for row in orders if row["id"] not in present]
+            if new_orders:
+                dst.execute(sa.insert(order_table), new_orders)
+                new_ids = {row["id"] for row in new_orders}
+                # Item ids are per shard, the target numbers them
+                new_items = [{name: value for name, value in row.items() if name != "id"}
+                             for row in items if row["order_id"] in new_ids]
+                if new_items:
+                    dst.execute(sa.insert(item_table), new_items)
+        src.execute(sa.delete(item_table).where(item_table.c.order_id.in_(order_ids)))
+        src.execute(sa.delete(order_table).where(order_table.c.id.in_(order_ids)))
+    return len(orders)
+
+
+def reshard(batch_size=500, dry_run=False):
+    """Move every order that is not on its user's shard there.
+
+    Reads the main database (orders from before sharding) and every shard
+    in id order and moves misplaced orders in batches, committing on the
+    target before deleting from the source so a crash never loses an
+    order; rerunning finishes an interrupted move. Returns
+    ``{(source, target): orders}``.
+    """
+    from app import db
+
+    if not enabled():
+        raise RuntimeError("ORDER_SHARDS is empty, there is nowhere to move orders to")
+    order_table = shard_metadata().tables["order"]
+    moved = defaultdict(int)
+    for source_key in [None] + keys():
+        source = db.engines[source_key]
+        if not sa.inspect(source).has_table("order"):
+            continue
+        last_id = 0
+        while True:
+            with source.connect() as conn:
+                rows = conn.execute(
+                    sa.select(order_table.c.id, order_table.c.user_id)
+                    .where(order_table.c.id > last_id).order_by(order_table.c.id).limit(batch_size)
+                ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            misplaced = defaultdict(list)
+            for order_id, user_id in rows:
+                target_key = key_for_user(user_id)
+                if target_key != source_key:
+                    misplaced[target_key].append(order_id)
+            for target_key, order_ids in misplaced.items():
+                if dry_run:
+                    moved[source_key, target_key] += len(order_ids)
+                else:
+                    moved[source_key, target_key] += _move(source, db.engines[target_key], order_ids)
+    return dict(moved)
+
+
+def register_commands(app):
+    import click
+
+    @app.cli.command("init-order-shards")
+    def init_order_shards_command():
+        """Create the order tables on every shard in ORDER_SHARDS"""
+        create_all()
+        print(f"Order tables ready on {shard_count()} shard(s)")
+
+    @app.cli.command("reshard-orders")
+    @click.option("--batch-size", type=int, default=500, help="Orders read per batch")
+    @click.option("--dry-run", is_flag=True, help="Only count the orders that would move")
+    def reshard_orders_command(batch_size, dry_run):
+        """Move orders to the shard their user hashes to (after changing ORDER_SHARDS)"""
+        moved = reshard(batch_size=batch_size, dry_run=dry_run)
+        verb = "Would move" if dry_run else "Moved"
+        for (source, target), count in sorted(moved.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            print(f"{verb} {count} order(s) from {source or 'main database'} to {target}")
+        if not moved:
+            print("Every order is on its shard")
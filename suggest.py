@@ -0,0 +1,429 @@
+"""In-memory prefix index for search box suggestions.
+
+Every word position of a product name is stored as a ``(term, product_id)``
+tuple in one sorted list, so the products under a prefix are two bisects
+plus a slice. The list is only written by a build: products added or
+renamed afterwards go to a small sorted list of additions and removed
+entries to a set, both folded in by the next build.
+
+Matches are ranked by popularity (units sold). Each prefix keeps its top
+products in a ``_Ranking`` that every product write and sale updates in
+place: popularity only grows, so a product can only move up, and a ranking
+holding more entries than a lookup returns stays exact when a few of them
+are removed. Rankings of prefixes up to SUGGEST_TOP_PREFIX_LENGTH
+characters, the ones a search box sends first, are built with the index;
+longer ones are ranked over all their matches on first use and kept in a
+bounded LRU cache.
+
+The index is built from the database on first use and kept current by the
+product write routes. Each worker process holds its own copy, so other
+processes catch up at the next rebuild, every SUGGEST_REFRESH_SECONDS or
+after SUGGEST_MAX_CHANGES writes. Rebuilds run on a background thread
+while requests keep using the current index; writes made meanwhile are
+replayed onto the new index before it replaces the old one. A sale that
+commits while the rebuild reads the database may be counted twice until
+the next rebuild.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from sqlalchemy import select, func
+
+logger = logging.getLogger(__name__)
+
+HIGH = "\uffff"
+MAX_LIMIT = 20
+# Products kept per prefix; the spare half keeps a ranking exact through removals
+CAPACITY = 2 * MAX_LIMIT
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def _terms(name):
+    """Suffixes of the normalized name starting at each word"""
+    words = normalize(name).split(" ")
+    return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def _prefixes(name, max_length=None):
+    """Every prefix of the name's terms, up to ``max_length`` characters"""
+    prefixes = set()
+    for term in _terms(name):
+        end = len(term) if max_length is None else min(len(term), max_length)
+        prefixes.update(term[:length] for length in range(1, end + 1))
+    return prefixes
+
+
+class _Ranking:
+    """The best products under one prefix, best first"""
+    __slots__ = ("ids", "complete", "stale")
+
+    def __init__(self, ids, complete):
+        self.ids = ids
+        self.complete = complete  # holds every product under the prefix
+        self.stale = False  # lost too many entries, rank again on next lookup
+
+
+class SuggestIndex:
+    def __init__(self, cache_size=50000, top_length=3):
+        self.cache_size = cache_size
+        self.top_length = top_length
+        self._keys = []  # sorted (term, product_id) as of the build
+        self._added = []  # sorted (term, product_id) added since
+        self._removed = set()  # entries of _keys removed since
+        self._products = {}  # product_id -> (name, category)
+        self._popularity = {}  # product_id -> units sold
+        self._categories = {}  # normalized -> [display name, product count]
+        self._category_keys = []  # sorted normalized category names
+        self._top = {}  # prefix up to top_length characters -> _Ranking
+        self._top_cache = OrderedDict()  # longer prefix -> _Ranking, least recently used first
+        self._lock = threading.RLock()
+        self.built_at = None
+        self.changes = 0  # writes since the build
+
+    def _rank(self, product_id):
+        return -self._popularity[product_id], product_id
+
+    def build(self, products, popularity=None):
+        """Rebuild from ``(id, name, category)`` rows and ``{product_id: units}``"""
+        popularity = popularity or {}
+        keys = []
+        products_map = {}
+        popularity_map = {}
+        categories = {}
+        short = {}  # product_id -> its prefixes up to top_length characters
+        lengths = range(1, self.top_length + 1)
+        for product_id, name, category in products:
+            products_map[product_id] = (name, category)
+            popularity_map[product_id] = popularity.get(product_id, 0)
+            terms = _terms(name)
+            keys.extend((term, product_id) for term in terms)
+            short[product_id] = {term[:length] for term in terms for length in lengths}
+            if category:
+                entry = categories.setdefault(normalize(category), [category, 0])
+                entry[1] += 1
+        keys.sort()
+
+        # Short prefixes in one pass over the products, best first
+        top = {}
+        for product_id in sorted(products_map, key=lambda pid: (-popularity_map[pid], pid)):
+            for prefix in short.pop(product_id):
+                ids = top.get(prefix)
+                if ids is None:
+                    top[prefix] = [product_id]
+                elif len(ids) <= CAPACITY:
+                    ids.append(product_id)
+        top = {prefix: _Ranking(ids[:CAPACITY], len(ids) <= CAPACITY) for prefix, ids in top.items()}
+
+        with self._lock:
+            self._keys = keys
+            self._added = []
+            self._removed = set()
+            self._products = products_map
+            self._popularity = popularity_map
+            self._categories = categories
+            self._category_keys = sorted(categories)
+            self._top = top
+            self._top_cache = OrderedDict()
+            self.built_at = time.monotonic()
+            self.changes = 0
+
+    def _add_category(self, category):
+        if not category:
+            return
+        key = normalize(category)
+        entry = self._categories.get(key)
+        if entry is None:
+            self._categories[key] = [category, 1]
+            insort(self._category_keys, key)
+        else:
+            entry[1] += 1
+
+    def _remove_category(self, category):
+        key = normalize(category)
+        entry = self._categories.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._categories[key]
+            self._category_keys.pop(bisect_left(self._category_keys, key))
+
+    def _ranking_for_update(self, prefix):
+        if len(prefix) <= self.top_length:
+            ranking = self._top.get(prefix)
+            if ranking is None:
+                # First product under this prefix
+                ranking = self._top[prefix] = _Ranking([], True)
+            return ranking
+        return self._top_cache.get(prefix)
+
+    def _promote(self, product_id, name):
+        """Move ``product_id`` up in the rankings of its prefixes after it gained popularity or was added"""
+        rank = self._rank(product_id)
+        for prefix in _prefixes(name):
+            ranking = self._ranking_for_update(prefix)
+            if ranking is None:
+                continue
+            ids = ranking.ids
+            if product_id in ids:
+                ids.remove(product_id)
+            elif not ranking.complete and (not ids or rank > self._rank(ids[-1])):
+                # Somewhere among the products the ranking doesn't hold
+                continue
+            ids.insert(bisect_left([self._rank(pid) for pid in ids], rank), product_id)
+            if len(ids) > CAPACITY:
+                ids.pop()
+                ranking.complete = False
+
+    def _demote(self, product_id, name):
+        """Take ``product_id`` out of the rankings of its prefixes"""
+        for prefix in _prefixes(name):
+            ranking = self._top.get(prefix) if len(prefix) <= self.top_length else self._top_cache.get(prefix)
+            if ranking is None or product_id not in ranking.ids:
+                continue
+            ranking.ids.remove(product_id)
+            if not ranking.complete and len(ranking.ids) < MAX_LIMIT:
+                ranking.stale = True
+            elif ranking.complete and not ranking.ids and len(prefix) <= self.top_length:
+                del self._top[prefix]
+
+    def remove_product(self, product_id):
+        with self._lock:
+            current = self._products.get(product_id)
+            if current is None:
+                return
+            name, category = current
+            self._demote(product_id, name)
+            del self._products[product_id]
+            self._popularity.pop(product_id, None)
+            for term in _terms(name):
+                key = (term, product_id)
+                i = bisect_left(self._added, key)
+                if i < len(self._added) and self._added[i] == key:
+                    del self._added[i]
+                else:
+                    self._removed.add(key)
+            self._remove_category(category)
+            self.changes += 1
+
+    def upsert_product(self, product_id, name, category):
+        with self._lock:
+            popularity = self._popularity.get(product_id, 0)
+            self.remove_product(product_id)
+            self._products[product_id] = (name, category)
+            self._popularity[product_id] = popularity
+            for term in _terms(name):
+                key = (term, product_id)
+                if key in self._removed:
+                    self._removed.discard(key)
+                else:
+                    insort(self._added, key)
+            self._add_category(category)
+            self._promote(product_id, name)
+            self.changes += 1
+
+    def add_popularity(self, product_id, units):
+        with self._lock:
+            current = self._products.get(product_id)
+            if current is None:
+                return
+            self._popularity[product_id] += units
+            self._promote(product_id, current[0])
+
+    def _matches(self, prefix):
+        """Ids of every product with a term starting with ``prefix``"""
+        matches = set()
+        for keys, removed in ((self._keys, self._removed), (self._added, ())):
+            lo = bisect_left(keys, (prefix,))
+            hi = bisect_left(keys, (prefix + HIGH,))
+            if removed:
+                matches.update(pid for term, pid in keys[lo:hi] if (term, pid) not in removed)
+            else:
+                matches.update(pid for _, pid in keys[lo:hi])
+        return matches
+
+    def _rank_prefix(self, prefix):
+        ids = heapq.nsmallest(CAPACITY + 1, self._matches(prefix), key=self._rank)
+        return _Ranking(ids[:CAPACITY], len(ids) <= CAPACITY)
+
+    def _ranked_ids(self, prefix):
+        if len(prefix) <= self.top_length:
+            ranking = self._top.get(prefix)
+            if ranking is None:
+                return []
+            if ranking.stale:
+                ranking = self._top[prefix] = self._rank_prefix(prefix)
+            return ranking.ids
+
+        ranking = self._top_cache.get(prefix)
+        if ranking is None or ranking.stale:
+            ranking = self._top_cache[prefix] = self._rank_prefix(prefix)
+            if len(self._top_cache) > self.cache_size:
+                self._top_cache.popitem(last=False)
+        else:
+            self._top_cache.move_to_end(prefix)
+        return ranking.ids
+
+    def lookup(self, query, limit=8):
+        """Return ``(products, categories)`` completing ``query``"""
+        limit = min(limit, MAX_LIMIT)
+        prefix = normalize(query)
+        if not prefix:
+            return [], []
+        with self._lock:
+            ids = self._ranked_ids(prefix)[:limit]
+            products = [
+                {"id": pid, "name": self._products[pid][0], "category": self._products[pid][1]}
+                for pid in ids
+            ]
+            lo = bisect_left(self._category_keys, prefix)
+            hi = bisect_left(self._category_keys, prefix + HIGH)
+            categories = [self._categories[key][0] for key in self._category_keys[lo:hi][:limit]]
+        return products, categories
+
+    def apply(self, change):
+        """Replay a change recorded by ``product_changed``, ``product_deleted`` or ``products_sold``"""
+        kind, *args = change
+        if kind == "upsert":
+            self.upsert_product(*args)
+        elif kind == "delete":
+            self.remove_product(*args)
+        else:
+            self.add_popularity(*args)
+
+
+_index = None
+_index_lock = threading.Lock()  # guards _index, _replay and _rebuilding
+_first_build_lock = threading.Lock()
+_replay = None  # changes made while a rebuild reads the database
+_rebuilding = False
+
+
+def _after_fork():
+    # A rebuild thread of the parent process didn't come along
+    global _index_lock, _first_build_lock, _replay, _rebuilding
+    _index_lock = threading.Lock()
+    _first_build_lock = threading.Lock()
+    _replay = None
+    _rebuilding = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def load_from_db(index):
+    from app import db
+    from models import Product, OrderItem
+    import sharding
+
+    product_table = Product.__table__
+    item_table = OrderItem.__table__
+    products = db.session.execute(
+        select(product_table.c.id, product_table.c.name, product_table.c.category)
+    ).all()
+    popularity = {}
+    for key in sharding.keys():
+        with sharding.use(key):
+            for product_id, units in db.session.execute(
+                select(item_table.c.product_id, func.sum(item_table.c.quantity))
+                .group_by(item_table.c.product_id)
+            ):
+                popularity[product_id] = popularity.get(product_id, 0) + int(units or 0)
+    index.build(products, popularity)
+
+
+def _rebuild(app):
+    """Build a new index from the database and swap it in"""
+    global _index, _replay
+    # Record writes from before the database is read, so none falls between the read and the swap
+    with _index_lock:
+        _replay = []
+    try:
+        index = SuggestIndex(
+            cache_size=app.config.get("SUGGEST_CACHE_SIZE", 50000),
+            top_length=app.config.get("SUGGEST_TOP_PREFIX_LENGTH", 3),
+        )
+        # Own app context, so the read has its own session
+        with app.app_context():
+            load_from_db(index)
+        with _index_lock:
+            for change in _replay:
+                index.apply(change)
+            _index = index
+    finally:
+        with _index_lock:
+            _replay = None
+
+
+def _rebuild_in_background(app, current):
+    global _rebuilding
+    try:
+        _rebuild(app)
+    except Exception:
+        logger.exception("Could not rebuild the suggestion index")
+        # Keep serving the current index, try again after another interval
+        current.built_at = time.monotonic()
+        current.changes = 0
+    finally:
+        with _index_lock:
+            _rebuilding = False
+
+
+def _is_stale(app, index):
+    refresh = app.config.get("SUGGEST_REFRESH_SECONDS", 0)
+    max_changes = app.config.get("SUGGEST_MAX_CHANGES", 50000)
+    return bool((refresh and time.monotonic() - index.built_at > refresh)
+                or (max_changes and index.changes > max_changes))
+
+
+def get_index(app):
+    """Return the process-wide index, building it on first use and refreshing it in the background"""
+    global _rebuilding
+    index = _index
+    if index is None:
+        with _first_build_lock:
+            if _index is None:
+                _rebuild(app)
+        return _index
+    if _is_stale(app, index):
+        with _index_lock:
+            if _rebuilding:
+                return index
+            _rebuilding = True
+        # The thread outlives the request, so it needs the app itself rather than current_app
+        app = getattr(app, "_get_current_object", lambda: app)()
+        threading.Thread(target=_rebuild_in_background, args=(app, index),
+                         name="suggest-rebuild", daemon=True).start()
+    return index
+
+
+def _change(change):
+    with _index_lock:
+        if _index is not None:
+            _index.apply(change)
+        if _replay is not None:
+            _replay.append(change)
+
+
+def product_changed(product_id, name, category):
+    """Keep the index in step with a product write"""
+    _change(("upsert", product_id, name, category))
+
+
+def product_deleted(product_id):
+    _change(("delete", product_id))
+
+
+def products_sold(quantities):
+    """Bump popularity for ``{product_id: units}`` after an order commits"""
+    for product_id, units in quantities.items():
+        _change(("sold", product_id, units))
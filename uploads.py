@@ -0,0 +1,292 @@
+"""Content-addressed storage for uploaded product images.
+
+``UploadRequest`` (installed by ``init_uploads``) makes Werkzeug's form
+parser write each uploaded file straight into a temporary file under
+``UPLOAD_FOLDER/tmp`` while hashing it, instead of buffering it first.
+After ``limit_request()`` a request whose Content-Length is too big is
+refused before any of it is read, and a file that grows past
+UPLOAD_MAX_BYTES or doesn't start like one of UPLOAD_TYPES stops the
+upload as soon as that shows. Both raise the matching werkzeug HTTP error.
+
+``store`` moves the file to ``blobs/<2 hex>/<2 hex>/<sha256>.<ext>``
+unless that content is already there, and returns the name to save in
+``Product.img``. The ``upload_blob`` row for the content counts the
+products using it: ``store`` takes a reference and ``release`` drops one,
+both in the caller's transaction. After commit, ``collect`` deletes the
+row and files of content nothing references any more. It deletes the row
+before the files and commits after, so a concurrent ``store`` of the same
+content waits on the row and then writes the file again. Files left by
+rolled back requests are removed by ``flask gc-uploads``.
+
+Names from before the store (plain filenames in UPLOAD_FOLDER) keep
+working and are never deleted.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+
+from flask import Request, current_app, request
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from app import db
+from models import UploadBlob
+
+logger = logging.getLogger(__name__)
+
+blob_table = UploadBlob.__table__
+
+CHUNK_SIZE = 64 * 1024
+HEAD_BYTES = 12  # enough to tell the image types apart
+FORM_OVERHEAD = 64 * 1024  # room for the other form fields in a request's Content-Length
+CACHE_MAX_AGE = 365 * 24 * 3600  # stored names never change content
+
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "gif": "gif", "webp": "webp"}
+
+STORED_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+
+
+def sniff(head):
+    """Image type from a file's first HEAD_BYTES bytes, or None"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class IncomingFile:
+    """Temporary file for one uploaded file that hashes, counts and sniffs what's written to it"""
+
+    def __init__(self, folder, max_bytes, types=None):
+        tmp_folder = os.path.join(folder, "tmp")
+        os.makedirs(tmp_folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_folder, suffix=".part")
+        self.file = os.fdopen(fd, "w+b")
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.max_bytes = max_bytes
+        self.types = types
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f"Files can be at most {self.max_bytes:,} bytes")
+        if len(self.head) < HEAD_BYTES:
+            self.head += data[:HEAD_BYTES - len(self.head)]
+            if len(self.head) == HEAD_BYTES and self.types is not None and sniff(self.head) not in self.types:
+                self.close()
+                raise UnsupportedMediaType(f"Unsupported image type. Must be one of: {', '.join(self.types)}")
+        self.hash.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # read, seek, tell, ... for werkzeug's FileStorage
+        return getattr(self.file, name)
+
+    def keep(self, target):
+        """Move the finished file to ``target``"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        os.replace(self.path, target)
+        self.path = None
+
+    def close(self):
+        self.file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class UploadRequest(Request):
+    """Request whose uploaded files stream into ``IncomingFile``s"""
+
+    upload_types = None  # set by limit_request
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return IncomingFile(config["UPLOAD_FOLDER"], config.get("UPLOAD_MAX_BYTES"), self.upload_types)
+
+
+def limit_request():
+    """Apply the upload limits to this request; call before reading request.form or request.files"""
+    config = current_app.config
+    max_bytes = config.get("UPLOAD_MAX_BYTES")
+    if max_bytes:
+        request.max_content_length = max_bytes + FORM_OVERHEAD
+    request.upload_types = list(config.get("UPLOAD_TYPES", EXTENSIONS))
+
+
+def is_stored(name):
+    return bool(name) and STORED_NAME.match(name) is not None
+
+
+def directory(name):
+    """Folder holding upload ``name``"""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    if is_stored(name):
+        return os.path.join(folder, "blobs", name[:2], name[2:4])
+    return folder
+
+
+def path(name):
+    return os.path.join(directory(name), name)
+
+
+def thumbnail_path(name):
+    folder = os.path.join(current_app.config["UPLOAD_FOLDER"], "thumbs")
+    if is_stored(name):
+        return os.path.join(folder, name[:2], name[2:4], name)
+    return os.path.join(folder, name)
+
+
+def _copy(stream):
+    """IncomingFile with the contents of a file that wasn't parsed by UploadRequest"""
+    config = current_app.config
+    incoming = IncomingFile(config["UPLOAD_FOLDER"], config.get("UPLOAD_MAX_BYTES"))
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            incoming.write(chunk)
+    except Exception:
+        incoming.close()
+        raise
+    return incoming
+
+
+def _add_ref(digest, ext, size):
+    added = db.session.execute(
+        update(blob_table).where(blob_table.c.digest == digest).values(refcount=blob_table.c.refcount + 1)
+    ).rowcount
+    if not added:
+        db.session.execute(insert(blob_table).values(digest=digest, ext=ext, size=size, refcount=1))
+
+
+def store(file):
+    """Keep an uploaded ``FileStorage`` and take a reference to it; returns its stored name.
+
+    Call inside the transaction that saves the name. Raises ValueError for
+    a type not in UPLOAD_TYPES.
+    """
+    copied = not isinstance(file.stream, IncomingFile)
+    incoming = _copy(file.stream) if copied else file.stream
+    try:
+        kind = sniff(incoming.head)
+        types = current_app.config.get("UPLOAD_TYPES", EXTENSIONS)
+        if kind not in types:
+            raise ValueError(f"Unsupported image type. Must be one of: {', '.join(types)}")
+        name = f"{incoming.hash.hexdigest()}.{EXTENSIONS[kind]}"
+        # Reference first: a concurrent collect of this content has then either finished or won't delete it
+        _add_ref(name[:64], EXTENSIONS[kind], incoming.size)
+        target = path(name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            incoming.keep(target)
+    finally:
+        if copied:
+            incoming.close()
+    return name
+
+
+def release(name):
+    """Drop a reference to upload ``name`` in the current transaction.
+
+    Returns the name to ``collect`` after commit, None for names from before
+    the store.
+    """
+    if not is_stored(name):
+        return None
+    db.session.execute(
+        update(blob_table).where(blob_table.c.digest == name[:64], blob_table.c.refcount > 0)
+        .values(refcount=blob_table.c.refcount - 1)
+    )
+    return name
+
+
+def _remove_files(name):
+    for file_path in (path(name), thumbnail_path(name)):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def collect(names):
+    """Delete released uploads in ``names`` that nothing references any more; returns those deleted.
+
+    Call after the commit that released them. Failures are logged and left
+    to ``flask gc-uploads``.
+    """
+    deleted = []
+    for name in names:
+        if not is_stored(name):
+            continue
+        try:
+            if db.session.execute(
+                delete(blob_table).where(blob_table.c.digest == name[:64], blob_table.c.refcount <= 0)
+            ).rowcount:
+                _remove_files(name)
+                deleted.append(name)
+            db.session.commit()
+        except (SQLAlchemyError, OSError) as e:
+            db.session.rollback()
+            logger.warning("Could not delete upload %s: %s", name, e)
+    return deleted
+
+
+def sweep(grace):
+    """Delete unreferenced uploads, and files older than ``grace`` seconds that no row covers.
+
+    Returns ``(uploads deleted, stray files deleted)``.
+    """
+    unreferenced = db.session.execute(
+        select(blob_table.c.digest, blob_table.c.ext).where(blob_table.c.refcount <= 0)
+    ).all()
+    db.session.commit()
+    deleted = len(collect(f"{digest}.{ext}" for digest, ext in unreferenced))
+
+    folder = current_app.config["UPLOAD_FOLDER"]
+    cutoff = time.time() - grace
+    strays = 0
+    for root, _, files in os.walk(os.path.join(folder, "tmp")):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+                strays += 1
+    for root, _, files in os.walk(os.path.join(folder, "blobs")):
+        # Stored names by digest, checked against the table a folder at a time
+        names = {name[:64]: name for name in files if is_stored(name)}
+        if not names:
+            continue
+        known = set(db.session.execute(
+            select(blob_table.c.digest).where(blob_table.c.digest.in_(list(names)))
+        ).scalars())
+        db.session.commit()
+        for digest, name in names.items():
+            if digest not in known and os.path.getmtime(os.path.join(root, name)) < cutoff:
+                _remove_files(name)
+                strays += 1
+    return deleted, strays
+
+
+def init_uploads(app):
+    app.request_class = UploadRequest
+
+    @app.cli.command("gc-uploads")
+    def gc_uploads_command():
+        """Delete unreferenced product images and leftovers of failed uploads"""
+        deleted, strays = sweep(app.config.get("UPLOAD_GC_GRACE", 3600))
+        print(f"Deleted {deleted} unreferenced upload(s) and {strays} stray file(s)")
@@ -0,0 +1,18 @@
+"""Production entry point for pre-fork WSGI servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+``python run.py`` is Flask's development server, with the debugger, and it
+creates missing tables on every start. Here tables are created once per
+deploy (``flask init-db``) and the app is built and warmed up once, in the
+server's master process: with ``preload_app`` each worker forks from that
+master and starts with its imports, routes, compiled statements and caches
+already in memory. A server that preloads must call the hooks in
+prefork.py around the fork; gunicorn.conf.py does.
+"""
+from app import create_app
+import prefork
+
+app = create_app()
+if app.config.get("WARMUP_ENABLED", True):
+    prefork.warm_up(app)